@@ -24,9 +24,15 @@
 
 
 import                      abc
+import                      asyncio
 import collections.abc as   cabc
 import contextlib as        ctxl
+import                      contextvars
+import dataclasses as       dcls
 import                      enum
+import functools as         funct
+import                      hashlib
+import                      inspect
 import                      io
 import                      json
 import                      math
@@ -35,6 +41,8 @@ import                      subprocess
 import                      shutil
 import                      sys
 import                      tempfile
+import                      threading
+import                      time
 import                      types
 
 from pathlib import Path
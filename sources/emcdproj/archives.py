@@ -0,0 +1,1002 @@
+# vim: set filetype=python fileencoding=utf-8:
+# -*- coding: utf-8 -*-
+
+#============================================================================#
+#                                                                            #
+#  Licensed under the Apache License, Version 2.0 (the "License");           #
+#  you may not use this file except in compliance with the License.          #
+#  You may obtain a copy of the License at                                   #
+#                                                                            #
+#      http://www.apache.org/licenses/LICENSE-2.0                            #
+#                                                                            #
+#  Unless required by applicable law or agreed to in writing, software       #
+#  distributed under the License is distributed on an "AS IS" BASIS,         #
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  #
+#  See the License for the specific language governing permissions and       #
+#  limitations under the License.                                            #
+#                                                                            #
+#============================================================================#
+
+
+''' Segmented archives for static website publication.
+
+    Archives are tarballs, which are compressed as a sequence of independent
+    streams. The first stream, the head, holds the top-level files of the
+    website along with an index of the other streams. Each top-level
+    directory, such as a release version, occupies its own segment of one or
+    more streams. A final stream, the coda, holds the end-of-archive marker.
+
+    Since decompressors treat consecutive streams as one, such archives
+    remain readable by ordinary tools. But, unchanged segments can be copied
+    verbatim from a previous archive rather than compressed again. And,
+    readers, which only need some segments, can seek to them by offset and
+    decompress them alone.
+
+    Archives are reproducible. Members are sorted and their metadata is
+    normalized, so that identical directories produce identical streams.
+    The index records a digest of the uncompressed content of each segment
+    and of the head, so that unchanged content is recognized without
+    compressing it.
+
+    The archive location is independent of codec; the codec is detected from
+    the leading bytes of the archive when reading it.
+'''
+
+
+import stat as _stat
+import tarfile as _tarfile
+
+from collections import deque as _deque
+from concurrent.futures import Executor as _Executor
+from concurrent.futures import Future as _Future
+
+from . import __
+from . import compressors as _compressors
+from . import exceptions as _exceptions
+from . import filesystem as _filesystem
+from . import tracing as _tracing
+
+
+ARCHIVE_INDEX_NAME = '.archive-index.json'
+
+
+_BUFFER_SIZE = 64 << 20
+_CHUNK_SIZE = 1 << 20
+_CODA_CONTENT = _tarfile.NUL * ( _tarfile.BLOCKSIZE * 2 )
+_COMPRESSION_DEFAULT = _compressors.Compression( )
+_EXECUTABLE_MODES = _stat.S_IXUSR | _stat.S_IXGRP | _stat.S_IXOTH
+_INLINE_SIZE = 16 << 20
+_MEMBER_MTIME = 0
+
+
+class ArchiveSegment( __.immut.DataclassObject ):
+    ''' Independently compressed streams of archive members. '''
+
+    name: str
+    offset: int
+    size: int
+    references: tuple[ str, ... ] = ( )
+    digest: str = ''
+
+
+class ArchiveMember( __.immut.DataclassObject ):
+    ''' File or hard link in archive along with digest of its content. '''
+
+    name: str
+    size: int
+    digest: str
+    link: bool = False
+
+
+class ArchiveIndex( __.immut.DataclassObject ):
+    ''' Index of independently compressed streams in archive. '''
+
+    codec: _compressors.Codecs
+    head: int
+    segments: tuple[ ArchiveSegment, ... ]
+    coda: int
+    level: __.typx.Optional[ int ] = None
+    digest: str = ''
+
+    def access_segment(
+        self, name: str
+    ) -> __.typx.Optional[ ArchiveSegment ]:
+        ''' Returns segment with given name, if it exists. '''
+        for segment in self.segments:
+            if name == segment.name: return segment
+        return None
+
+    def survey_dependencies(
+        self, names: __.cabc.Collection[ str ]
+    ) -> frozenset[ str ]:
+        ''' Surveys named segments and segments, into which they link.
+
+            Links are followed transitively. Names without segments are
+            omitted.
+        '''
+        # Segments only link into earlier segments; one backward pass works.
+        dependencies: set[ str ] = set( )
+        for segment in reversed( self.segments ):
+            if segment.name not in names and segment.name not in dependencies:
+                continue
+            dependencies.add( segment.name )
+            dependencies.update( segment.references )
+        return frozenset( dependencies )
+
+    def survey_dependents(
+        self, names: __.cabc.Collection[ str ]
+    ) -> frozenset[ str ]:
+        ''' Surveys segments, which link into named segments.
+
+            Links are followed transitively. Named segments are not included,
+            unless they link into one another.
+        '''
+        # Segments only link into earlier segments; one forward pass works.
+        targets = set( names )
+        dependents: set[ str ] = set( )
+        for segment in self.segments:
+            if targets.isdisjoint( segment.references ): continue
+            dependents.add( segment.name )
+            targets.add( segment.name )
+        return frozenset( dependents )
+
+
+class ArchiveSurvey( __.immut.DataclassObject ):
+    ''' Index, if any, and members of archive. '''
+
+    index: __.typx.Optional[ ArchiveIndex ]
+    members: tuple[ ArchiveMember, ... ]
+
+
+def digest_archive( location: __.Path ) -> dict[ str, str ]:
+    ''' Digests compressed bytes of head and each segment of archive.
+
+        Digests are keyed by segment name; the head is keyed by the empty
+        name. Nothing is decompressed but the head. Archives without index
+        are digested whole, under the empty name.
+    '''
+    index = read_archive_index( location )
+    ranges = ( ( '', 0, None ), ) if index is None else (
+        ( '', 0, index.head ), *(
+            ( segment.name, segment.offset, segment.size )
+            for segment in index.segments ) )
+    digests: dict[ str, str ] = { }
+    with location.open( 'rb' ) as file:
+        for name, offset, size in ranges:
+            file.seek( offset )
+            digest = __.hashlib.sha256( )
+            remainder = size
+            while remainder is None or remainder > 0:
+                chunk = file.read(
+                    _CHUNK_SIZE if remainder is None
+                    else min( remainder, _CHUNK_SIZE ) )
+                if not chunk: break
+                digest.update( chunk )
+                if remainder is not None: remainder -= len( chunk )
+            digests[ name ] = digest.hexdigest( )
+    return digests
+
+
+def extract_archive(
+    location: __.Path,
+    destination: __.Path, *,
+    executor: __.typx.Optional[ _Executor ] = None,
+    selection: __.Absential[ __.cabc.Collection[ str ] ] = __.absent,
+) -> None:
+    ''' Extracts archive into destination directory.
+
+        The archive is decompressed in one sequential pass, while member
+        files are written on worker threads. The archive index is not
+        extracted, as it is not website content. Members, which would be
+        extracted outside of the destination, invalidate the archive. This
+        includes members beneath symlinks, which lead outside, and symlinks
+        and hard links, whose targets lie outside, once all symlinks along
+        the way are resolved.
+
+        If a selection is given and the archive has an index, then only the
+        head and the selected segments, along with segments into which they
+        link, are decompressed. Other segments are skipped by seeking past
+        them. Archives without index are extracted whole.
+    '''
+    destination.mkdir( parents = True, exist_ok = True )
+    ranges = _survey_ranges( location, selection )
+    with (
+        location.open( 'rb' ) as file,
+        _filesystem.provide_executor( executor ) as executor_,
+    ):
+        extractor = _MemberExtractor( location, destination, executor_ )
+        files = 0
+        for offset, limit in ranges:
+            file.seek( offset )
+            with _open_streams( file, limit ) as archive:
+                for member in archive:
+                    extractor.extract_member( archive, member )
+                    files += 1
+        extractor.complete( )
+        size = sum( limit or file.tell( ) for _, limit in ranges )
+    _tracing.record_progress( size = size, files = files )
+
+
+def read_archive_index(
+    location: __.Path
+) -> __.typx.Optional[ ArchiveIndex ]:
+    ''' Reads index of segmented archive.
+
+        Only the head of the archive is decompressed. Returns ``None`` for
+        archives which lack an index, such as ones made by ordinary tools.
+    '''
+    data: __.typx.Any = None
+    with _open_archive( location ) as archive:
+        for member in archive:
+            name = _normalize_member_name( member.name )
+            # Head only has top-level non-directories; anything else ends it.
+            if member.isdir( ) or '/' in name: break
+            if ARCHIVE_INDEX_NAME != name: continue
+            file = archive.extractfile( member )
+            if file is not None: data = __.json.load( file )
+            break
+    if data is None: return None
+    return _produce_archive_index( location, data )
+
+
+def read_archive_member(
+    location: __.Path, name: str
+) -> __.typx.Optional[ bytes ]:
+    ''' Reads content of archive member by name without extraction.
+
+        Decompression stops as soon as the member is found. Returns ``None``
+        if the archive has no such member.
+    '''
+    with _open_archive( location ) as archive:
+        for member in archive:
+            if _normalize_member_name( member.name ) != name: continue
+            file = archive.extractfile( member )
+            return None if file is None else file.read( )
+    return None
+
+
+def survey_archive( location: __.Path ) -> ArchiveSurvey:
+    ''' Surveys index and members of archive in one sequential pass.
+
+        Content of files is hashed as it is decompressed, so that duplicate
+        content can be recognized. Hard links carry the size and digest of
+        their targets; links to targets outside the archive have neither.
+        Directories, symlinks, and the archive index itself are omitted.
+    '''
+    data: __.typx.Any = None
+    members: dict[ str, ArchiveMember ] = { }
+    with _open_archive( location ) as archive:
+        for member in archive:
+            name = _normalize_member_name( member.name )
+            if member.islnk( ):
+                target = members.get(
+                    _normalize_member_name( member.linkname ) )
+                members[ name ] = ArchiveMember(
+                    name = name,
+                    size = 0 if target is None else target.size,
+                    digest = '' if target is None else target.digest,
+                    link = True )
+                continue
+            file = archive.extractfile( member ) if member.isreg( ) else None
+            if file is None: continue
+            if ARCHIVE_INDEX_NAME == name:
+                data = __.json.load( file )
+                continue
+            digest = __.hashlib.sha256( )
+            while chunk := file.read( _CHUNK_SIZE ): digest.update( chunk )
+            members[ name ] = ArchiveMember(
+                name = name, size = member.size, digest = digest.hexdigest( ) )
+    return ArchiveSurvey(
+        index = None if data is None
+        else _produce_archive_index( location, data ),
+        members = tuple( members.values( ) ) )
+
+
+def write_archive( # noqa: PLR0913
+    location: __.Path,
+    source: __.Path, *,
+    compression: _compressors.Compression = _COMPRESSION_DEFAULT,
+    leaders: __.cabc.Sequence[ str ] = ( ),
+    trailers: __.cabc.Sequence[ str ] = ( ),
+    reusables: __.cabc.Collection[ str ] = ( ),
+    retainables: __.cabc.Collection[ str ] = ( ),
+    selection: __.Absential[ __.cabc.Collection[ str ] ] = __.absent,
+    exclusions: __.cabc.Collection[ str ] = ( ),
+    prerequisite: __.typx.Optional[ _Future[ __.typx.Any ] ] = None,
+) -> ArchiveIndex:
+    ''' Writes segmented archive of source directory to location.
+
+        If a selection is given, then only the top-level entries, which are
+        named in it, are archived. Entries, which are named in exclusions,
+        are not archived at any depth.
+
+        Top-level files are surveyed only after all segments are
+        compressed and after the prerequisite, if any, is complete. So,
+        they may be produced concurrently with compression of segments.
+
+        Top-level files, which are named in leaders, are written first and
+        in the given order, so that readers can find them after
+        decompressing only a few kilobytes. Top-level directories, which are
+        named in trailers, are written last and in the given order.
+
+        Files with several hard links in the source directory are stored
+        once; later occurrences become hard link members. Segments record
+        which other segments they link into.
+
+        Segments, which are named in reusables and which are present in the
+        extant archive at location, are copied from it without
+        recompression, provided that the extant archive uses the same codec
+        and that all segments, into which they link, are reused too. All
+        other segments are compressed anew. The archive is replaced
+        atomically.
+
+        Segments, which are named in retainables but which have no
+        directory in the source, are copied from the extant archive too,
+        in their places among the other segments. Thus, directories, which
+        were never extracted, are kept. Retained segments must be present
+        in the extant archive and may only link into reused or retained
+        segments.
+
+        Other segments, whose content is identical to that of segments in
+        the extant archive, which was compressed with the same codec and
+        level, are copied too, since compression would reproduce them
+        exactly. If nothing differs from the extant archive at all, then it
+        is left as it is and its index is returned.
+    '''
+    extant = read_archive_index( location ) if location.is_file( ) else None
+    if extant and extant.codec is not compression.codec: extant = None
+    retentions = frozenset(
+        name for name in retainables
+        if not __.os.path.lexists( source / name ) )
+    directories = sorted(
+        (   *(  entry for entry in _survey_entries(
+                    source, leaders, trailers, selection, exclusions )
+                if _is_directory( entry ) ),
+            *( source / name for name in retentions ) ),
+        key = _rank_entries( leaders, trailers ) )
+    producer = _MemberProducer( source, exclusions, compression.ordering )
+    plans = _plan_segments( directories, extant, reusables, retentions )
+    if extant and extant.level == compression.level:
+        plans = _match_segments(
+            directories, plans, extant,
+            _MemberProducer( source, exclusions, compression.ordering ) )
+    with __.tempfile.TemporaryDirectory(
+        dir = location.parent, prefix = '.archive-'
+    ) as scratch_:
+        scratch = __.Path( scratch_ )
+        staging = scratch / 'segments'
+        with staging.open( 'wb' ) as target:
+            sizes = _compressors.compress_streams(
+                target,
+                producer.produce_segments( directories, plans ),
+                compression )
+        plans = _complete_plans(
+            plans, sizes, producer.references, producer.digests )
+        if prerequisite is not None: prerequisite.result( )
+        heads = [
+            entry for entry in
+            _survey_entries( source, leaders, trailers, selection, exclusions )
+            if not _is_directory( entry ) ]
+        digest = _digest_chunks(
+            chunk for head in heads
+            for chunk in producer.produce_member( head, linkable = False ) )
+        if extant and _is_archive_unchanged( extant, plans, digest ):
+            return extant
+        coda = _compressors.provide_codec( compression.codec ).compress(
+            _CODA_CONTENT, compression.level )
+        manifest = dict(
+            codec = compression.codec.value,
+            level = compression.level,
+            digest = digest,
+            segments = [ plan.render_manifest( ) for plan in plans ],
+            coda = len( coda ) )
+        temporary = scratch / 'archive'
+        with temporary.open( 'wb' ) as target:
+            head, = _compressors.compress_streams(
+                target,
+                ( producer.produce_head( heads, manifest ), ),
+                compression )
+            _assemble_segments( target, location, staging, plans )
+            target.write( coda )
+        __.os.replace( temporary, location )
+    _tracing.record_progress( size = location.stat( ).st_size, files = 1 )
+    return _produce_archive_index( location, manifest, head = head )
+
+
+class _SegmentPlan( __.immut.DataclassObject ):
+    ''' Origin of compressed segment for new archive. '''
+
+    name: str
+    reused: bool
+    offset: int = 0
+    size: int = 0
+    references: tuple[ str, ... ] = ( )
+    digest: str = ''
+
+    def render_manifest( self ) -> dict[ str, __.typx.Any ]:
+        ''' Renders entry for archive index. '''
+        entry: dict[ str, __.typx.Any ] = dict(
+            name = self.name, size = self.size )
+        if self.references: entry[ 'references' ] = list( self.references )
+        if self.digest: entry[ 'digest' ] = self.digest
+        return entry
+
+
+class _MemberExtractor:
+    ''' Extracts archive members, writing files on worker threads.
+
+        Member contents are read sequentially on the calling thread. The
+        amount of content, which awaits writing, is bounded. Large members
+        are written directly from the archive stream.
+    '''
+
+    def __init__(
+        self, location: __.Path, destination: __.Path, executor: _Executor
+    ):
+        self.location = location
+        self.destination = destination
+        self.executor = executor
+        self.directories: list[ tuple[ __.Path, _tarfile.TarInfo ] ] = [ ]
+        self.parents: dict[ str, __.Path ] = { }
+        self.pending: dict[ str, _Future[ None ] ] = { }
+        self.buffer: _deque[ tuple[ _Future[ None ], int ] ] = _deque( )
+        self.buffer_size = 0
+
+    def complete( self ) -> None:
+        ''' Awaits pending writes and then applies directory metadata. '''
+        for future in self.pending.values( ): future.result( )
+        self.pending.clear( )
+        for location, member in reversed( self.directories ):
+            _apply_member_metadata( location, member )
+
+    def extract_member(
+        self, archive: _tarfile.TarFile, member: _tarfile.TarInfo
+    ) -> None:
+        ''' Extracts directory, file, hard link, or symlink member. '''
+        name = _normalize_member_name( member.name )
+        if name in ( '', '.', ARCHIVE_INDEX_NAME ): return
+        location = self._locate( name )
+        if member.isdir( ):
+            location.mkdir( parents = True, exist_ok = True )
+            self.directories.append( ( location, member ) )
+            return
+        location.parent.mkdir( parents = True, exist_ok = True )
+        self._await( name )
+        if location.is_symlink( ):
+            location.unlink( )
+            self.parents.clear( )
+        elif location.is_file( ): location.unlink( )
+        if member.isreg( ): self._extract_file( archive, member, location )
+        elif member.islnk( ):
+            linkname = _normalize_member_name( member.linkname )
+            # Real target, since hard links follow symlinks.
+            target = self._confine( linkname )
+            self._await( linkname )
+            __.os.link( target, location )
+        elif member.issym( ):
+            # Symlink targets must also remain within destination.
+            base = __.os.path.dirname( name )
+            self._confine( __.os.path.join( base, member.linkname ) )
+            __.os.symlink( member.linkname, location )
+            # Symlink may redirect parents, which were located before.
+            self.parents.clear( )
+        else: raise _exceptions.ArchiveInvalidity( self.location )
+
+    def _await( self, name: str ) -> None:
+        future = self.pending.pop( name, None )
+        if future is not None: future.result( )
+
+    def _extract_file(
+        self,
+        archive: _tarfile.TarFile,
+        member: _tarfile.TarInfo,
+        location: __.Path,
+    ) -> None:
+        source = archive.extractfile( member )
+        if source is None: raise _exceptions.ArchiveInvalidity( self.location )
+        if member.size > _INLINE_SIZE:
+            with location.open( 'wb' ) as target:
+                __.shutil.copyfileobj( source, target, _CHUNK_SIZE )
+            _apply_member_metadata( location, member )
+            return
+        content = source.read( )
+        future = self.executor.submit(
+            _write_member, location, member, content )
+        self.pending[ _normalize_member_name( member.name ) ] = future
+        self.buffer.append( ( future, len( content ) ) )
+        self.buffer_size += len( content )
+        while self.buffer_size > _BUFFER_SIZE:
+            future_, size = self.buffer.popleft( )
+            future_.result( )
+            self.buffer_size -= size
+
+    def _confine( self, path: str ) -> __.Path:
+        ''' Resolves path within destination or rejects archive. '''
+        try: return _filesystem.locate_within( self.destination, path )
+        except _exceptions.PathInvalidity as exception:
+            raise _exceptions.ArchiveInvalidity( self.location ) from exception
+
+    def _locate( self, name: str ) -> __.Path:
+        ''' Locates member within destination or rejects archive.
+
+            The parent directory is resolved through any symlinks, which
+            earlier members may have created, and is remembered until the
+            next symlink changes. The member itself is not resolved, since
+            it replaces any symlink at its location.
+        '''
+        directory, basename = __.os.path.split( name )
+        if basename in ( '', '.', '..' ):
+            raise _exceptions.ArchiveInvalidity( self.location )
+        parent = self.parents.get( directory )
+        if parent is None:
+            parent = self.parents[ directory ] = self._confine( directory )
+        return parent / basename
+
+
+class _MemberProducer:
+    ''' Produces tar members, tracking hard links across segments.
+
+        Members of each tree are produced depth first in sorted order or,
+        if clustered, with all directories first and then all other entries
+        grouped by suffix and name. Thus, similar files, such as pages or
+        stylesheets from different parts of a tree, are adjacent, where the
+        compressor can match them against each other.
+    '''
+
+    def __init__(
+        self,
+        source: __.Path,
+        exclusions: __.cabc.Collection[ str ] = ( ),
+        ordering: _compressors.Orderings = _compressors.Orderings.Tree,
+    ):
+        self.source = source
+        self.exclusions = exclusions
+        self.ordering = ordering
+        self.links: dict[ tuple[ int, int ], str ] = { }
+        self.references: dict[ str, set[ str ] ] = { }
+        self.digests: dict[ str, str ] = { }
+
+    def produce_head(
+        self,
+        locations: __.cabc.Sequence[ __.Path ],
+        manifest: __.cabc.Mapping[ str, __.typx.Any ],
+    ) -> __.cabc.Iterator[ bytes ]:
+        ''' Produces tar members for head stream, including archive index.
+
+            Hard links are not tracked in the head, since it is always
+            written anew and must not depend on any segment.
+        '''
+        for location in locations:
+            yield from self.produce_member( location, linkable = False )
+        yield from _produce_blob_chunks(
+            ARCHIVE_INDEX_NAME, __.json.dumps( manifest ).encode( ) )
+
+    def produce_member(
+        self, location: __.Path, linkable: bool = True
+    ) -> __.cabc.Iterator[ bytes ]:
+        ''' Produces tar member for file, directory, or symlink. '''
+        arcname = location.relative_to( self.source ).as_posix( )
+        status = location.lstat( )
+        info = _produce_tarinfo( arcname, status )
+        if info.issym( ): info.linkname = __.os.readlink( location )
+        elif linkable and info.isreg( ) and status.st_nlink > 1:
+            key = ( status.st_dev, status.st_ino )
+            linkname = self.links.setdefault( key, arcname )
+            if linkname != arcname:
+                info.type = _tarfile.LNKTYPE
+                info.linkname = linkname
+                info.size = 0
+                self._record_reference( arcname, linkname )
+        yield info.tobuf( _tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape' )
+        if info.isreg( ): yield from _produce_file_chunks( location, info )
+
+    def produce_segments(
+        self,
+        directories: __.cabc.Sequence[ __.Path ],
+        plans: __.cabc.Sequence[ _SegmentPlan ],
+    ) -> __.cabc.Iterator[ __.cabc.Iterator[ bytes ] ]:
+        ''' Produces member streams of renewed segments in order.
+
+            Files of reused segments are registered in their turn, so that
+            later segments link to them just as they would to files of
+            renewed segments. Renewed segments are digested, as they are
+            produced.
+        '''
+        for directory, plan in zip( directories, plans, strict = True ):
+            if not plan.reused:
+                yield self._digest( plan.name, self.produce_tree( directory ) )
+            # Retained segments have no directories to register.
+            elif _is_directory( directory ): self.register_tree( directory )
+
+    def produce_tree(
+        self, location: __.Path
+    ) -> __.cabc.Iterator[ bytes ]:
+        ''' Produces tar members for directory tree in archive order. '''
+        for entry in self.survey_tree( location ):
+            yield from self.produce_member( entry )
+
+    def register_tree( self, location: __.Path ) -> None:
+        ''' Registers hard-linked files of tree in archive order. '''
+        for entry in self.survey_tree( location ):
+            status = entry.lstat( )
+            if not _stat.S_ISREG( status.st_mode ): continue
+            if status.st_nlink < 2: continue # noqa: PLR2004
+            arcname = entry.relative_to( self.source ).as_posix( )
+            self.links.setdefault( ( status.st_dev, status.st_ino ), arcname )
+
+    def survey_tree( self, location: __.Path ) -> list[ __.Path ]:
+        ''' Surveys entries of directory tree in archive order. '''
+        entries = list( self._walk_tree( location ) )
+        if self.ordering is _compressors.Orderings.Tree: return entries
+        directories = [ entry for entry in entries if _is_directory( entry ) ]
+        others = [ entry for entry in entries if not _is_directory( entry ) ]
+        others.sort( key = lambda entry: (
+            entry.suffix.lower( ), entry.name,
+            entry.relative_to( location ).as_posix( ) ) )
+        return [ *directories, *others ]
+
+    def _digest(
+        self, name: str, chunks: __.cabc.Iterable[ bytes ]
+    ) -> __.cabc.Iterator[ bytes ]:
+        ''' Passes chunks through, while digesting them under name. '''
+        digest = __.hashlib.sha256( )
+        for chunk in chunks:
+            digest.update( chunk )
+            yield chunk
+        self.digests[ name ] = digest.hexdigest( )
+
+    def _walk_tree(
+        self, location: __.Path
+    ) -> __.cabc.Iterator[ __.Path ]:
+        ''' Walks tree depth first in sorted order, sans exclusions. '''
+        yield location
+        if not _is_directory( location ): return
+        for entry in sorted(
+            (   entry for entry in location.iterdir( )
+                if entry.name not in self.exclusions ),
+            key = lambda entry: entry.name
+        ): yield from self._walk_tree( entry )
+
+    def _record_reference( self, arcname: str, linkname: str ) -> None:
+        segment = arcname.split( '/', maxsplit = 1 )[ 0 ]
+        target = linkname.split( '/', maxsplit = 1 )[ 0 ]
+        if segment == target: return
+        self.references.setdefault( segment, set( ) ).add( target )
+
+
+def _apply_member_metadata(
+    location: __.Path, member: _tarfile.TarInfo
+) -> None:
+    __.os.chmod( location, member.mode )
+    __.os.utime( location, ( member.mtime, member.mtime ) )
+
+
+def _assemble_segments(
+    target: __.typx.BinaryIO,
+    location: __.Path,
+    staging: __.Path,
+    plans: __.cabc.Sequence[ _SegmentPlan ],
+) -> None:
+    ''' Appends compressed segments from staging file or extant archive. '''
+    with staging.open( 'rb' ) as renewals, __.ctxl.ExitStack( ) as exits:
+        extant: __.typx.Optional[ __.typx.BinaryIO ] = None
+        for plan in plans:
+            if plan.reused:
+                if extant is None:
+                    extant = exits.enter_context( location.open( 'rb' ) )
+                origin = extant
+            else: origin = renewals
+            origin.seek( plan.offset )
+            _copy_range( origin, target, plan.size )
+
+
+def _complete_plans(
+    plans: __.cabc.Sequence[ _SegmentPlan ],
+    sizes: __.cabc.Sequence[ int ],
+    references: __.cabc.Mapping[ str, __.cabc.Set[ str ] ],
+    digests: __.cabc.Mapping[ str, str ],
+) -> tuple[ _SegmentPlan, ... ]:
+    ''' Completes plans for renewed segments with staged sizes and links.
+
+        Digests of their uncompressed content are completed too.
+    '''
+    completions: list[ _SegmentPlan ] = [ ]
+    sizes_ = iter( sizes )
+    offset = 0
+    for plan in plans:
+        if plan.reused:
+            completions.append( plan )
+            continue
+        size = next( sizes_ )
+        completions.append( _SegmentPlan(
+            name = plan.name, reused = False, offset = offset, size = size,
+            references = tuple( sorted( references.get( plan.name, ( ) ) ) ),
+            digest = digests[ plan.name ],
+        ) )
+        offset += size
+    return tuple( completions )
+
+
+def _copy_range(
+    source: __.typx.BinaryIO, target: __.typx.BinaryIO, size: int
+) -> None:
+    ''' Copies range of bytes from current position of source to target. '''
+    while size > 0:
+        chunk = source.read( min( size, _CHUNK_SIZE ) )
+        if not chunk: raise _exceptions.ArchiveInvalidity( source.name )
+        target.write( chunk )
+        size -= len( chunk )
+
+
+def _digest_chunks( chunks: __.cabc.Iterable[ bytes ] ) -> str:
+    digest = __.hashlib.sha256( )
+    for chunk in chunks: digest.update( chunk )
+    return digest.hexdigest( )
+
+
+def _is_archive_unchanged(
+    extant: ArchiveIndex,
+    plans: __.cabc.Sequence[ _SegmentPlan ],
+    digest: str,
+) -> bool:
+    ''' Would new archive be identical to extant archive?
+
+        This is the case, if all segments are reused in their extant order
+        and if the content of the head is unchanged.
+    '''
+    return (
+            digest == extant.digest
+        and all( plan.reused for plan in plans )
+        and [ plan.name for plan in plans ]
+            == [ segment.name for segment in extant.segments ] )
+
+
+def _is_directory( location: __.Path ) -> bool:
+    return location.is_dir( ) and not location.is_symlink( )
+
+
+def _match_segments(
+    directories: __.cabc.Sequence[ __.Path ],
+    plans: __.cabc.Sequence[ _SegmentPlan ],
+    extant: ArchiveIndex,
+    producer: _MemberProducer,
+) -> list[ _SegmentPlan ]:
+    ''' Reuses extant segments, whose content is unchanged, instead.
+
+        Candidates for renewal, which have digests in the extant archive,
+        are digested without compression. Like other reused segments, they
+        must only link into segments, which are reused before them.
+    '''
+    matches: list[ _SegmentPlan ] = [ ]
+    reused: set[ str ] = set( )
+    for directory, plan in zip( directories, plans, strict = True ):
+        segment = extant.access_segment( plan.name )
+        if plan.reused or segment is None or not segment.digest:
+            if plan.reused: reused.add( plan.name )
+            if _is_directory( directory ): producer.register_tree( directory )
+            matches.append( plan )
+            continue
+        digest = _digest_chunks( producer.produce_tree( directory ) )
+        if (    digest != segment.digest
+            or not reused.issuperset( segment.references )
+        ):
+            matches.append( plan )
+            continue
+        reused.add( plan.name )
+        matches.append( _SegmentPlan(
+            name = plan.name, reused = True,
+            offset = segment.offset, size = segment.size,
+            references = segment.references, digest = segment.digest ) )
+    return matches
+
+
+def _normalize_member_name( name: str ) -> str:
+    return name.removeprefix( './' )
+
+
+@__.ctxl.contextmanager
+def _open_archive(
+    location: __.Path
+) -> __.cabc.Iterator[ _tarfile.TarFile ]:
+    ''' Opens archive for sequential reading with detected codec. '''
+    with location.open( 'rb' ) as file, _open_streams( file ) as archive:
+        yield archive
+
+
+@__.ctxl.contextmanager
+def _open_streams(
+    file: __.typx.BinaryIO, size: __.typx.Optional[ int ] = None
+) -> __.cabc.Iterator[ _tarfile.TarFile ]:
+    ''' Opens streams at current position for sequential reading.
+
+        If a size is given, then reading stops after that many compressed
+        bytes, so that a head or segment can be read alone.
+    '''
+    with (
+        _compressors.produce_decompression_stream( file, size ) as stream,
+        _tarfile.open( fileobj = stream, mode = 'r|' ) as archive,
+    ): yield archive
+
+
+def _plan_segments(
+    directories: __.cabc.Sequence[ __.Path ],
+    extant: __.typx.Optional[ ArchiveIndex ],
+    reusables: __.cabc.Collection[ str ],
+    retentions: __.cabc.Collection[ str ] = ( ),
+) -> list[ _SegmentPlan ]:
+    ''' Plans reuse or renewal of segment for each directory.
+
+        A segment is only reused if all segments, into which it links, are
+        reused before it. Otherwise, its hard links could dangle. Retained
+        segments, which cannot be renewed, must be reused.
+    '''
+    plans: list[ _SegmentPlan ] = [ ]
+    reused: set[ str ] = set( )
+    for directory in directories:
+        name = directory.name
+        segment = (
+            extant.access_segment( name )
+            if extant and ( name in reusables or name in retentions )
+            else None )
+        if segment is None or not reused.issuperset( segment.references ):
+            if name in retentions:
+                raise _exceptions.DirectoryAwol( directory )
+            plans.append( _SegmentPlan( name = name, reused = False ) )
+            continue
+        reused.add( name )
+        plans.append( _SegmentPlan(
+            name = name, reused = True,
+            offset = segment.offset, size = segment.size,
+            references = segment.references, digest = segment.digest ) )
+    return plans
+
+
+def _produce_archive_index(
+    location: __.Path,
+    data: __.cabc.Mapping[ str, __.typx.Any ],
+    head: __.Absential[ int ] = __.absent,
+) -> ArchiveIndex:
+    ''' Produces archive index from manifest data and archive size. '''
+    try:
+        codec = _compressors.Codecs( data.get( 'codec', 'xz' ) )
+        level = data.get( 'level' )
+        level = None if level is None else int( level )
+        entries = [
+            (   str( e[ 'name' ] ), int( e[ 'size' ] ),
+                tuple( map( str, e.get( 'references', ( ) ) ) ),
+                str( e.get( 'digest', '' ) ) )
+            for e in data[ 'segments' ] ]
+        coda = int( data[ 'coda' ] )
+    except ( AttributeError, KeyError, TypeError, ValueError ) as exception:
+        raise _exceptions.ArchiveInvalidity( location ) from exception
+    if __.is_absent( head ):
+        head = location.stat( ).st_size - coda - sum(
+            size for _, size, _, _ in entries )
+    segments: list[ ArchiveSegment ] = [ ]
+    offset = head
+    for name, size, references, digest in entries:
+        segments.append( ArchiveSegment(
+            name = name, offset = offset, size = size,
+            references = references, digest = digest ) )
+        offset += size
+    return ArchiveIndex(
+        codec = codec,
+        head = head, segments = tuple( segments ), coda = coda,
+        level = level, digest = str( data.get( 'digest', '' ) ) )
+
+
+def _produce_blob_chunks(
+    arcname: str, content: bytes
+) -> __.cabc.Iterator[ bytes ]:
+    ''' Produces tar member from in-memory content. '''
+    info = _tarfile.TarInfo( arcname )
+    info.size = len( content )
+    info.mode = 0o644
+    info.mtime = _MEMBER_MTIME
+    yield info.tobuf( _tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape' )
+    yield content
+    yield _produce_padding( info.size )
+
+
+def _produce_file_chunks(
+    location: __.Path, info: _tarfile.TarInfo
+) -> __.cabc.Iterator[ bytes ]:
+    ''' Produces content of regular file member, padded to block size. '''
+    remainder = info.size
+    with location.open( 'rb' ) as file:
+        while remainder > 0:
+            chunk = file.read( min( remainder, _CHUNK_SIZE ) )
+            if not chunk: raise _exceptions.FileEmpty( location )
+            remainder -= len( chunk )
+            yield chunk
+    yield _produce_padding( info.size )
+
+
+def _produce_padding( size: int ) -> bytes:
+    remainder = size % _tarfile.BLOCKSIZE
+    if not remainder: return b''
+    return _tarfile.NUL * ( _tarfile.BLOCKSIZE - remainder )
+
+
+def _produce_tarinfo(
+    arcname: str, status: __.os.stat_result
+) -> _tarfile.TarInfo:
+    ''' Produces tar member header from file status.
+
+        Metadata is normalized for reproducibility. Owners are dropped,
+        modification times are fixed, and modes only retain whether files
+        are executable.
+    '''
+    info = _tarfile.TarInfo( arcname )
+    info.mtime = _MEMBER_MTIME
+    if _stat.S_ISDIR( status.st_mode ):
+        info.type = _tarfile.DIRTYPE
+        info.mode = 0o755
+    elif _stat.S_ISLNK( status.st_mode ):
+        info.type = _tarfile.SYMTYPE
+        info.mode = 0o777
+    else:
+        info.size = status.st_size
+        info.mode = 0o755 if status.st_mode & _EXECUTABLE_MODES else 0o644
+    return info
+
+
+def _rank_entries(
+    leaders: __.cabc.Sequence[ str ],
+    trailers: __.cabc.Sequence[ str ],
+) -> __.cabc.Callable[ [ __.Path ], tuple[ int, str ] ]:
+    ''' Produces sort key, which ranks leaders first and trailers last. '''
+    ranks = { name: rank for rank, name in enumerate( leaders ) }
+    middle = len( ranks )
+    ranks.update( {
+        name: middle + 1 + rank for rank, name in enumerate( trailers ) } )
+    return lambda entry: ( ranks.get( entry.name, middle ), entry.name )
+
+
+def _sort_entries(
+    source: __.Path,
+    leaders: __.cabc.Sequence[ str ],
+    trailers: __.cabc.Sequence[ str ],
+) -> list[ __.Path ]:
+    ''' Sorts top-level entries with leaders first and trailers last. '''
+    return sorted(
+        source.iterdir( ), key = _rank_entries( leaders, trailers ) )
+
+
+def _survey_entries(
+    source: __.Path,
+    leaders: __.cabc.Sequence[ str ],
+    trailers: __.cabc.Sequence[ str ],
+    selection: __.Absential[ __.cabc.Collection[ str ] ],
+    exclusions: __.cabc.Collection[ str ] = ( ),
+) -> list[ __.Path ]:
+    ''' Surveys selected top-level entries in archive order. '''
+    entries = [
+        entry for entry in _sort_entries( source, leaders, trailers )
+        if entry.name not in exclusions ]
+    if __.is_absent( selection ): return entries
+    return [ entry for entry in entries if entry.name in selection ]
+
+
+def _survey_ranges(
+    location: __.Path, selection: __.Absential[ __.cabc.Collection[ str ] ]
+) -> tuple[ tuple[ int, __.typx.Optional[ int ] ], ... ]:
+    ''' Surveys offsets and sizes of streams, which selection needs.
+
+        Without selection or index, the whole archive is one range.
+    '''
+    whole = ( ( 0, None ), )
+    if __.is_absent( selection ): return whole
+    index = read_archive_index( location )
+    if index is None: return whole
+    names = index.survey_dependencies( selection )
+    return ( ( 0, index.head ), *(
+        ( segment.offset, segment.size ) for segment in index.segments
+        if segment.name in names ) )
+
+
+def _write_member(
+    location: __.Path, member: _tarfile.TarInfo, content: bytes
+) -> None:
+    location.write_bytes( content )
+    _apply_member_metadata( location, member )
@@ -0,0 +1,302 @@
+# vim: set filetype=python fileencoding=utf-8:
+# -*- coding: utf-8 -*-
+
+#============================================================================#
+#                                                                            #
+#  Licensed under the Apache License, Version 2.0 (the "License");           #
+#  you may not use this file except in compliance with the License.          #
+#  You may obtain a copy of the License at                                   #
+#                                                                            #
+#      http://www.apache.org/licenses/LICENSE-2.0                            #
+#                                                                            #
+#  Unless required by applicable law or agreed to in writing, software       #
+#  distributed under the License is distributed on an "AS IS" BASIS,         #
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  #
+#  See the License for the specific language governing permissions and       #
+#  limitations under the License.                                            #
+#                                                                            #
+#============================================================================#
+
+
+''' Compression codecs for website archives.
+
+    Data is compressed as a sequence of independent streams, which
+    decompressors treat as one. Large inputs are cut into blocks, which are
+    compressed concurrently on worker threads, much as ``xz --threads`` does.
+    Codecs are detected from the leading bytes of compressed data.
+'''
+
+
+import lzma as _lzma
+
+from collections import deque as _deque
+from concurrent.futures import Future as _Future
+from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
+
+from . import __
+from . import exceptions as _exceptions
+
+
+_BLOCK_SIZE = 16 << 20
+_CHUNK_SIZE = 1 << 20
+_INPUT_SIZE = 1 << 16
+
+
+class Codecs( __.enum.Enum ): # TODO: Python 3.11: StrEnum
+    ''' Compression codecs for archives. '''
+
+    Xz =    'xz'
+    Zstd =  'zstd'
+
+
+ARCHIVE_SUFFIXES: __.cabc.Mapping[ Codecs, str ] = (
+    __.types.MappingProxyType( {
+        Codecs.Xz: '.tar.xz',
+        Codecs.Zstd: '.tar.zst',
+    } ) )
+
+
+class Orderings( __.enum.Enum ): # TODO: Python 3.11: StrEnum
+    ''' Orderings of members within archive segments. '''
+
+    Clustered = 'clustered'
+    Tree =      'tree'
+
+
+class Compression( __.immut.DataclassObject ):
+    ''' Compression settings for archives. '''
+
+    codec: __.typx.Annotated[
+        Codecs,
+        __.typx.Doc( ''' Compression codec for new archive streams. ''' ),
+        __.tyro.conf.arg( name = 'codec', prefix_name = False ),
+    ] = Codecs.Xz
+    level: __.typx.Annotated[
+        __.typx.Optional[ int ],
+        __.typx.Doc( ''' Compression level. Codec default, if absent. ''' ),
+        __.tyro.conf.arg( name = 'compression-level', prefix_name = False ),
+    ] = None
+    workers: __.typx.Annotated[
+        int,
+        __.typx.Doc( ''' Number of compression threads.
+                     Zero means one per processor. ''' ),
+        __.tyro.conf.arg( name = 'compression-workers', prefix_name = False ),
+    ] = 0
+    ordering: __.typx.Annotated[
+        Orderings,
+        __.typx.Doc( ''' Order of members within each archive segment.
+                     Depth-first by directory or clustered by file type,
+                     so that similar files are adjacent for compressor. ''' ),
+        __.tyro.conf.arg( name = 'member-ordering', prefix_name = False ),
+    ] = Orderings.Tree
+
+    def calculate_workers( self ) -> int:
+        ''' Calculates effective number of compression threads. '''
+        if self.workers > 0: return self.workers
+        return __.os.cpu_count( ) or 1
+
+
+class _Decompressor( __.typx.Protocol ):
+    ''' Incremental decompressor for single stream. '''
+
+    @property
+    def eof( self ) -> bool: ... # pragma: no cover
+
+    @property
+    def unused_data( self ) -> bytes: ... # pragma: no cover
+
+    def decompress( self, data: bytes ) -> bytes: ... # pragma: no cover
+
+
+class _Codec( __.typx.Protocol ):
+    ''' Compression codec implementation. '''
+
+    def compress(
+        self, data: bytes, level: __.typx.Optional[ int ]
+    ) -> bytes: ... # pragma: no cover
+
+    def produce_decompressor( self ) -> _Decompressor: ... # pragma: no cover
+
+
+class _XzCodec:
+    ''' XZ codec from standard library. '''
+
+    def compress(
+        self, data: bytes, level: __.typx.Optional[ int ]
+    ) -> bytes:
+        return _lzma.compress( data, format = _lzma.FORMAT_XZ, preset = level )
+
+    def produce_decompressor( self ) -> _Decompressor:
+        return _lzma.LZMADecompressor( format = _lzma.FORMAT_XZ )
+
+
+class _ZstdCodec:
+    ''' Zstandard codec from standard library or 'zstandard' package. '''
+
+    def __init__( self, module: __.typx.Any, stdlib: bool ):
+        self._module = module
+        self._stdlib = stdlib
+
+    def compress(
+        self, data: bytes, level: __.typx.Optional[ int ]
+    ) -> bytes:
+        if self._stdlib: return self._module.compress( data, level = level )
+        compressor = self._module.ZstdCompressor(
+            level = 3 if level is None else level )
+        return compressor.compress( data )
+
+    def produce_decompressor( self ) -> _Decompressor:
+        if self._stdlib: return self._module.ZstdDecompressor( )
+        return self._module.ZstdDecompressor( ).decompressobj( )
+
+
+_MAGIC_NUMBERS: __.cabc.Mapping[ bytes, Codecs ] = __.types.MappingProxyType( {
+    b'\xfd7zXZ\x00': Codecs.Xz,
+    b'\x28\xb5\x2f\xfd': Codecs.Zstd,
+} )
+_XZ_CODEC = _XzCodec( )
+
+
+class _DecompressionReader( __.io.RawIOBase ):
+    ''' Sequential reader of concatenated compressed streams. '''
+
+    def __init__(
+        self,
+        file: __.typx.BinaryIO,
+        codec: _Codec,
+        size: __.typx.Optional[ int ] = None,
+    ):
+        super( ).__init__( )
+        self._file = file
+        self._codec = codec
+        self._remainder = size
+        self._decompressor = codec.produce_decompressor( )
+        self._pristine = True
+        self._buffer = b''
+        self._offset = 0
+
+    def readable( self ) -> bool: return True
+
+    def readinto( self, buffer: __.typx.Any ) -> int:
+        while self._offset >= len( self._buffer ):
+            if not self._replenish( ): return 0
+        size = min( len( buffer ), len( self._buffer ) - self._offset )
+        buffer[ : size ] = self._buffer[ self._offset : self._offset + size ]
+        self._offset += size
+        return size
+
+    def _replenish( self ) -> bool:
+        ''' Decompresses more data. Returns false at end of file. '''
+        data = b''
+        if self._decompressor.eof:
+            data = self._decompressor.unused_data
+            self._decompressor = self._codec.produce_decompressor( )
+            self._pristine = True
+        if not data: data = self._read( )
+        if not data:
+            if self._pristine: return False
+            raise _exceptions.ArchiveInvalidity( self._file.name )
+        self._pristine = False
+        self._buffer = self._decompressor.decompress( data )
+        self._offset = 0
+        return True
+
+    def _read( self ) -> bytes:
+        ''' Reads compressed data, up to remainder of size, if any. '''
+        if self._remainder is None: return self._file.read( _INPUT_SIZE )
+        data = self._file.read( min( _INPUT_SIZE, self._remainder ) )
+        self._remainder -= len( data )
+        return data
+
+
+def compress_streams(
+    target: __.typx.BinaryIO,
+    sources: __.cabc.Iterable[ __.cabc.Iterable[ bytes ] ],
+    compression: Compression,
+) -> tuple[ int, ... ]:
+    ''' Compresses each source into consecutive streams on target.
+
+        Sources are cut into blocks, which are compressed concurrently and
+        written in order. Returns compressed size of each source.
+    '''
+    codec = provide_codec( compression.codec )
+    workers = compression.calculate_workers( )
+    sizes: list[ int ] = [ ]
+    pending: _deque[ tuple[ int, _Future[ bytes ] ] ] = _deque( )
+    with _ThreadPoolExecutor( max_workers = workers ) as executor:
+        for index, chunks in enumerate( sources ):
+            sizes.append( 0 )
+            for block in _produce_blocks( chunks ):
+                pending.append( ( index, executor.submit(
+                    codec.compress, block, compression.level ) ) )
+                # Bound memory to one block in flight per worker.
+                while len( pending ) > workers:
+                    index_, future = pending.popleft( )
+                    sizes[ index_ ] += target.write( future.result( ) )
+        while pending:
+            index_, future = pending.popleft( )
+            sizes[ index_ ] += target.write( future.result( ) )
+    return tuple( sizes )
+
+
+def detect_codec( file: __.typx.BinaryIO ) -> Codecs:
+    ''' Detects codec from leading bytes of seekable file. '''
+    position = file.tell( )
+    leader = file.read( max( map( len, _MAGIC_NUMBERS ) ) )
+    file.seek( position )
+    for magic, codec in _MAGIC_NUMBERS.items( ):
+        if leader.startswith( magic ): return codec
+    raise _exceptions.ArchiveInvalidity( file.name )
+
+
+def produce_decompression_stream(
+    file: __.typx.BinaryIO, size: __.typx.Optional[ int ] = None
+) -> __.io.BufferedReader:
+    ''' Produces sequential decompressed stream from compressed file.
+
+        Codec is detected automatically. Compressed data is consumed in
+        small increments, so that readers which stop early do not pay for
+        decompression of data which they never read. If a size is given,
+        then only that many compressed bytes are consumed from the current
+        position of the file, so that a range of independent streams can
+        be decompressed alone.
+    '''
+    codec = provide_codec( detect_codec( file ) )
+    return __.io.BufferedReader(
+        _DecompressionReader( file, codec, size ),
+        buffer_size = _CHUNK_SIZE )
+
+
+def provide_codec( codec: Codecs ) -> _Codec:
+    ''' Provides implementation of codec.
+
+        Zstandard comes from the standard library on Python 3.14 and later.
+        On earlier versions, the optional 'zstandard' package is necessary.
+    '''
+    match codec:
+        case Codecs.Xz: return _XZ_CODEC
+        case Codecs.Zstd: return _provide_zstd_codec( )
+
+
+def _produce_blocks(
+    chunks: __.cabc.Iterable[ bytes ]
+) -> __.cabc.Iterator[ bytes ]:
+    ''' Gathers chunks into blocks for independent compression. '''
+    block = bytearray( )
+    for chunk in chunks:
+        block += chunk
+        if len( block ) >= _BLOCK_SIZE:
+            yield bytes( block )
+            block.clear( )
+    if block: yield bytes( block )
+
+
+def _provide_zstd_codec( ) -> _Codec:
+    try: from compression import zstd # pyright: ignore
+    except ImportError: pass
+    else: return _ZstdCodec( zstd, stdlib = True ) # pragma: no cover
+    try: import zstandard # pyright: ignore
+    except ImportError as exception:
+        raise _exceptions.CodecAwol(
+            Codecs.Zstd.value, 'zstandard' ) from exception
+    return _ZstdCodec( zstandard, stdlib = False ) # pragma: no cover
@@ -32,6 +32,22 @@ class Omnierror( Omniexception, Exception ):
     ''' Base for error exceptions raised by package API. '''
 
 
+class ArchiveInvalidity( Omnierror, ValueError ):
+    ''' Invalid or corrupt archive. '''
+
+    def __init__( self, location: str | __.Path ):
+        super( ).__init__( f"Invalid or corrupt archive at '{location}'." )
+
+
+class CodecAwol( Omnierror, ImportError ):
+    ''' Unavailable compression codec. '''
+
+    def __init__( self, codec: str, package: str ):
+        super( ).__init__(
+            f"Compression codec '{codec}' is unavailable. "
+            f"Install the '{package}' package to use it." )
+
+
 class DataAwol( Omnierror, AssertionError ):
     ''' Unexpected data absence. '''
 
@@ -40,6 +56,14 @@ class DataAwol( Omnierror, AssertionError ):
             f"Necessary data with label '{label}' is missing from {source}." )
 
 
+class DirectoryAwol( Omnierror, AssertionError ):
+    ''' Unexpected directory absence. '''
+
+    def __init__( self, directory: str | __.Path ):
+        super( ).__init__(
+            f"Necessary directory is missing at '{directory}'." )
+
+
 class FileDataAwol( DataAwol ):
     ''' Unexpected data absence from file. '''
 
@@ -59,3 +83,18 @@ class FileEmpty( Omnierror, AssertionError ):
 
     def __init__( self, file: str| __.Path ):
         super( ).__init__( f"Unexpectedly empty file at '{file}'." )
+
+
+class PathInvalidity( Omnierror, ValueError ):
+    ''' Path, which is not within its directory. '''
+
+    def __init__( self, path: str | __.Path, directory: str | __.Path ):
+        super( ).__init__(
+            f"Path '{path}' is not within directory '{directory}'." )
+
+
+class VersionsAbsence( Omnierror, ValueError ):
+    ''' Absence of release versions to process. '''
+
+    def __init__( self ):
+        super( ).__init__( "No release versions were given to process." )
@@ -18,20 +18,462 @@
 #============================================================================#
 
 
-''' Filesystem operations and utilities. '''
+''' Filesystem operations and utilities.
 
+    Operations take explicit paths rather than depend on the working
+    directory, which is global to the process. Thus, they are safe to
+    perform from several threads or tasks at once, such as for several
+    projects. The ``chdir`` context manager is the sole exception.
+'''
+
+
+import mmap as _mmap
+import stat as _stat
+import sys as _sys
+
+from concurrent.futures import Executor as _Executor
+from concurrent.futures import Future as _Future
+from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
 
 from . import __
+from . import exceptions as _exceptions
+from . import tracing as _tracing
+
+
+_CONTENTS_DEFAULT: __.cabc.Mapping[ str, tuple[ int, str ] ] = (
+    __.types.MappingProxyType( { } ) )
+_DIGESTS_DEFAULT: __.cabc.Mapping[ str, str ] = (
+    __.types.MappingProxyType( { } ) )
+_MAPPING_THRESHOLD = 1 << 20
+
+
+class FileFingerprint( __.immut.DataclassObject ):
+    ''' Size, modification time, and content digest of file. '''
+
+    size: int
+    mtime: int
+    digest: str
+
+    @classmethod
+    def from_file(
+        selfclass,
+        location: __.Path,
+        status: __.typx.Optional[ __.os.stat_result ] = None,
+    ) -> __.typx.Self:
+        ''' Produces fingerprint from file, digesting its content. '''
+        if status is None: status = location.stat( )
+        return selfclass(
+            size = status.st_size,
+            mtime = status.st_mtime_ns,
+            digest = calculate_digest( location ) )
+
+    def matches_status( self, status: __.os.stat_result ) -> bool:
+        ''' Does file status match size and modification time? '''
+        return (
+                self.size == status.st_size
+            and self.mtime == status.st_mtime_ns )
 
 
 @__.ctxl.contextmanager
 def chdir( directory: __.Path ) -> __.cabc.Iterator[ __.Path ]:
     ''' Temporarily changes working directory.
 
-        Not thread-safe or async-safe.
+        Not thread-safe or async-safe. Prefer explicit paths, which can be
+        confined to a directory with ``locate_within``.
     '''
     # TODO: Python 3.11: contextlib.chdir
     original = __.os.getcwd( )
     __.os.chdir( directory )
     try: yield directory
     finally: __.os.chdir( original )
+
+
+def calculate_digest( location: __.Path ) -> str:
+    ''' Calculates SHA-256 digest of file content.
+
+        Large files are memory-mapped rather than read through buffers.
+    '''
+    digest = __.hashlib.sha256( )
+    with location.open( 'rb' ) as file:
+        size = __.os.fstat( file.fileno( ) ).st_size
+        if size < _MAPPING_THRESHOLD: digest.update( file.read( ) )
+        else:
+            with _mmap.mmap(
+                file.fileno( ), 0, access = _mmap.ACCESS_READ
+            ) as mapping: digest.update( mapping )
+    return digest.hexdigest( )
+
+
+def calculate_tree_signature( location: __.Path ) -> str:
+    ''' Calculates signature of directory tree from metadata of entries.
+
+        The signature covers names, types, sizes, modification times, and
+        inodes, but not contents, so that only a stat per entry is needed.
+        It changes whenever an entry is added, removed, replaced, or
+        modified.
+    '''
+    digest = __.hashlib.sha256( )
+    for directory, directories, names in __.os.walk( location ):
+        directories.sort( )
+        for name in sorted( ( *directories, *names ) ):
+            entry = __.Path( directory ) / name
+            status = entry.lstat( )
+            digest.update( "{}\0{}\0{}\0{}\0{}\n".format(
+                entry.relative_to( location ).as_posix( ),
+                _stat.S_IFMT( status.st_mode ), status.st_size,
+                status.st_mtime_ns, status.st_ino ).encode( ) )
+    return digest.hexdigest( )
+
+
+def copy_tree(
+    source: __.Path,
+    destination: __.Path, *,
+    copier: __.cabc.Callable[ [ str, str ], __.typx.Any ] = __.shutil.copy2,
+    executor: __.typx.Optional[ _Executor ] = None,
+) -> None:
+    ''' Copies directory tree, copying files concurrently.
+
+        Directories are created on the calling thread, as they are
+        discovered. Files are copied with copier, which has the same
+        signature as ``shutil.copy2``, on worker threads.
+    '''
+    with provide_executor( executor ) as executor_:
+        futures: list[ _Future[ __.typx.Any ] ] = [ ]
+        for directory, _, names in __.os.walk( source ):
+            origin = __.Path( directory )
+            target = destination / origin.relative_to( source )
+            target.mkdir( parents = True, exist_ok = True )
+            futures.extend(
+                executor_.submit(
+                    copier, str( origin / name ), str( target / name ) )
+                for name in names )
+        _await_futures( futures )
+
+
+def deduplicate_files(
+    locations: __.cabc.Iterable[ __.Path ],
+    references: __.cabc.Mapping[ str, tuple[ int, str ] ] = (
+        _CONTENTS_DEFAULT ),
+    contents: __.cabc.Mapping[ str, tuple[ int, str ] ] = _CONTENTS_DEFAULT,
+) -> int:
+    ''' Replaces duplicate regular files with hard links to one copy.
+
+        Files are grouped by size and, where known, by digest of content.
+        Within groups, files are digested and linked by digest and
+        permissions, so that known digests only preselect duplicates and
+        are confirmed before any file is linked. Files, which are already
+        hard links of one another, are only digested once. Files under
+        earlier locations, and earlier in sorted order, are kept as
+        originals.
+
+        References and contents map paths of files to their known sizes
+        and digests, such as those from fingerprints. References are not
+        surveyed, but are kept as originals of their duplicates under
+        locations. Thus, only files of changed directories need be surveyed
+        and only their likely duplicates need be digested.
+
+        Returns number of bytes which are no longer stored separately.
+    '''
+    sizes = frozenset( (
+        *( size for size, _ in references.values( ) ),
+        *( size for size, _ in contents.values( ) ) ) )
+    digests: dict[ str, str ] = { }
+    groups: dict[ tuple[ int, str ], list[ str ] ] = { }
+    for reference, content in references.items( ):
+        groups.setdefault( content, [ ] ).append( reference )
+    for location in locations:
+        for file_ in _survey_files( location ):
+            file = str( file_ )
+            size = file_.lstat( ).st_size
+            content = contents.get( file )
+            if content is not None and content[ 0 ] == size:
+                digest = content[ 1 ]
+            # Files of unknown content may duplicate known ones.
+            elif size in sizes:
+                digest = digests[ file ] = calculate_digest( file_ )
+            else: digest = ''
+            groups.setdefault( ( size, digest ), [ ] ).append( file )
+    return sum(
+        _link_duplicates( tuple( map( __.Path, files ) ), digests )
+        for ( size, _ ), files in groups.items( )
+        if size and len( files ) > 1 )
+
+
+def locate_within(
+    directory: __.Path, path: str | __.Path
+) -> __.Path:
+    ''' Locates relative path within directory without changing into it.
+
+        The path is resolved through any symlinks, which exist beneath the
+        directory, as the operating system would follow them. Absolute
+        paths and paths, which lead out of the directory, whether by
+        parent references or by symlinks, are rejected. Returns the real
+        location, which has no symlinks left to follow.
+    '''
+    if __.os.path.isabs( path ):
+        raise _exceptions.PathInvalidity( path, directory )
+    root = directory.resolve( )
+    location = ( root / path ).resolve( )
+    if not location.is_relative_to( root ):
+        raise _exceptions.PathInvalidity( path, directory )
+    return location
+
+
+@__.ctxl.contextmanager
+def lock_file( location: __.Path ) -> __.cabc.Iterator[ None ]:
+    ''' Holds exclusive advisory lock on file, waiting for it as needed.
+
+        The file is created, if it does not exist. Locks are taken with
+        ``flock`` on POSIX systems and with ``msvcrt.locking`` on Windows.
+        They are per open file, so the same file must not be locked twice by
+        one thread, and waiting blocks, so asynchronous callers should wait
+        on a worker thread.
+    '''
+    with location.open( 'a+b' ) as file:
+        _acquire_lock( file )
+        try: yield
+        finally: _release_lock( file )
+
+
+def produce_executor( workers: int = 0 ) -> _ThreadPoolExecutor:
+    ''' Produces thread pool for file operations.
+
+        Zero workers means the default of the standard library, which suits
+        work that is bound by input and output rather than by processors.
+    '''
+    return _ThreadPoolExecutor(
+        max_workers = workers if workers > 0 else None )
+
+
+@__.ctxl.contextmanager
+def provide_executor(
+    executor: __.typx.Optional[ _Executor ] = None
+) -> __.cabc.Iterator[ _Executor ]:
+    ''' Provides given executor or else temporary thread pool. '''
+    if executor is not None:
+        yield executor
+        return
+    with produce_executor( ) as executor_: yield executor_
+
+
+def remove_tree(
+    location: __.Path, *,
+    executor: __.typx.Optional[ _Executor ] = None,
+) -> None:
+    ''' Removes directory tree, removing files concurrently.
+
+        Files and symlinks are unlinked on worker threads. Emptied
+        directories are then removed, deepest first, on the calling thread.
+    '''
+    if location.is_symlink( ):
+        location.unlink( )
+        return
+    directories: list[ str ] = [ ]
+    with provide_executor( executor ) as executor_:
+        futures: list[ _Future[ None ] ] = [ ]
+        for directory, directories_, names in __.os.walk( location ):
+            directories.append( directory )
+            base = __.Path( directory )
+            # Symlinks to directories are listed but not descended into.
+            names_ = [ *names, *(
+                name for name in directories_
+                if ( base / name ).is_symlink( ) ) ]
+            futures.extend(
+                executor_.submit( __.os.unlink, base / name )
+                for name in names_ )
+        _await_futures( futures )
+    for directory in reversed( directories ): __.os.rmdir( directory )
+
+
+def synchronize_tree(
+    source: __.Path,
+    destination: __.Path,
+    fingerprints: __.cabc.Mapping[ str, FileFingerprint ], *,
+    executor: __.typx.Optional[ _Executor ] = None,
+) -> dict[ str, FileFingerprint ]:
+    ''' Synchronizes destination directory tree with source tree.
+
+        Fingerprints, keyed by relative path, are those of the source files
+        at the previous synchronization. Files, whose size and modification
+        time match their fingerprints, are assumed unchanged. Other files
+        are digested and only copied if their content differs. Files and
+        directories, which are absent from the source, are removed from the
+        destination. Copies replace destination files rather than write
+        through them, so that hard links to other trees are unaffected.
+        Files are digested and copied on worker threads.
+
+        Returns fingerprints of source files for next synchronization.
+    '''
+    directories = frozenset( _survey_directories( source ) )
+    for directory in directories:
+        ( destination / directory ).mkdir( parents = True, exist_ok = True )
+    with provide_executor( executor ) as executor_:
+        futures = {
+            name: executor_.submit(
+                _synchronize_file,
+                file, destination / name, fingerprints.get( name ) )
+            for file, name in (
+                ( file, file.relative_to( source ).as_posix( ) )
+                for file in _survey_files( source, follow_symlinks = True ) )
+        }
+        fingerprints_ = {
+            name: future.result( ) for name, future in futures.items( ) }
+    _remove_strays( destination, fingerprints_, directories )
+    _tracing.record_progress(
+        size = sum( entry.size for entry in fingerprints_.values( ) ),
+        files = len( fingerprints_ ) )
+    return fingerprints_
+
+
+if _sys.platform == 'win32': # pragma: no cover
+    import msvcrt as _msvcrt
+
+    from errno import EDEADLK as _EDEADLK
+
+    def _acquire_lock( file: __.typx.IO[ bytes ] ) -> None:
+        ''' Locks first byte of file, retrying until it is acquired. '''
+        file.seek( 0 )
+        while True:
+            # Blocking lock gives up after ten attempts.
+            try: _msvcrt.locking( file.fileno( ), _msvcrt.LK_LOCK, 1 )
+            except OSError as exception:
+                if exception.errno != _EDEADLK: raise
+                continue
+            return
+
+    def _release_lock( file: __.typx.IO[ bytes ] ) -> None:
+        ''' Unlocks first byte of file. '''
+        file.seek( 0 )
+        _msvcrt.locking( file.fileno( ), _msvcrt.LK_UNLCK, 1 )
+else:
+    import fcntl as _fcntl
+
+    def _acquire_lock( file: __.typx.IO[ bytes ] ) -> None:
+        ''' Locks whole file, waiting until it is acquired. '''
+        _fcntl.flock( file.fileno( ), _fcntl.LOCK_EX )
+
+    def _release_lock( file: __.typx.IO[ bytes ] ) -> None:
+        ''' Unlocks whole file. '''
+        _fcntl.flock( file.fileno( ), _fcntl.LOCK_UN )
+
+
+def _await_futures(
+    futures: __.cabc.Iterable[ _Future[ __.typx.Any ] ]
+) -> None:
+    ''' Awaits futures, propagating first exception. '''
+    for future in futures: future.result( )
+
+
+def _is_current( target: __.Path, fingerprint: FileFingerprint ) -> bool:
+    ''' Is target file still present with fingerprinted size? '''
+    try: status = target.lstat( )
+    except FileNotFoundError: return False
+    return (
+            _stat.S_ISREG( status.st_mode )
+        and status.st_size == fingerprint.size )
+
+
+def _link_duplicates(
+    files: __.cabc.Sequence[ __.Path ],
+    digests: __.cabc.Mapping[ str, str ] = _DIGESTS_DEFAULT,
+) -> int:
+    ''' Links files with identical content and permissions to first of them.
+
+        Digests, which are already calculated for files, are reused.
+    '''
+    digests_: dict[ tuple[ int, int ], str ] = { }
+    originals: dict[
+        tuple[ str, int ], tuple[ __.Path, tuple[ int, int ] ] ] = { }
+    relinked: set[ tuple[ int, int ] ] = set( )
+    saved = 0
+    for file in files:
+        try: status = file.lstat( )
+        except FileNotFoundError: continue
+        if not _stat.S_ISREG( status.st_mode ): continue
+        inode = ( status.st_dev, status.st_ino )
+        if inode not in digests_:
+            digests_[ inode ] = (
+                digests.get( str( file ) ) or calculate_digest( file ) )
+        original, inode_ = originals.setdefault(
+            ( digests_[ inode ], _stat.S_IMODE( status.st_mode ) ),
+            ( file, inode ) )
+        if inode == inode_: continue
+        # Link under temporary name and then rename to replace atomically.
+        temporary = file.with_name( f".{file.name}.deduplication" )
+        try:
+            __.os.link( original, temporary )
+            __.os.replace( temporary, file )
+        except OSError:
+            temporary.unlink( missing_ok = True )
+            continue
+        if inode not in relinked: saved += status.st_size
+        relinked.add( inode )
+    return saved
+
+
+def _remove_strays(
+    location: __.Path,
+    files: __.cabc.Container[ str ],
+    directories: __.cabc.Container[ str ],
+) -> None:
+    ''' Removes files and directories which are not named. '''
+    for directory, directories_, names in __.os.walk(
+        location, topdown = False
+    ):
+        base = __.Path( directory )
+        for name in names:
+            file = base / name
+            if file.relative_to( location ).as_posix( ) not in files:
+                file.unlink( )
+        for name in directories_:
+            directory_ = base / name
+            if directory_.relative_to( location ).as_posix( ) in directories:
+                continue
+            if directory_.is_symlink( ): directory_.unlink( )
+            else: directory_.rmdir( )
+
+
+def _replace_file( source: __.Path, target: __.Path ) -> None:
+    ''' Copies file to temporary name beside target and renames it. '''
+    if target.is_dir( ) and not target.is_symlink( ):
+        __.shutil.rmtree( target )
+    target.parent.mkdir( parents = True, exist_ok = True )
+    temporary = target.with_name( f".{target.name}.synchronization" )
+    __.shutil.copy2( source, temporary )
+    __.os.replace( temporary, target )
+
+
+def _survey_directories( location: __.Path ) -> __.cabc.Iterator[ str ]:
+    ''' Surveys relative paths of directories under directory. '''
+    for directory, _, _ in __.os.walk( location ):
+        name = __.Path( directory ).relative_to( location ).as_posix( )
+        if name != '.': yield name
+
+
+def _survey_files(
+    location: __.Path, follow_symlinks: bool = False
+) -> __.cabc.Iterator[ __.Path ]:
+    ''' Surveys regular files under directory in sorted order. '''
+    for directory, directories, names in __.os.walk( location ):
+        directories.sort( )
+        for name in sorted( names ):
+            file = __.Path( directory ) / name
+            if not file.is_file( ): continue
+            if follow_symlinks or not file.is_symlink( ): yield file
+
+
+def _synchronize_file(
+    source: __.Path,
+    target: __.Path,
+    fingerprint: __.typx.Optional[ FileFingerprint ],
+) -> FileFingerprint:
+    ''' Copies file to target, unless fingerprint proves it unchanged. '''
+    status = source.stat( )
+    if fingerprint is None or not _is_current( target, fingerprint ):
+        _replace_file( source, target )
+        return FileFingerprint.from_file( source, status )
+    if fingerprint.matches_status( status ): return fingerprint
+    fingerprint_ = FileFingerprint.from_file( source, status )
+    if fingerprint_.digest != fingerprint.digest:
+        _replace_file( source, target )
+    return fingerprint_
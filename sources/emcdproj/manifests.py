@@ -0,0 +1,291 @@
+# vim: set filetype=python fileencoding=utf-8:
+# -*- coding: utf-8 -*-
+
+#============================================================================#
+#                                                                            #
+#  Licensed under the Apache License, Version 2.0 (the "License");           #
+#  you may not use this file except in compliance with the License.          #
+#  You may obtain a copy of the License at                                   #
+#                                                                            #
+#      http://www.apache.org/licenses/LICENSE-2.0                            #
+#                                                                            #
+#  Unless required by applicable law or agreed to in writing, software       #
+#  distributed under the License is distributed on an "AS IS" BASIS,         #
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  #
+#  See the License for the specific language governing permissions and       #
+#  limitations under the License.                                            #
+#                                                                            #
+#============================================================================#
+
+
+''' Manifest of release versions published in static website.
+
+    Format 1 of the manifest maps release versions, in descending order, to
+    their available documentation species and names the latest version.
+
+    Format 2 retains these entries, so that format 1 readers still work,
+    and adds pointers to the stable and development versions along with a
+    record per version. Each record carries a canonical sort key, so that
+    versions can be inserted in order without parsing all other versions
+    again, and metadata, such as size, file count, content digest, and
+    coverage.
+
+    Retention policies bound the number of versions, which are kept, per
+    minor series of final releases and per release series of prereleases.
+'''
+
+
+import bisect as _bisect
+
+from . import __
+from . import filesystem as _filesystem
+
+
+MANIFEST_FORMAT = 2
+
+
+_METADATA_DEFAULT: __.cabc.Mapping[ str, __.typx.Any ] = (
+    __.types.MappingProxyType( { } ) )
+_PRERELEASE_RANKS: __.cabc.Mapping[ str, int ] = __.types.MappingProxyType(
+    { 'a': 0, 'b': 1, 'rc': 2 } )
+
+
+class Retention( __.immut.DataclassObject ):
+    ''' Retention policy for published release versions.
+
+        Versions, to which the manifest points, are always kept.
+    '''
+
+    patches: __.typx.Annotated[
+        int,
+        __.typx.Doc( ''' Number of latest final releases to keep per minor
+                     series. Zero keeps all. ''' ),
+        __.tyro.conf.arg( name = 'keep-patches', prefix_name = False ),
+    ] = 0
+    prereleases: __.typx.Annotated[
+        int,
+        __.typx.Doc( ''' Number of latest prereleases to keep per release
+                     series. Zero keeps all. ''' ),
+        __.tyro.conf.arg( name = 'keep-prereleases', prefix_name = False ),
+    ] = 0
+    superseded: __.typx.Annotated[
+        bool,
+        __.typx.Doc( ''' Drop prereleases of series which have final
+                     releases. ''' ),
+        __.tyro.conf.arg( name = 'prune-superseded', prefix_name = False ),
+    ] = False
+
+    def is_active( self ) -> bool:
+        ''' Does retention policy drop any versions at all? '''
+        return bool( self.patches or self.prereleases or self.superseded )
+
+
+@__.ctxl.contextmanager
+def acquire_manifest(
+    location: __.Path, lock: __.Absential[ __.Path ] = __.absent
+) -> __.cabc.Iterator[ dict[ str, __.typx.Any ] ]:
+    ''' Acquires manifest for exclusive update and saves it afterwards.
+
+        An advisory lock is held from restoration through saving, so that
+        concurrent updaters apply their changes on top of the additions of
+        their predecessors rather than overwriting them. By default, the
+        lock file is a hidden sibling of the manifest. The manifest is not
+        saved if the update fails.
+    '''
+    if __.is_absent( lock ):
+        lock = location.with_name( f".{location.name}.lock" )
+    lock.parent.mkdir( exist_ok = True, parents = True )
+    with _filesystem.lock_file( lock ):
+        manifest = restore_manifest( location )
+        yield manifest
+        save_manifest( location, manifest )
+
+
+def calculate_sort_key( version: str ) -> list[ __.typx.Any ]:
+    ''' Calculates canonical sort key of release version.
+
+        Sort keys are plain lists, which can be stored as JSON and compared
+        without parsing the version again. They order versions as PEP 440
+        does, except that local version labels are ignored.
+    '''
+    from packaging.version import Version
+    version_ = Version( version )
+    release = list( version_.release )
+    while len( release ) > 1 and release[ -1 ] == 0: release.pop( )
+    # Developmental releases without other suffixes precede prereleases.
+    if version_.pre is not None:
+        pre = [ _PRERELEASE_RANKS[ version_.pre[ 0 ] ], version_.pre[ 1 ] ]
+    elif version_.dev is not None and version_.post is None: pre = [ -1, 0 ]
+    else: pre = [ len( _PRERELEASE_RANKS ), 0 ]
+    post = -1 if version_.post is None else version_.post
+    dev = [ 1, 0 ] if version_.dev is None else [ 0, version_.dev ]
+    return [ version_.epoch, release, pre, post, dev ]
+
+
+def is_prerelease( version: str ) -> bool:
+    ''' Is release version a prerelease or developmental release? '''
+    from packaging.version import Version
+    return Version( version ).is_prerelease
+
+
+def produce_manifest(
+    data: __.cabc.Mapping[ str, __.typx.Any ]
+) -> dict[ str, __.typx.Any ]:
+    ''' Produces current format of manifest from data of any format.
+
+        Data in format 1 are upgraded, which requires one pass over all
+        versions. Data in current format are shallowly copied.
+    '''
+    if data.get( 'format' ) == MANIFEST_FORMAT: return dict( data )
+    manifest = _produce_empty_manifest( )
+    for version, species in data.get( 'versions', { } ).items( ):
+        update_version( manifest, version, species )
+    return manifest
+
+
+def remove_versions(
+    manifest: dict[ str, __.typx.Any ], versions: __.cabc.Iterable[ str ]
+) -> None:
+    ''' Removes versions from manifest.
+
+        Pointers to removed versions are moved to the latest remaining
+        versions of their kinds.
+    '''
+    records = manifest[ 'releases' ]
+    for version in versions:
+        manifest[ 'versions' ].pop( version, None )
+        records.pop( version, None )
+    remaining = tuple( manifest[ 'versions' ] )
+    manifest[ 'latest_version' ] = remaining[ 0 ] if remaining else None
+    for pointer, prerelease in (
+        ( 'stable_version', False ), ( 'development_version', True )
+    ):
+        if manifest.get( pointer ) in records: continue
+        manifest[ pointer ] = next(
+            ( version for version in remaining
+              if records[ version ][ 'prerelease' ] == prerelease ), None )
+
+
+def restore_manifest( location: __.Path ) -> dict[ str, __.typx.Any ]:
+    ''' Restores manifest from file, upgrading it as necessary.
+
+        An absent file results in an empty manifest.
+    '''
+    if not location.is_file( ): return _produce_empty_manifest( )
+    return produce_manifest( __.json.loads( location.read_bytes( ) ) )
+
+
+def save_manifest(
+    location: __.Path, manifest: __.cabc.Mapping[ str, __.typx.Any ]
+) -> None:
+    ''' Saves manifest to file.
+
+        The manifest is written to a temporary file, which then atomically
+        replaces the previous manifest. Readers never see partial content.
+    '''
+    descriptor, temporary_ = __.tempfile.mkstemp(
+        dir = location.parent, prefix = f".{location.name}.", suffix = '.tmp' )
+    temporary = __.Path( temporary_ )
+    try:
+        with open( descriptor, 'w' ) as file:
+            __.json.dump( manifest, file, indent = 4 )
+        temporary.chmod( 0o644 )
+        __.os.replace( temporary, location )
+    except BaseException:
+        temporary.unlink( missing_ok = True )
+        raise
+
+
+def survey_prunables(
+    manifest: __.cabc.Mapping[ str, __.typx.Any ],
+    retention: Retention,
+    protections: __.cabc.Collection[ str ] = ( ),
+) -> tuple[ str, ... ]:
+    ''' Surveys versions, which retention policy drops, in manifest order.
+
+        Series are determined from the stored sort keys, so no versions
+        need to be parsed again. Final releases, including post releases,
+        belong to the minor series of their release numbers. Prereleases
+        and developmental releases belong to the series of the releases,
+        which they precede. Versions, to which the manifest points, and
+        protected versions are kept, but count against limits.
+    '''
+    records = manifest[ 'releases' ]
+    protected: set[ __.typx.Any ] = {
+        *protections, *(
+            manifest.get( pointer ) for pointer in (
+                'latest_version', 'stable_version', 'development_version' ) ) }
+    finals = {
+        _calculate_release_series( records[ version ][ 'sort_key' ] )
+        for version in manifest[ 'versions' ]
+        if not records[ version ][ 'prerelease' ] }
+    counts: dict[ tuple[ __.typx.Any, ... ], int ] = { }
+    prunables: list[ str ] = [ ]
+    for version in manifest[ 'versions' ]:
+        record = records[ version ]
+        release = _calculate_release_series( record[ 'sort_key' ] )
+        if record[ 'prerelease' ]:
+            series, limit = ( False, *release ), retention.prereleases
+            superseded = retention.superseded and release in finals
+        else:
+            series = ( True, release[ 0 ], *( release[ 1 ] + ( 0, ) )[ : 2 ] )
+            limit, superseded = retention.patches, False
+        counts[ series ] = counts.get( series, 0 ) + 1
+        if version in protected: continue
+        if superseded or ( limit and counts[ series ] > limit ):
+            prunables.append( version )
+    return tuple( prunables )
+
+
+def update_version(
+    manifest: dict[ str, __.typx.Any ],
+    version: str,
+    species: __.cabc.Sequence[ str ],
+    metadata: __.cabc.Mapping[ str, __.typx.Any ] = _METADATA_DEFAULT,
+) -> None:
+    ''' Updates species and metadata of version in manifest.
+
+        New versions are inserted in order by bisection over stored sort
+        keys. The latest, stable, and development pointers are advanced by
+        comparison with the sort key of the new version alone.
+    '''
+    records = manifest[ 'releases' ]
+    if version in records:
+        manifest[ 'versions' ][ version ] = species
+        records[ version ].update( metadata )
+        return
+    key = calculate_sort_key( version )
+    record: dict[ str, __.typx.Any ] = dict(
+        sort_key = key, prerelease = is_prerelease( version ) )
+    record.update( metadata )
+    versions = list( manifest[ 'versions' ].items( ) )
+    # Versions descend, so bisect over ascending keys of reversed versions.
+    keys = [ records[ version_ ][ 'sort_key' ] for version_, _ in versions ]
+    index = len( keys ) - _bisect.bisect_right( keys[ : : -1 ], key )
+    versions.insert( index, ( version, species ) )
+    manifest[ 'versions' ] = dict( versions )
+    records[ version ] = record
+    manifest[ 'latest_version' ] = versions[ 0 ][ 0 ]
+    pointer = (
+        'development_version' if record[ 'prerelease' ] else 'stable_version' )
+    incumbent = manifest.get( pointer )
+    if incumbent is None or records[ incumbent ][ 'sort_key' ] < key:
+        manifest[ pointer ] = version
+
+
+def _calculate_release_series(
+    key: __.cabc.Sequence[ __.typx.Any ]
+) -> tuple[ int, tuple[ int, ... ] ]:
+    ''' Calculates epoch and release numbers from sort key. '''
+    return key[ 0 ], tuple( key[ 1 ] )
+
+
+def _produce_empty_manifest( ) -> dict[ str, __.typx.Any ]:
+    return {
+        'format': MANIFEST_FORMAT,
+        'latest_version': None,
+        'stable_version': None,
+        'development_version': None,
+        'versions': { },
+        'releases': { },
+    }
@@ -0,0 +1,310 @@
+# vim: set filetype=python fileencoding=utf-8:
+# -*- coding: utf-8 -*-
+
+#============================================================================#
+#                                                                            #
+#  Licensed under the Apache License, Version 2.0 (the "License");           #
+#  you may not use this file except in compliance with the License.          #
+#  You may obtain a copy of the License at                                   #
+#                                                                            #
+#      http://www.apache.org/licenses/LICENSE-2.0                            #
+#                                                                            #
+#  Unless required by applicable law or agreed to in writing, software       #
+#  distributed under the License is distributed on an "AS IS" BASIS,         #
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  #
+#  See the License for the specific language governing permissions and       #
+#  limitations under the License.                                            #
+#                                                                            #
+#============================================================================#
+
+
+''' Publication of website archives on Git branch.
+
+    The publication commit is built by one ``git fast-import`` session,
+    which writes the archive blobs, the tree, and the commit, and advances
+    the branch, all without touching the index or working tree of the
+    project. Only the archives, which are given, are replaced, so that
+    sharded layouts commit only the shards which an update touches.
+    Archives are restored from the branch with ``git cat-file`` rather than
+    checked out. Every Git operation is subject to a timeout and its
+    duration is recorded.
+'''
+
+
+from . import __
+from . import tracing as _tracing
+
+
+_CHUNK_SIZE = 1 << 20
+_FAILURES = (
+    OSError,
+    __.subprocess.CalledProcessError,
+    __.subprocess.TimeoutExpired,
+)
+
+
+_Feeder: __.typx.TypeAlias = __.cabc.Callable[
+    [ __.asyncio.StreamWriter ], __.cabc.Awaitable[ None ] ]
+
+
+class Layouts( __.enum.Enum ): # TODO: Python 3.11: StrEnum
+    ''' Layouts of website archives on publication branch. '''
+
+    Shards =    'shards'
+    Tarball =   'tarball'
+
+
+class Publication( __.immut.DataclassObject ):
+    ''' Settings for publication of website archives. '''
+
+    branch: __.typx.Annotated[
+        str,
+        __.typx.Doc( ''' Branch on which tarball is published. ''' ),
+        __.tyro.conf.arg( name = 'publication-branch', prefix_name = False ),
+    ] = 'publication'
+    remote: __.typx.Annotated[
+        str,
+        __.typx.Doc( ''' Remote from which publication branch is fetched
+                     and to which it is pushed. ''' ),
+        __.tyro.conf.arg( name = 'publication-remote', prefix_name = False ),
+    ] = 'origin'
+    source: __.typx.Annotated[
+        __.typx.Optional[ str ],
+        __.typx.Doc( ''' Git bundle or local mirror from which publication
+                     branch is fetched instead of remote. For builds
+                     without network access. ''' ),
+        __.tyro.conf.arg( name = 'publication-source', prefix_name = False ),
+    ] = None
+    timeout: __.typx.Annotated[
+        float,
+        __.typx.Doc( ''' Timeout, in seconds, for each Git operation. ''' ),
+        __.tyro.conf.arg( name = 'git-timeout', prefix_name = False ),
+    ] = 600.0
+    layout: __.typx.Annotated[
+        Layouts,
+        __.typx.Doc( ''' Layout of website archives. A single tarball or
+                     one shard per version, along with a root shard. ''' ),
+        __.tyro.conf.arg( name = 'publication-layout', prefix_name = False ),
+    ] = Layouts.Tarball
+
+
+class GitSession( __.immut.DataclassObject ):
+    ''' Git operations on publication branch of project repository.
+
+        The project directory must be the root of the repository. Durations
+        of operations are recorded in order, by step name.
+    '''
+
+    project: __.Path
+    publication: Publication = __.dcls.field( default_factory = Publication )
+    timings: dict[ str, float ] = __.dcls.field(
+        default_factory = dict[ str, float ] )
+
+    async def fetch_archive( self, archive: __.Path ) -> bool:
+        ''' Fetches publication branch and restores archive from it.
+
+            Failures, such as an absent remote, branch, or archive, are
+            ignored. Returns whether archive was restored.
+        '''
+        await self.fetch_branch( )
+        return await self.restore_archive( archive )
+
+    async def fetch_branch( self ) -> bool:
+        ''' Fetches publication branch from remote or from source.
+
+            Only objects, which are not present yet, are transferred.
+            Failures are ignored. Returns whether branch was fetched.
+        '''
+        branch = self.publication.branch
+        source = self.publication.source or self.publication.remote
+        try: await self._run( 'fetch', 'fetch', source, f"{branch}:{branch}" )
+        except _FAILURES: return False
+        return True
+
+    async def publish_archive( self, archive: __.Path, message: str ) -> str:
+        ''' Commits archive onto publication branch and pushes branch. '''
+        return await self.publish_archives( ( archive, ), message )
+
+    async def publish_archives(
+        self,
+        archives: __.cabc.Sequence[ __.Path ],
+        message: str,
+        removals: __.cabc.Sequence[ __.Path ] = ( ),
+    ) -> str:
+        ''' Commits archives onto publication branch and pushes branch.
+
+            The new commit has the previous tip of the branch, if any, as
+            its parent and replaces the given archives in its tree, leaving
+            all other files as they were, except for removals, which are
+            deleted from its tree. Returns the identifier of the new commit.
+        '''
+        branch = self.publication.branch
+        parent, ident = await __.asyncio.gather(
+            self._run(
+                'inspect', 'for-each-ref', '--format=%(objectname)',
+                f"refs/heads/{branch}" ),
+            self._run( 'identify', 'var', 'GIT_COMMITTER_IDENT' ) )
+        commit = await self._import_commit(
+            archives, message, removals,
+            parent = parent.strip( ), ident = ident.strip( ) )
+        await self._run(
+            'push', 'push', self.publication.remote, f"{branch}:{branch}" )
+        return commit
+
+    async def resolve_branch( self ) -> __.typx.Optional[ str ]:
+        ''' Resolves local publication branch to commit identifier.
+
+            Returns nothing, if the branch does not exist.
+        '''
+        try:
+            commit = await self._run(
+                'resolve', 'rev-parse', '--verify', '--quiet',
+                f"refs/heads/{self.publication.branch}^{{commit}}" )
+        except _FAILURES: return None
+        return commit.strip( )
+
+    async def restore_archive( self, archive: __.Path ) -> bool:
+        ''' Restores archive from local publication branch.
+
+            The archive is read from the object database rather than
+            checked out. Failures are ignored. Returns whether archive was
+            restored.
+        '''
+        branch = self.publication.branch
+        archive.parent.mkdir( exist_ok = True, parents = True )
+        temporary = archive.with_name( f".{archive.name}.fetch" )
+        try:
+            with temporary.open( 'wb' ) as file:
+                await self._run(
+                    'restore', 'cat-file', 'blob',
+                    f"{branch}:{self._calculate_path( archive )}",
+                    stdout = file )
+        except _FAILURES:
+            temporary.unlink( missing_ok = True )
+            return False
+        __.os.replace( temporary, archive )
+        _tracing.record_progress( size = archive.stat( ).st_size, files = 1 )
+        return True
+
+    def _calculate_path( self, location: __.Path ) -> str:
+        return location.resolve( ).relative_to(
+            self.project.resolve( ) ).as_posix( )
+
+    async def _import_commit(
+        self,
+        archives: __.cabc.Sequence[ __.Path ],
+        message: str,
+        removals: __.cabc.Sequence[ __.Path ],
+        parent: str,
+        ident: str,
+    ) -> str:
+        ''' Writes archives and commit in one fast-import session. '''
+        message_ = message.encode( )
+        header = b''.join( (
+            f"commit refs/heads/{self.publication.branch}\n".encode( ),
+            b'mark :1\n',
+            f"committer {ident}\n".encode( ),
+            f"data {len( message_ )}\n".encode( ), message_, b'\n',
+            f"from {parent}\n".encode( ) if parent else b'',
+        ) )
+
+        async def feed( stdin: __.asyncio.StreamWriter ) -> None:
+            stdin.write( header )
+            for removal in removals:
+                path = self._calculate_path( removal )
+                stdin.write( f"D {path}\n".encode( ) )
+            for archive in archives:
+                path = self._calculate_path( archive )
+                stdin.write( f"M 100644 inline {path}\n".encode( ) )
+                stdin.write( f"data {archive.stat( ).st_size}\n".encode( ) )
+                with archive.open( 'rb' ) as file:
+                    while chunk := file.read( _CHUNK_SIZE ):
+                        stdin.write( chunk )
+                        await stdin.drain( )
+                stdin.write( b'\n' )
+                _tracing.record_progress(
+                    size = archive.stat( ).st_size, files = 1 )
+            stdin.write( b'get-mark :1\n' )
+            await stdin.drain( )
+            stdin.close( )
+            await stdin.wait_closed( )
+
+        commit = await self._run(
+            'import', 'fast-import', '--quiet', feeder = feed )
+        return commit.strip( )
+
+    async def _run(
+        self,
+        step: str,
+        *arguments: str,
+        feeder: __.typx.Optional[ _Feeder ] = None,
+        stdout: __.typx.Any = __.subprocess.PIPE,
+    ) -> str:
+        ''' Runs Git command with timeout and records its duration.
+
+            Returns captured standard output. Input, if any, is streamed
+            by the feeder. The process is killed on timeout or cancellation.
+        '''
+        command = ( 'git', *arguments )
+        with self._time( step ):
+            process = await __.asyncio.create_subprocess_exec(
+                *command,
+                cwd = self.project,
+                stdin = __.subprocess.PIPE if feeder else None,
+                stdout = stdout,
+                stderr = __.subprocess.PIPE )
+            try:
+                output, error = await __.asyncio.wait_for(
+                    _communicate( process, feeder ),
+                    timeout = self.publication.timeout )
+            except __.asyncio.TimeoutError:
+                process.kill( )
+                await process.wait( )
+                raise __.subprocess.TimeoutExpired(
+                    command, self.publication.timeout ) from None
+            except __.asyncio.CancelledError:
+                process.kill( )
+                await process.wait( )
+                raise
+        if process.returncode:
+            raise __.subprocess.CalledProcessError(
+                process.returncode, command, output, error )
+        return ( output or b'' ).decode( )
+
+    @__.ctxl.contextmanager
+    def _time( self, step: str ) -> __.cabc.Iterator[ None ]:
+        start = __.time.perf_counter( )
+        try:
+            with _tracing.span( f"git {step}" ): yield
+        finally:
+            self.timings[ step ] = (
+                self.timings.get( step, 0.0 )
+                + __.time.perf_counter( ) - start )
+
+
+async def _communicate(
+    process: __.asyncio.subprocess.Process,
+    feeder: __.typx.Optional[ _Feeder ],
+) -> tuple[ __.typx.Optional[ bytes ], __.typx.Optional[ bytes ] ]:
+    ''' Feeds input to process, while collecting its output.
+
+        Output is read alongside the feeder rather than by ``communicate``,
+        which closes standard input on Python 3.12 and later, even while
+        the feeder is still writing.
+    '''
+    if feeder is None or process.stdin is None:
+        return await process.communicate( )
+    _, output, error = await __.asyncio.gather(
+        feeder( process.stdin ),
+        _read_stream( process.stdout ),
+        _read_stream( process.stderr ) )
+    await process.wait( )
+    return output, error
+
+
+async def _read_stream(
+    stream: __.typx.Optional[ __.asyncio.StreamReader ]
+) -> __.typx.Optional[ bytes ]:
+    ''' Reads stream to its end, if it is captured. '''
+    if stream is None: return None
+    return await stream.read( )
@@ -0,0 +1,209 @@
+# vim: set filetype=python fileencoding=utf-8:
+# -*- coding: utf-8 -*-
+
+#============================================================================#
+#                                                                            #
+#  Licensed under the Apache License, Version 2.0 (the "License");           #
+#  you may not use this file except in compliance with the License.          #
+#  You may obtain a copy of the License at                                   #
+#                                                                            #
+#      http://www.apache.org/licenses/LICENSE-2.0                            #
+#                                                                            #
+#  Unless required by applicable law or agreed to in writing, software       #
+#  distributed under the License is distributed on an "AS IS" BASIS,         #
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  #
+#  See the License for the specific language governing permissions and       #
+#  limitations under the License.                                            #
+#                                                                            #
+#============================================================================#
+
+
+''' Timing spans of website maintenance stages.
+
+    Spans record the wall time, processor time, bytes processed, and files
+    touched by stages. They are only recorded while a tracer is active and
+    cost next to nothing otherwise. The active tracer and span are carried
+    by context variables, so that spans nest across tasks and threads which
+    inherit the context, such as those of ``asyncio.to_thread``. Concurrent
+    spans occupy separate lanes.
+
+    Traces are written in the Chrome trace event format, which trace
+    viewers, such as Perfetto, display as timelines.
+
+    Processor time is that of the whole process. So, the spans of concurrent
+    stages each include processor time of the others.
+'''
+
+
+from . import __
+
+
+_Callable = __.typx.TypeVar(
+    '_Callable', bound = __.cabc.Callable[ ..., __.typx.Any ] )
+
+
+class Span( __.immut.DataclassObject ):
+    ''' Completed timing span of stage. '''
+
+    name: str
+    lane: int
+    start: float
+    wall: float
+    cpu: float
+    size: int = 0
+    files: int = 0
+
+
+class Tracer( __.immut.DataclassObject ):
+    ''' Collector of timing spans.
+
+        Start times are relative to the creation of the tracer.
+    '''
+
+    origin: float = __.dcls.field( default_factory = __.time.perf_counter )
+    spans: list[ Span ] = __.dcls.field( default_factory = list[ Span ] )
+    lanes: set[ int ] = __.dcls.field( default_factory = set[ int ] )
+    mutex: __.threading.Lock = __.dcls.field(
+        default_factory = __.threading.Lock )
+
+    def acquire_lane( self ) -> int:
+        ''' Acquires lowest free lane for new span. '''
+        with self.mutex:
+            lane = next(
+                lane for lane in range( len( self.lanes ) + 1 )
+                if lane not in self.lanes )
+            self.lanes.add( lane )
+        return lane
+
+    def produce_chrome_trace( self ) -> dict[ str, __.typx.Any ]:
+        ''' Produces trace in Chrome trace event format. '''
+        process = __.os.getpid( )
+        with self.mutex: spans = sorted( self.spans, key = lambda s: s.start )
+        return {
+            'displayTimeUnit': 'ms',
+            'traceEvents': [ {
+                'name': span.name,
+                'cat': 'stage',
+                'ph': 'X',
+                'ts': round( span.start * 1e6, 3 ),
+                'dur': round( span.wall * 1e6, 3 ),
+                'pid': process,
+                'tid': span.lane,
+                'args': {
+                    'cpu_seconds': round( span.cpu, 6 ),
+                    'bytes': span.size,
+                    'files': span.files,
+                },
+            } for span in spans ],
+        }
+
+    def release_lane( self, span: Span ) -> None:
+        ''' Records completed span and releases its lane. '''
+        with self.mutex:
+            self.spans.append( span )
+            self.lanes.discard( span.lane )
+
+    def save( self, location: __.Path ) -> None:
+        ''' Saves trace to file in Chrome trace event format. '''
+        location.parent.mkdir( exist_ok = True, parents = True )
+        location.write_text(
+            __.json.dumps( self.produce_chrome_trace( ), indent = 1 ) )
+
+
+class _Progress:
+    ''' Bytes and files accumulated by span and its ancestors. '''
+
+    def __init__( self, parent: '__.typx.Optional[ _Progress ]' ) -> None:
+        self.parent = parent
+        self.size = 0
+        self.files = 0
+
+
+_progress: __.contextvars.ContextVar[ __.typx.Optional[ _Progress ] ] = (
+    __.contextvars.ContextVar( f"{__name__}.progress", default = None ) )
+_tracer: __.contextvars.ContextVar[ __.typx.Optional[ Tracer ] ] = (
+    __.contextvars.ContextVar( f"{__name__}.tracer", default = None ) )
+
+
+@__.ctxl.contextmanager
+def activate_tracer(
+    location: __.typx.Optional[ __.Path ] = None
+) -> __.cabc.Iterator[ __.typx.Optional[ Tracer ] ]:
+    ''' Activates tracer and saves its trace to file afterwards.
+
+        The trace is saved even if the traced operations fail, so that
+        failures can be diagnosed. Nothing is traced without a location.
+    '''
+    if location is None:
+        yield None
+        return
+    tracer = Tracer( )
+    token = _tracer.set( tracer )
+    try: yield tracer
+    finally:
+        _tracer.reset( token )
+        tracer.save( location )
+
+
+def record_progress( size: int = 0, files: int = 0 ) -> None:
+    ''' Records bytes processed and files touched by current span, if any.
+
+        Progress also counts towards all enclosing spans.
+    '''
+    tracer = _tracer.get( )
+    progress = _progress.get( )
+    if tracer is None or progress is None: return
+    with tracer.mutex:
+        while progress is not None:
+            progress.size += size
+            progress.files += files
+            progress = progress.parent
+
+
+@__.ctxl.contextmanager
+def span( name: str ) -> __.cabc.Iterator[ None ]:
+    ''' Records timing span of stage, if tracer is active. '''
+    tracer = _tracer.get( )
+    if tracer is None:
+        yield
+        return
+    progress = _Progress( _progress.get( ) )
+    token = _progress.set( progress )
+    lane = tracer.acquire_lane( )
+    start, cpu = __.time.perf_counter( ), __.time.process_time( )
+    try: yield
+    finally:
+        _progress.reset( token )
+        tracer.release_lane( Span(
+            name = name,
+            lane = lane,
+            start = start - tracer.origin,
+            wall = __.time.perf_counter( ) - start,
+            cpu = __.time.process_time( ) - cpu,
+            size = progress.size,
+            files = progress.files ) )
+
+
+def spanned( name: str ) -> __.cabc.Callable[ [ _Callable ], _Callable ]:
+    ''' Decorates function or coroutine function with timing span. '''
+
+    def decorate( function: _Callable ) -> _Callable:
+        if __.inspect.iscoroutinefunction( function ):
+
+            @__.funct.wraps( function )
+            async def invoke_async(
+                *posargs: __.typx.Any, **nomargs: __.typx.Any
+            ) -> __.typx.Any:
+                with span( name ): return await function( *posargs, **nomargs )
+
+            return __.typx.cast( _Callable, invoke_async )
+
+        @__.funct.wraps( function )
+        def invoke(
+            *posargs: __.typx.Any, **nomargs: __.typx.Any
+        ) -> __.typx.Any:
+            with span( name ): return function( *posargs, **nomargs )
+
+        return __.typx.cast( _Callable, invoke )
+
+    return decorate
@@ -18,14 +18,56 @@
 #============================================================================#
 
 
-''' Static website maintenance utilities for projects. '''
+''' Static website maintenance utilities for projects.
 
+    The website is kept in archives on a publication branch, either as one
+    segmented tarball or as one shard per version. Updates restore and
+    extract only what they touch, reuse unchanged segments and archives, and
+    leave the index and working tree of the project untouched. They run as
+    a pipeline, which overlaps the fetch of the publication branch with
+    template compilation and coverage parsing, and rendering with
+    compression. Blocking work runs on threads, so that several projects
+    can be updated at once.
+'''
+
+
+from concurrent.futures import Executor as _Executor
+from concurrent.futures import Future as _Future
 
 import jinja2 as _jinja2
 
 from . import __
+from . import archives as _archives
+from . import compressors as _compressors
 from . import exceptions as _exceptions
+from . import filesystem as _filesystem
 from . import interfaces as _interfaces
+from . import manifests as _manifests
+from . import publications as _publications
+from . import tracing as _tracing
+
+
+_ALIAS_NAMES = ( 'stable', 'development' )
+_EXTRACTION_RECORD_NAME = 'extraction.json'
+_FINGERPRINTS_NAME = '.fingerprints.json'
+_FINGERPRINTS_LOCAL_NAME = '.fingerprints.local.json'
+_MTIME_UNKNOWN = -1
+_PUBLICATION_RECORD_NAME = 'publication.json'
+_WORKSPACE_LOCK_NAME = 'website.lock'
+_COMPRESSION_DEFAULT = _compressors.Compression( )
+_PUBLICATION_DEFAULT = _publications.Publication( )
+_RETENTION_DEFAULT = _manifests.Retention( )
+
+
+_Coverages: __.typx.TypeAlias = dict[ tuple[ str, int, int ], int ]
+
+
+class AliasModes( __.enum.Enum ): # TODO: Python 3.11: StrEnum
+    ''' Materializations of stable and development aliases. '''
+
+    Copy =      'copy'
+    Hardlink =  'hardlink'
+    Symlink =   'symlink'
 
 
 class SurveyCommand(
@@ -38,20 +80,64 @@ class SurveyCommand(
         __.typx.Doc( ''' Fetch publication branch and use tarball. ''' ),
     ] = False
 
+    publication: _publications.Publication = __.dcls.field(
+        default_factory = _publications.Publication )
+
+    trace: __.typx.Annotated[
+        __.typx.Optional[ __.Path ],
+        __.typx.Doc( ''' File to which timing spans of stages are written,
+                     in Chrome trace event format. ''' ),
+    ] = None
+
     async def __call__(
         self, auxdata: __.Globals, display: _interfaces.ConsoleDisplay
     ) -> None:
-        survey( auxdata, use_extant = self.use_extant )
+        with _tracing.activate_tracer( self.trace ):
+            await survey(
+                auxdata,
+                use_extant = self.use_extant,
+                publication = self.publication )
+
+
+class StatsCommand(
+    _interfaces.CliCommand, decorators = ( __.standard_tyro_class, ),
+):
+    ''' Reports sizes, file counts, and duplication of website archives. '''
+
+    use_extant: __.typx.Annotated[
+        bool,
+        __.typx.Doc( ''' Fetch publication branch and use tarball. ''' ),
+    ] = False
+
+    json: __.typx.Annotated[
+        bool,
+        __.typx.Doc( ''' Report statistics as JSON, for dashboards. ''' ),
+    ] = False
+
+    publication: _publications.Publication = __.dcls.field(
+        default_factory = _publications.Publication )
+
+    async def __call__(
+        self, auxdata: __.Globals, display: _interfaces.ConsoleDisplay
+    ) -> None:
+        await stats(
+            auxdata,
+            use_extant = self.use_extant,
+            json = self.json,
+            publication = self.publication )
 
 
 class UpdateCommand(
     _interfaces.CliCommand, decorators = ( __.standard_tyro_class, ),
 ):
-    ''' Updates static website for particular release version. '''
+    ''' Updates static website for particular release versions. '''
 
-    version: __.typx.Annotated[
-        str,
-        __.typx.Doc( ''' Release version to update. ''' ),
+    versions: __.typx.Annotated[
+        tuple[ str, ... ],
+        __.typx.Doc( ''' Release versions to update. Each may be paired
+                     with its own artifacts directory as VERSION=DIRECTORY.
+                     Otherwise, project artifacts are used. ''' ),
+        __.tyro.conf.arg( metavar = 'VERSION[=DIRECTORY]' ),
         __.tyro.conf.Positional,
     ]
 
@@ -66,13 +152,139 @@ class UpdateCommand(
                      Implies --use-extant to prevent data loss. ''' ),
     ] = False
 
+    incremental: __.typx.Annotated[
+        bool,
+        __.typx.Doc( ''' Reuse compressed segments of unchanged versions
+                     from extant tarball rather than recompress them. ''' ),
+    ] = True
+
+    aliases: __.typx.Annotated[
+        AliasModes,
+        __.typx.Doc( ''' How to materialize stable and development aliases.
+                     Hard links and symlinks avoid duplicate content. ''' ),
+    ] = AliasModes.Hardlink
+
+    deduplicate: __.typx.Annotated[
+        bool,
+        __.typx.Doc( ''' Store identical files across versions only once,
+                     as hard links in the tarball. ''' ),
+    ] = True
+
+    file_workers: __.typx.Annotated[
+        int,
+        __.typx.Doc( ''' Number of threads for copying, removing, and
+                     extracting files. Zero means a default suited to
+                     input and output. ''' ),
+    ] = 0
+
+    compression: _compressors.Compression = __.dcls.field(
+        default_factory = _compressors.Compression )
+
+    publication: _publications.Publication = __.dcls.field(
+        default_factory = _publications.Publication )
+
+    retention: _manifests.Retention = __.dcls.field(
+        default_factory = _manifests.Retention )
+
+    trace: __.typx.Annotated[
+        __.typx.Optional[ __.Path ],
+        __.typx.Doc( ''' File to which timing spans of stages are written,
+                     in Chrome trace event format. ''' ),
+    ] = None
+
     async def __call__(
         self, auxdata: __.Globals, display: _interfaces.ConsoleDisplay
     ) -> None:
-        update(
-            auxdata, self.version,
+        versions = dict(
+            _parse_version_specification( specification )
+            for specification in self.versions )
+        with _tracing.activate_tracer( self.trace ):
+            await update(
+                auxdata, versions,
+                use_extant = self.use_extant,
+                production = self.production,
+                incremental = self.incremental,
+                aliases = self.aliases,
+                deduplicate = self.deduplicate,
+                file_workers = self.file_workers,
+                compression = self.compression,
+                publication = self.publication,
+                retention = self.retention )
+
+
+class PruneCommand(
+    _interfaces.CliCommand, decorators = ( __.standard_tyro_class, ),
+):
+    ''' Prunes release versions from static website by retention policy. '''
+
+    use_extant: __.typx.Annotated[
+        bool,
+        __.typx.Doc( ''' Fetch publication branch and use tarball. ''' ),
+    ] = False
+
+    production: __.typx.Annotated[
+        bool,
+        __.typx.Doc( ''' Update publication branch with pruned tarball.
+                     Implies --use-extant to prevent data loss. ''' ),
+    ] = False
+
+    file_workers: __.typx.Annotated[
+        int,
+        __.typx.Doc( ''' Number of threads for removing and extracting
+                     files. Zero means a default suited to input and
+                     output. ''' ),
+    ] = 0
+
+    compression: _compressors.Compression = __.dcls.field(
+        default_factory = _compressors.Compression )
+
+    publication: _publications.Publication = __.dcls.field(
+        default_factory = _publications.Publication )
+
+    retention: _manifests.Retention = __.dcls.field(
+        default_factory = _manifests.Retention )
+
+    async def __call__(
+        self, auxdata: __.Globals, display: _interfaces.ConsoleDisplay
+    ) -> None:
+        await prune(
+            auxdata,
+            use_extant = self.use_extant,
+            production = self.production,
+            file_workers = self.file_workers,
+            compression = self.compression,
+            publication = self.publication,
+            retention = self.retention )
+
+
+class RestoreCommand(
+    _interfaces.CliCommand, decorators = ( __.standard_tyro_class, ),
+):
+    ''' Restores complete static website from all of its archives. '''
+
+    use_extant: __.typx.Annotated[
+        bool,
+        __.typx.Doc( ''' Fetch publication branch and all archives. ''' ),
+    ] = False
+
+    file_workers: __.typx.Annotated[
+        int,
+        __.typx.Doc( ''' Number of threads for removing and extracting
+                     files. Zero means a default suited to input and
+                     output. ''' ),
+    ] = 0
+
+    publication: _publications.Publication = __.dcls.field(
+        default_factory = _publications.Publication )
+
+    async def __call__(
+        self, auxdata: __.Globals, display: _interfaces.ConsoleDisplay
+    ) -> None:
+        await restore(
+            auxdata,
             use_extant = self.use_extant,
-            production = self.production )
+            file_workers = self.file_workers,
+            publication = self.publication )
 
 
 class CommandDispatcher(
@@ -85,10 +297,22 @@ class CommandDispatcher(
             SurveyCommand,
             __.tyro.conf.subcommand( 'survey', prefix_name = False ),
         ],
+        __.typx.Annotated[
+            StatsCommand,
+            __.tyro.conf.subcommand( 'stats', prefix_name = False ),
+        ],
         __.typx.Annotated[
             UpdateCommand,
             __.tyro.conf.subcommand( 'update', prefix_name = False ),
         ],
+        __.typx.Annotated[
+            PruneCommand,
+            __.tyro.conf.subcommand( 'prune', prefix_name = False ),
+        ],
+        __.typx.Annotated[
+            RestoreCommand,
+            __.tyro.conf.subcommand( 'restore', prefix_name = False ),
+        ],
     ]
 
     async def __call__(
@@ -103,8 +327,10 @@ class Locations( __.immut.DataclassObject ):
 
     project: __.Path
     auxiliary: __.Path
+    caches: __.Path
     publications: __.Path
     archive: __.Path
+    shards: __.Path
     artifacts: __.Path
     website: __.Path
     coverage: __.Path
@@ -133,8 +359,10 @@ class Locations( __.immut.DataclassObject ):
         return selfclass(
             project = project,
             auxiliary = auxiliary,
+            caches = auxiliary / 'caches',
             publications = publications,
             archive = publications / 'website.tar.xz',
+            shards = publications / 'website',
             artifacts = auxiliary / 'artifacts',
             website = auxiliary / 'artifacts/website',
             coverage = auxiliary / 'artifacts/website/coverage.svg',
@@ -143,34 +371,178 @@ class Locations( __.immut.DataclassObject ):
             templates = templates )
 
 
-def survey(
+async def prune( # noqa: PLR0913
     auxdata: __.Globals, *,
     project_anchor: __.Absential[ __.Path ] = __.absent,
-    use_extant: bool = False
+    use_extant: bool = False,
+    production: bool = False,
+    file_workers: int = 0,
+    compression: _compressors.Compression = _COMPRESSION_DEFAULT,
+    publication: _publications.Publication = _PUBLICATION_DEFAULT,
+    retention: _manifests.Retention = _RETENTION_DEFAULT,
+) -> None:
+    ''' Prunes release versions from project website by retention policy.
+
+        Pruned versions are dropped from the versions manifest, the website
+        directory, and the archives in one pass. The index is rendered
+        again without them. With the sharded layout, only the root shard is
+        restored and rewritten and the shards of pruned versions are
+        deleted, both locally and, in production, from the publication
+        branch. Versions, to which the manifest points, are never pruned.
+    '''
+    locations = Locations.from_project_anchor( auxdata, project_anchor )
+    async with _lock_workspace( locations ):
+        locations.publications.mkdir( exist_ok = True, parents = True )
+        # --production implies --use-extant to prevent clobbering versions
+        commit = (
+            await _fetch_publication_branch_and_tarball(
+                locations, publication )
+            if use_extant or production else None )
+        with _filesystem.produce_executor( file_workers ) as executor:
+            await __.asyncio.to_thread(
+                _restore_website,
+                locations, executor, publication.layout, ( ), commit )
+            index_data, pruned = await __.asyncio.to_thread(
+                _prune_website, locations, retention, ( ), executor )
+            if not pruned:
+                await __.asyncio.to_thread(
+                    _save_extraction_record, locations, publication.layout )
+                print( "No versions to prune." )
+                return
+            _enhance_index_data_with_stable_dev( index_data )
+            j2context = await __.asyncio.to_thread(
+                _provide_jinja_environment,
+                locations.templates, locations.caches / 'jinja2' )
+            rendering = executor.submit(
+                __.contextvars.copy_context( ).run,
+                _update_index_and_coverage_badge,
+                locations, j2context, index_data, __.absent )
+            archives = await _save_website(
+                locations, ( ),
+                compression = compression,
+                incremental = True,
+                layout = publication.layout,
+                prerequisite = rendering )
+            signature = await __.asyncio.to_thread(
+                _save_extraction_record, locations, publication.layout )
+        if production:
+            await _update_publication_branch(
+                locations,
+                f"Prune documents from publication. ({', '.join( pruned )})",
+                publication, archives,
+                signature = signature, parent = commit, pruned = pruned )
+        print( f"Pruned versions: {', '.join( pruned )}" )
+
+
+async def restore(
+    auxdata: __.Globals, *,
+    project_anchor: __.Absential[ __.Path ] = __.absent,
+    use_extant: bool = False,
+    file_workers: int = 0,
+    publication: _publications.Publication = _PUBLICATION_DEFAULT,
+) -> None:
+    ''' Restores complete website directory from all of its archives.
+
+        With the sharded layout, updates and pruning only restore the root
+        shard and the shards, which they touch. Before the website directory
+        is deployed, this restores the shards of all other versions and
+        aliases too. A warm website directory is reconciled with the
+        archives rather than extracted again.
+    '''
+    locations = Locations.from_project_anchor( auxdata, project_anchor )
+    async with _lock_workspace( locations ):
+        if use_extant: await _fetch_website_archives( locations, publication )
+        archives = _survey_website_archives( locations, publication.layout )
+        if not archives:
+            context = "published" if use_extant else "local"
+            print( f"No archives found for {context} website. "
+                   f"Run 'website update' first." )
+            return
+        versions = tuple( name for name in archives if name )
+        with _filesystem.produce_executor( file_workers ) as executor:
+            await __.asyncio.to_thread(
+                _restore_website,
+                locations, executor, publication.layout, versions )
+            await __.asyncio.to_thread(
+                _save_extraction_record, locations, publication.layout )
+
+
+async def stats(
+    auxdata: __.Globals, *,
+    project_anchor: __.Absential[ __.Path ] = __.absent,
+    use_extant: bool = False,
+    json: bool = False,
+    publication: _publications.Publication = _PUBLICATION_DEFAULT,
+) -> None:
+    ''' Reports sizes, file counts, and duplication of website archives.
+
+        Each archive is streamed once. Compressed and uncompressed bytes,
+        file counts, and the ratio of duplicate content are reported for the
+        whole website, its top-level files, each version or alias, and each
+        documentation species. Compressed bytes are attributed to versions
+        by the archive index or by shard. Species share compressed streams
+        with their versions, so they have no compressed bytes of their own.
+    '''
+    locations = Locations.from_project_anchor( auxdata, project_anchor )
+    if use_extant:
+        async with _lock_workspace( locations ):
+            await _fetch_website_archives( locations, publication )
+    archives = _survey_website_archives( locations, publication.layout )
+    if not archives:
+        context = "published" if use_extant else "local"
+        print( f"No archives found for {context} website. "
+               f"Run 'website update' first." )
+        return
+    statistics = await __.asyncio.to_thread(
+        _calculate_statistics, archives, publication.layout )
+    if json:
+        print( __.json.dumps( statistics, indent = 4 ) )
+        return
+    context = "Published" if use_extant else "Local"
+    print( f"{context} website ({publication.layout.value}):" )
+    print( f"  total: {_format_statistics( statistics[ 'total' ] )}" )
+    print( f"  root: {_format_statistics( statistics[ 'root' ] )}" )
+    for title in ( 'versions', 'species' ):
+        print( f"{title.capitalize( )}:" )
+        for name, entry in statistics[ title ].items( ):
+            print( f"  {name}: {_format_statistics( entry )}" )
+
+
+async def survey(
+    auxdata: __.Globals, *,
+    project_anchor: __.Absential[ __.Path ] = __.absent,
+    use_extant: bool = False,
+    publication: _publications.Publication = _PUBLICATION_DEFAULT,
 ) -> None:
     ''' Surveys release versions published in static website.
 
         Lists all versions from the versions manifest, showing their
         available documentation types and highlighting the latest version.
+        The published manifest is read directly from the tarball.
     '''
     locations = Locations.from_project_anchor( auxdata, project_anchor )
+    content: __.typx.Optional[ bytes ] = None
     if use_extant:
-        _fetch_publication_branch_and_tarball( locations )
-        # Extract the fetched tarball to view published versions
-        if locations.archive.is_file( ):
-            from tarfile import open as tarfile_open
-            if locations.website.is_dir( ):
-                __.shutil.rmtree( locations.website )
-            locations.website.mkdir( exist_ok = True, parents = True )
-            with tarfile_open( locations.archive, 'r:xz' ) as archive:
-                archive.extractall( path = locations.website ) # noqa: S202
-    if not locations.versions.is_file( ):
+        async with _lock_workspace( locations ):
+            await _fetch_publication_branch_and_tarball(
+                locations, publication )
+        archive = _find_archive(
+            _calculate_shard_location( locations )
+            if publication.layout is _publications.Layouts.Shards
+            else locations.archive )
+        # Read manifest straight from tarball; no need to extract it.
+        if archive.is_file( ):
+            with _tracing.span( 'read-manifest' ):
+                content = _archives.read_archive_member(
+                    archive, locations.versions.name )
+    elif locations.versions.is_file( ):
+        content = locations.versions.read_bytes( )
+    if content is None:
         context = "published" if use_extant else "local"
         print( f"No versions manifest found for {context} website. "
                f"Run 'website update' first." )
         return
-    with locations.versions.open( 'r' ) as file:
-        data = __.json.load( file )
+    data = __.json.loads( content )
     versions = data.get( 'versions', { } )
     latest = data.get( 'latest_version' )
     if not versions:
@@ -185,75 +557,465 @@ def survey(
         print( f"  {version}{marker}: {species_list}" )
 
 
-def update(
+async def update( # noqa: PLR0913
     auxdata: __.Globals,
-    version: str, *,
+    versions: str | __.cabc.Mapping[ str, __.Absential[ __.Path ] ], *,
     project_anchor: __.Absential[ __.Path ] = __.absent,
     use_extant: bool = False,
-    production: bool = False
+    production: bool = False,
+    incremental: bool = True,
+    aliases: AliasModes = AliasModes.Hardlink,
+    deduplicate: bool = True,
+    file_workers: int = 0,
+    compression: _compressors.Compression = _COMPRESSION_DEFAULT,
+    publication: _publications.Publication = _PUBLICATION_DEFAULT,
+    retention: _manifests.Retention = _RETENTION_DEFAULT,
 ) -> None:
     ''' Updates project website with latest documentation and coverage.
 
-        Processes the specified version, copies documentation artifacts,
-        updates version information, and generates coverage badges.
+        Processes the specified versions, copies documentation artifacts,
+        updates version information, and generates coverage badges. Either
+        a single version, which uses the project artifacts, or a mapping of
+        versions to their artifacts directories may be given. All versions
+        are processed in one pass and, in production, published in one
+        commit, if any archive changed. With a retention policy, versions,
+        which it drops, are pruned in the same pass.
     '''
-    ictr( 2 )( version )
+    ictr( 2 )( versions )
     # TODO: Validate version string format.
-    from tarfile import open as tarfile_open
     locations = Locations.from_project_anchor( auxdata, project_anchor )
-    locations.publications.mkdir( exist_ok = True, parents = True )
-    # --production implies --use-extant to prevent clobbering existing versions
-    if use_extant or production:
-        _fetch_publication_branch_and_tarball( locations )
-    if locations.website.is_dir( ): __.shutil.rmtree( locations.website )
-    locations.website.mkdir( exist_ok = True, parents = True )
-    if locations.archive.is_file( ):
-        with tarfile_open( locations.archive, 'r:xz' ) as archive:
-            archive.extractall( path = locations.website ) # noqa: S202
-    available_species = _update_available_species( locations, version )
-    j2context = _jinja2.Environment(
-        loader = _jinja2.FileSystemLoader( locations.templates ),
-        autoescape = True )
-    index_data = _update_versions_json( locations, version, available_species )
-    _enhance_index_data_with_stable_dev( index_data )
-    _create_stable_dev_directories( locations, index_data )
-    _update_index_html( locations, j2context, index_data )
-    if ( locations.artifacts / 'coverage-pytest' ).is_dir( ):
-        _update_coverage_badge( locations, j2context )
-        _update_version_coverage_badge( locations, j2context, version )
-    ( locations.website / '.nojekyll' ).touch( )
-    from .filesystem import chdir
-    with chdir( locations.website ): # noqa: SIM117
-        with tarfile_open( locations.archive, 'w:xz' ) as archive:
-            archive.add( '.' )
-    if production: _update_publication_branch( locations, version )
+    async with _lock_workspace( locations ):
+        releases = _survey_releases( locations, versions )
+        locations.publications.mkdir( exist_ok = True, parents = True )
+        coverages: _Coverages = { }
+        # --production implies --use-extant to prevent clobbering versions
+        j2context, commit = await _prepare_update(
+            locations, publication, releases, coverages,
+            fetch = use_extant or production )
+        # Retention may repoint aliases to any version; extract all of them.
+        partial = incremental and not retention.is_active( )
+        with _filesystem.produce_executor( file_workers ) as executor:
+            await __.asyncio.to_thread(
+                _restore_website,
+                locations, executor, publication.layout, releases, commit,
+                compression = compression if partial else None )
+            catalog = await _update_available_species_concurrently(
+                releases, executor )
+            metadata = await _calculate_versions_metadata(
+                releases, catalog, coverages )
+            index_data = await __.asyncio.to_thread(
+                _update_versions_json, locations, catalog, metadata )
+            pruned: tuple[ str, ... ] = ( )
+            if retention.is_active( ):
+                index_data, pruned = await __.asyncio.to_thread(
+                    _prune_website, locations, retention, tuple( releases ),
+                    executor )
+            _enhance_index_data_with_stable_dev( index_data )
+            svg_content = await __.asyncio.to_thread(
+                _update_version_coverage_badges,
+                j2context, releases, coverages )
+            await __.asyncio.to_thread(
+                _create_stable_dev_directories,
+                locations, index_data, aliases, executor )
+            ( locations.website / '.nojekyll' ).touch( )
+            if deduplicate:
+                await __.asyncio.to_thread(
+                    _deduplicate_versions, locations, tuple( releases ) )
+            rendering = executor.submit(
+                __.contextvars.copy_context( ).run,
+                _update_index_and_coverage_badge,
+                locations, j2context, index_data, svg_content )
+            archives = await _save_website(
+                locations, releases,
+                compression = compression,
+                incremental = incremental,
+                layout = publication.layout,
+                prerequisite = rendering )
+            await __.asyncio.to_thread(
+                _complete_website, locations, publication.layout, executor )
+            signature = await __.asyncio.to_thread(
+                _save_extraction_record, locations, publication.layout )
+        if production:
+            await _update_publication_branch(
+                locations,
+                f"Update documents for publication. ({', '.join( releases )})",
+                publication, archives,
+                signature = signature, parent = commit, pruned = pruned )
+
+
+async def update_projects(
+    auxdata: __.Globals,
+    projects: __.cabc.Mapping[
+        __.Path, str | __.cabc.Mapping[ str, __.Absential[ __.Path ] ] ], *,
+    concurrency: int = 0,
+    **options: __.typx.Any,
+) -> None:
+    ''' Updates websites of several projects concurrently in one process.
+
+        Each project anchor is mapped to the versions to update, as given
+        to ``update``, which receives the other options as well. Website
+        operations work from explicit paths and never change the working
+        directory, so that updates of different projects can overlap. Zero
+        concurrency means no limit on the number of simultaneous updates.
+
+        All updates run to completion, even if some fail. The first failure,
+        in order of projects, is then raised.
+    '''
+    limit = __.asyncio.Semaphore(
+        concurrency if concurrency > 0 else max( len( projects ), 1 ) )
+
+    async def update_project(
+        anchor: __.Path,
+        versions: str | __.cabc.Mapping[ str, __.Absential[ __.Path ] ],
+    ) -> None:
+        async with limit:
+            await update(
+                auxdata, versions, project_anchor = anchor, **options )
+
+    results = await __.asyncio.gather(
+        *(  update_project( anchor, versions )
+            for anchor, versions in projects.items( ) ),
+        return_exceptions = True )
+    for result in results:
+        if isinstance( result, BaseException ): raise result
+
+
+class _Tally:
+    ''' Tally of files, bytes, and duplicate content of part of website. '''
+
+    def __init__( self ) -> None:
+        self.files = 0
+        self.size = 0
+        self.duplicates = 0
+        self.compressed: __.typx.Optional[ int ] = None
+
+    def add_compressed( self, size: int ) -> None:
+        ''' Adds compressed bytes. '''
+        self.compressed = ( self.compressed or 0 ) + size
+
+    def add_member(
+        self, member: _archives.ArchiveMember, duplicate: bool
+    ) -> None:
+        ''' Adds archive member, which may duplicate earlier content. '''
+        self.files += 1
+        self.size += member.size
+        if duplicate: self.duplicates += member.size
+
+    def render( self, compressed: bool = True ) -> dict[ str, __.typx.Any ]:
+        ''' Renders tally as JSON-compatible data. '''
+        data: dict[ str, __.typx.Any ] = {
+            'files': self.files,
+            'size': self.size,
+            'duplicates': self.duplicates,
+            'duplicate_ratio':
+                round( self.duplicates / self.size, 4 ) if self.size else 0.0,
+        }
+        if compressed: data[ 'compressed' ] = self.compressed
+        return data
+
+
+def _calculate_statistics(
+    archives: __.cabc.Mapping[ str, __.Path ],
+    layout: _publications.Layouts,
+) -> dict[ str, __.typx.Any ]:
+    ''' Calculates statistics of website from its archives.
+
+        Archives are keyed by the top-level directories, which they hold,
+        and the root archive by the empty name. Content is a duplicate, if
+        it is a hard link or has been seen earlier in any archive.
+    '''
+    total, root = _Tally( ), _Tally( )
+    versions: dict[ str, _Tally ] = { }
+    species: dict[ str, _Tally ] = { }
+    digests: set[ str ] = set( )
+
+    def access_tally( name: str ) -> _Tally:
+        return versions.setdefault( name, _Tally( ) ) if name else root
 
+    for name, archive in archives.items( ):
+        survey = _archives.survey_archive( archive )
+        size = archive.stat( ).st_size
+        total.add_compressed( size )
+        if layout is _publications.Layouts.Shards:
+            access_tally( name ).add_compressed( size )
+        elif survey.index is not None:
+            root.add_compressed( survey.index.head + survey.index.coda )
+            for segment in survey.index.segments:
+                access_tally( segment.name ).add_compressed( segment.size )
+        for member in survey.members:
+            duplicate = member.link or member.digest in digests
+            digests.add( member.digest )
+            parts = member.name.split( '/' )
+            tallies = [
+                total, access_tally( parts[ 0 ] if len( parts ) > 1 else '' ) ]
+            if len( parts ) > 2: # noqa: PLR2004
+                tallies.append( species.setdefault( parts[ 1 ], _Tally( ) ) )
+            for tally in tallies: tally.add_member( member, duplicate )
+    return {
+        'layout': layout.value,
+        'total': total.render( ),
+        'root': root.render( ),
+        'versions': {
+            name: tally.render( ) for name, tally in versions.items( ) },
+        'species': {
+            name: tally.render( compressed = False )
+            for name, tally in sorted( species.items( ) ) },
+    }
 
+
+def _complete_website(
+    locations: Locations,
+    layout: _publications.Layouts,
+    executor: __.typx.Optional[ _Executor ] = None,
+) -> None:
+    ''' Extracts segments of tarball, which are absent, into website.
+
+        After partial restoration, segments of versions, which the update
+        does not touch, are only retained in the tarball. The website
+        directory is deployed as it is, so they are extracted, once the
+        tarball is saved.
+    '''
+    if layout is not _publications.Layouts.Tarball: return
+    archive = _find_archive( locations.archive )
+    if not archive.is_file( ): return
+    index = _archives.read_archive_index( archive )
+    if index is None: return
+    website = locations.website
+    selection = frozenset(
+        segment.name for segment in index.segments
+        if not ( website / segment.name ).is_dir( ) )
+    if not selection: return
+    _archives.extract_archive(
+        archive, website, executor = executor, selection = selection )
+
+
+def _create_alias(
+    source: __.Path,
+    destination: __.Path,
+    mode: AliasModes,
+    executor: __.typx.Optional[ _Executor ] = None,
+) -> None:
+    ''' Creates alias directory for version, replacing any previous one. '''
+    if destination.is_symlink( ) or destination.is_dir( ):
+        _filesystem.remove_tree( destination, executor = executor )
+    if not source.is_dir( ): return
+    match mode:
+        case AliasModes.Copy:
+            _filesystem.copy_tree( source, destination, executor = executor )
+        case AliasModes.Hardlink:
+            _filesystem.copy_tree(
+                source, destination,
+                copier = _link_or_copy_file, executor = executor )
+        case AliasModes.Symlink:
+            destination.symlink_to( source.name, target_is_directory = True )
+
+
+def _calculate_version_metadata(
+    locations: Locations,
+    version: str,
+    species: __.cabc.Collection[ str ],
+    coverages: __.typx.Optional[ _Coverages ] = None,
+) -> dict[ str, __.typx.Any ]:
+    ''' Calculates size, file count, digest, and coverage of version.
+
+        Sizes and digests come from fingerprints of the synchronized
+        artifacts, so that no files need to be read again.
+    '''
+    fingerprints = _restore_fingerprints( locations.website / version )
+    entries = sorted(
+        ( f"{species_}/{name}", fingerprint )
+        for species_, fingerprints_ in fingerprints.items( )
+        if species_ in species
+        for name, fingerprint in fingerprints_.items( ) )
+    digest = __.hashlib.sha256( )
+    for name, fingerprint in entries:
+        digest.update( f"{name}\0{fingerprint.digest}\n".encode( ) )
+    coverage = (
+        _extract_coverage( locations, coverages )
+        if 'coverage-pytest' in species else None )
+    return dict(
+        size = sum( fingerprint.size for _, fingerprint in entries ),
+        files = len( entries ),
+        digest = digest.hexdigest( ),
+        coverage = coverage )
+
+
+async def _calculate_versions_metadata(
+    releases: __.cabc.Mapping[ str, Locations ],
+    catalog: __.cabc.Mapping[ str, __.cabc.Collection[ str ] ],
+    coverages: _Coverages,
+) -> dict[ str, dict[ str, __.typx.Any ] ]:
+    ''' Calculates metadata of several versions concurrently. '''
+    metadata = await __.asyncio.gather( *(
+        __.asyncio.to_thread(
+            _calculate_version_metadata,
+            locations, version, catalog[ version ], coverages )
+        for version, locations in releases.items( ) ) )
+    return dict( zip( releases, metadata, strict = True ) )
+
+
+def _calculate_archive_name( locations: Locations, archive: __.Path ) -> str:
+    ''' Calculates name of archive relative to publications directory. '''
+    return archive.relative_to( locations.publications ).as_posix( )
+
+
+def _calculate_shard_location(
+    locations: Locations, name: __.Absential[ str ] = __.absent
+) -> __.Path:
+    ''' Calculates location of shard for directory or of root shard.
+
+        The location is that of the default codec. Other codecs have
+        variants of it.
+    '''
+    suffix = _compressors.ARCHIVE_SUFFIXES[ _COMPRESSION_DEFAULT.codec ]
+    if __.is_absent( name ): return locations.shards / f"root{suffix}"
+    return locations.shards / 'versions' / f"{name}{suffix}"
+
+
+def _find_archive( archive: __.Path ) -> __.Path:
+    ''' Finds extant variant of archive for any codec.
+
+        Returns the archive itself, if no variant exists.
+    '''
+    return next(
+        (   variant for variant in _survey_archive_variants( archive )
+            if variant.is_file( ) ), archive )
+
+
+def _locate_archive(
+    archive: __.Path, codec: _compressors.Codecs
+) -> __.Path:
+    ''' Locates variant of archive, which is named for codec.
+
+        Tools, which choose decompressors by file name, can then read it.
+    '''
+    name = _strip_archive_suffix( archive.name )
+    return archive.with_name(
+        f"{name}{_compressors.ARCHIVE_SUFFIXES[ codec ]}" )
+
+
+def _remove_archive_variants( archive: __.Path ) -> None:
+    ''' Removes variants of archive for other codecs, which it supersedes. '''
+    for variant in _survey_archive_variants( archive ):
+        if variant != archive: variant.unlink( missing_ok = True )
+
+
+def _strip_archive_suffix( name: str ) -> str:
+    ''' Strips suffix of any codec from name of archive. '''
+    for suffix in _compressors.ARCHIVE_SUFFIXES.values( ):
+        if name.endswith( suffix ): return name.removesuffix( suffix )
+    return name
+
+
+def _survey_archive_variants( archive: __.Path ) -> tuple[ __.Path, ... ]:
+    ''' Surveys variants of archive for all codecs. '''
+    return tuple(
+        _locate_archive( archive, codec ) for codec in _compressors.Codecs )
+
+
+def _fingerprint_archive(
+    archive: __.Path
+) -> __.typx.Optional[ list[ int ] ]:
+    ''' Fingerprints archive by size and modification time, if it exists. '''
+    if not archive.is_file( ): return None
+    status = archive.stat( )
+    return [ status.st_size, status.st_mtime_ns ]
+
+
+def _is_archive_intact(
+    archive: __.Path, fingerprint: __.typx.Optional[ __.cabc.Sequence[ int ] ]
+) -> bool:
+    ''' Is archive unchanged since it was recorded? '''
+    if fingerprint is None or not archive.is_file( ): return False
+    status = archive.stat( )
+    return [ status.st_size, status.st_mtime_ns ] == list( fingerprint )
+
+
+def _is_website_intact(
+    locations: Locations,
+    commit: str,
+    layout: _publications.Layouts,
+    versions: __.cabc.Collection[ str ],
+    signature: __.typx.Optional[ str ],
+) -> bool:
+    ''' Is website directory unchanged since it was recorded for commit?
+
+        The signature is that of the website directory, if it exists. The
+        directories of all given versions must have been extracted too.
+        With the sharded layout, versions without shards are exempt, since
+        they are not published yet.
+    '''
+    if signature is None: return False
+    record = _restore_publication_record( locations, commit )
+    if record.get( 'layout' ) != layout.value: return False
+    if record.get( 'website' ) != signature: return False
+    directories = frozenset( record.get( 'directories', ( ) ) )
+
+    def is_extracted( version: str ) -> bool:
+        if version in directories: return True
+        shard = _calculate_shard_location( locations, version )
+        shard = _find_archive( shard )
+        return layout is _publications.Layouts.Shards and not shard.is_file( )
+
+    return all( map( is_extracted, versions ) )
+
+
+@_tracing.spanned( 'create-aliases' )
 def _create_stable_dev_directories(
-    locations: Locations, data: dict[ __.typx.Any, __.typx.Any ]
+    locations: Locations,
+    data: dict[ __.typx.Any, __.typx.Any ],
+    mode: AliasModes = AliasModes.Hardlink,
+    executor: __.typx.Optional[ _Executor ] = None,
 ) -> None:
     ''' Creates stable/ and development/ directories with current releases.
 
-        Copies the content from the identified stable and development versions
-        to stable/ and development/ directories to provide persistent URLs
-        that don't change when new versions are released.
-    '''
-    stable_version = data.get( 'stable_version' )
-    development_version = data.get( 'development_version' )
-    if stable_version:
-        stable_source = locations.website / stable_version
-        stable_dest = locations.website / 'stable'
-        if stable_dest.is_dir( ):
-            __.shutil.rmtree( stable_dest )
-        if stable_source.is_dir( ):
-            __.shutil.copytree( stable_source, stable_dest )
-    if development_version:
-        dev_source = locations.website / development_version
-        dev_dest = locations.website / 'development'
-        if dev_dest.is_dir( ):
-            __.shutil.rmtree( dev_dest )
-        if dev_source.is_dir( ):
-            __.shutil.copytree( dev_source, dev_dest )
+        Aliases the content from the identified stable and development
+        versions as stable/ and development/ directories to provide
+        persistent URLs that don't change when new versions are released.
+        Hard links and relative symlinks avoid duplicating the content.
+    '''
+    for name, key in zip(
+        _ALIAS_NAMES, ( 'stable_version', 'development_version' ),
+        strict = True
+    ):
+        version = data.get( key )
+        if not version: continue
+        _create_alias(
+            locations.website / version, locations.website / name,
+            mode, executor )
+
+
+@_tracing.spanned( 'deduplicate' )
+def _deduplicate_versions(
+    locations: Locations, versions: __.cabc.Collection[ str ]
+) -> int:
+    ''' Links identical files of updated versions to those of others.
+
+        Files of other versions are neither surveyed nor digested. Rather,
+        their digests are taken from the fingerprints of their artifacts,
+        so that cost depends on the updated versions and not on history.
+        Fingerprints are archived with their versions, so extracted versions
+        have them too. Directories without fingerprints, such as versions
+        archived before, and aliases are surveyed, like updated versions.
+        Aliases come last, so that files of versions are kept as originals.
+    '''
+    directories = sorted(
+        ( entry for entry in locations.website.iterdir( )
+          if entry.is_dir( ) and not entry.is_symlink( ) ),
+        key = lambda entry: ( entry.name in _ALIAS_NAMES, entry.name ) )
+    contents: dict[ str, tuple[ int, str ] ] = { }
+    references: dict[ str, tuple[ int, str ] ] = { }
+    surveyed: list[ __.Path ] = [ ]
+    for directory in directories:
+        contents_ = _restore_artifact_contents( directory )
+        if (    contents_ and directory.name not in versions
+            and directory.name not in _ALIAS_NAMES
+        ): references.update( contents_ )
+        else:
+            contents.update( contents_ )
+            surveyed.append( directory )
+    return _filesystem.deduplicate_files(
+        surveyed, references = references, contents = contents )
 
 
 def _enhance_index_data_with_stable_dev(
@@ -261,84 +1023,154 @@ def _enhance_index_data_with_stable_dev(
 ) -> None:
     ''' Enhances index data with stable/development version information.
 
-        Identifies the latest stable release and latest development version
-        from the versions data and adds them as separate entries for the
-        stable/development table.
+        Looks up the latest stable release and latest development version,
+        to which the versions manifest points, and adds them as separate
+        entries for the stable/development table.
     '''
-    from packaging.version import Version
     versions = data.get( 'versions', { } )
-    if not versions:
-        data[ 'stable_dev_versions' ] = { }
-        return
-    stable_version = None
-    development_version = None
-    # Sort versions by packaging.version.Version for proper comparison
-    sorted_versions = sorted(
-        versions.items( ),
-        key = lambda entry: Version( entry[ 0 ] ),
-        reverse = True )
-    # Find latest stable (non-prerelease) and development (prerelease) versions
-    for version_string, species in sorted_versions:
-        version_obj = Version( version_string )
-        if not version_obj.is_prerelease and stable_version is None:
-            stable_version = ( version_string, species )
-        if version_obj.is_prerelease and development_version is None:
-            development_version = ( version_string, species )
-        if stable_version and development_version:
-            break
     stable_dev_versions: dict[ str, tuple[ str, ... ] ] = { }
-    if stable_version:
-        stable_dev_versions[ 'stable (current)' ] = stable_version[ 1 ]
-        data[ 'stable_version' ] = stable_version[ 0 ]
-    if development_version:
-        stable_dev_versions[ 'development (current)' ] = (
-            development_version[ 1 ] )
-        data[ 'development_version' ] = development_version[ 0 ]
+    for label, key in (
+        ( 'stable (current)', 'stable_version' ),
+        ( 'development (current)', 'development_version' ),
+    ):
+        version = data.get( key )
+        if version not in versions: continue
+        stable_dev_versions[ label ] = versions[ version ]
     data[ 'stable_dev_versions' ] = stable_dev_versions
 
 
-def _extract_coverage( locations: Locations ) -> int:
+@_tracing.spanned( 'parse-coverages' )
+def _extract_coverages(
+    releases: __.cabc.Mapping[ str, Locations ], coverages: _Coverages
+) -> None:
+    ''' Extracts coverages from reports of versions into shared results. '''
+    for locations in releases.values( ):
+        report = locations.artifacts / 'coverage-pytest/coverage.xml'
+        if report.is_file( ): _extract_coverage( locations, coverages )
+
+
+def _extract_coverage(
+    locations: Locations,
+    coverages: __.typx.Optional[ _Coverages ] = None,
+) -> int:
     ''' Extracts coverage percentage from coverage report.
 
         Reads the coverage XML report and calculates the overall line coverage
-        percentage, rounded down to the nearest integer.
+        percentage, rounded down to the nearest integer. The report is parsed
+        incrementally and parsing stops at the root element, which carries
+        the overall line rate.
+
+        If a mapping of coverages is given, then results are shared through
+        it, keyed by location, size, and modification time of report, so
+        that each report is only parsed once per run and is not read at all
+        thereafter.
     '''
     location = locations.artifacts / 'coverage-pytest/coverage.xml'
     if not location.exists( ): raise _exceptions.FileAwol( location )
+    if coverages is None: return _parse_coverage( location )
+    status = location.stat( )
+    key = ( str( location ), status.st_size, status.st_mtime_ns )
+    if key not in coverages: coverages[ key ] = _parse_coverage( location )
+    return coverages[ key ]
+
+
+def _parse_coverage( location: __.Path ) -> int:
+    ''' Parses overall line coverage from root of coverage report. '''
     from defusedxml import ElementTree
-    root = ElementTree.parse( location ).getroot( ) # pyright: ignore
+    root = None
+    with location.open( 'rb' ) as file:
+        for _, element in ElementTree.iterparse( # pyright: ignore
+            file, events = ( 'start', )
+        ):
+            root = element # pyright: ignore
+            break
     if root is None:
         raise _exceptions.FileEmpty( location ) # pragma: no cover
-    line_rate = root.get( 'line-rate' )
+    line_rate = root.get( 'line-rate' ) # pyright: ignore
     if not line_rate:
         raise _exceptions.FileDataAwol(
             location, 'line-rate' ) # pragma: no cover
     return __.math.floor( float( line_rate ) * 100 )
 
 
-def _fetch_publication_branch_and_tarball( locations: Locations ) -> None:
-    ''' Fetches publication branch and checks out existing tarball.
+@_tracing.spanned( 'fetch' )
+async def _fetch_publication_branch_and_tarball(
+    locations: Locations,
+    publication: _publications.Publication,
+    versions: __.cabc.Collection[ str ] = ( ),
+) -> __.typx.Optional[ str ]:
+    ''' Fetches publication branch and restores existing tarball from it.
+
+        With the sharded layout, only the root shard and the shards of the
+        given versions are restored. Archives, which are recorded as intact
+        for the fetched commit, are not restored again. Ignores failures if
+        branch or tarball don't exist. Returns commit of branch, if any.
+    '''
+    session = _publications.GitSession(
+        project = locations.project, publication = publication )
+    await session.fetch_branch( )
+    commit = await session.resolve_branch( )
+    record = _restore_publication_record( locations, commit )
+    archives = (
+        _survey_shards( locations, versions )
+        if publication.layout is _publications.Layouts.Shards
+        else ( locations.archive, ) )
+    fingerprints = dict( record.get( 'archives', { } ) )
+    for archive in archives:
+        variants = {
+            _calculate_archive_name( locations, variant ): variant
+            for variant in _survey_archive_variants( archive ) }
+        if any(
+            _is_archive_intact( variant, fingerprints.get( name ) )
+            for name, variant in variants.items( )
+        ): continue
+        for name in variants: fingerprints.pop( name, None )
+        for name, variant in variants.items( ):
+            if not await session.restore_archive( variant ): continue
+            _remove_archive_variants( variant )
+            status = variant.stat( )
+            fingerprints[ name ] = ( status.st_size, status.st_mtime_ns )
+            break
+    ictr( 2 )( session.timings )
+    if commit is not None:
+        record[ 'archives' ] = fingerprints
+        _save_publication_record( locations, commit, record )
+    return commit
+
+
+async def _fetch_website_archives(
+    locations: Locations, publication: _publications.Publication
+) -> None:
+    ''' Fetches publication branch and restores all website archives.
 
-        Attempts to fetch the publication branch from origin and checkout
-        the website tarball. Ignores failures if branch or tarball don't exist.
+        With the sharded layout, the shards of all versions and aliases,
+        which the manifest of the root shard lists, are restored.
     '''
-    with __.ctxl.suppress( Exception ):
-        __.subprocess.run(
-            [ 'git', 'fetch', 'origin', 'publication:publication' ],
-            cwd = locations.project,
-            check = False,
-            capture_output = True )
-    with __.ctxl.suppress( Exception ):
-        __.subprocess.run(
-            [ 'git', 'checkout', 'publication', '--',
-              str( locations.archive ) ],
-            cwd = locations.project,
-            check = False,
-            capture_output = True )
+    await _fetch_publication_branch_and_tarball( locations, publication )
+    if publication.layout is not _publications.Layouts.Shards: return
+    root = _calculate_shard_location( locations )
+    if not root.is_file( ): return
+    content = _archives.read_archive_member( root, locations.versions.name )
+    if content is None: return
+    versions = tuple( __.json.loads( content ).get( 'versions', { } ) )
+    await _fetch_publication_branch_and_tarball(
+        locations, publication, ( *versions, *_ALIAS_NAMES ) )
+
+
+def _format_statistics( entry: __.cabc.Mapping[ str, __.typx.Any ] ) -> str:
+    ''' Formats statistics entry for display. '''
+    compressed = entry.get( 'compressed' )
+    compressed_ = (
+        '' if compressed is None else f", {compressed:,} bytes compressed" )
+    return (
+        f"{entry[ 'files' ]:,} files, {entry[ 'size' ]:,} bytes"
+        f"{compressed_}, {entry[ 'duplicate_ratio' ]:.1%} duplicate" )
 
 
 def _generate_coverage_badge_svg(
-    locations: Locations, j2context: _jinja2.Environment
+    locations: Locations,
+    j2context: _jinja2.Environment,
+    coverages: __.typx.Optional[ _Coverages ] = None,
 ) -> str:
     ''' Generates coverage badge SVG content.
 
@@ -348,7 +1180,7 @@ def _generate_coverage_badge_svg(
         - yellow: 50-79%
         - green: >= 80%
     '''
-    coverage = _extract_coverage( locations )
+    coverage = _extract_coverage( locations, coverages )
     color = (
         'red' if coverage < 50 else ( # noqa: PLR2004
             'yellow' if coverage < 80 else 'green' ) ) # noqa: PLR2004
@@ -368,70 +1200,791 @@ def _generate_coverage_badge_svg(
         value_width = value_width )
 
 
+def _link_or_copy_file( source: str, destination: str ) -> None:
+    ''' Hard links file, falling back to copy if linking is impossible. '''
+    try: __.os.link( source, destination )
+    except OSError: __.shutil.copy2( source, destination )
+
+
+@__.ctxl.asynccontextmanager
+async def _lock_workspace(
+    locations: Locations
+) -> __.cabc.AsyncIterator[ None ]:
+    ''' Holds exclusive lock on website workspace of project.
+
+        Commands, which share a workspace, are serialized, since they
+        remove, extract, and write the website directory and archives. The
+        lock is awaited on a worker thread, so that the event loop stays
+        free meanwhile.
+    '''
+    locations.caches.mkdir( exist_ok = True, parents = True )
+    locking = _filesystem.lock_file( locations.caches / _WORKSPACE_LOCK_NAME )
+    await __.asyncio.to_thread( locking.__enter__ )
+    try: yield
+    finally: locking.__exit__( None, None, None )
+
+
+def _parse_version_specification(
+    specification: str
+) -> tuple[ str, __.Absential[ __.Path ] ]:
+    ''' Parses version, optionally paired with artifacts directory. '''
+    version, separator, artifacts = specification.partition( '=' )
+    return version, __.Path( artifacts ) if separator else __.absent
+
+
+@_tracing.spanned( 'prune' )
+async def _prepare_update(
+    locations: Locations,
+    publication: _publications.Publication,
+    releases: __.cabc.Mapping[ str, Locations ],
+    coverages: _Coverages, *,
+    fetch: bool,
+) -> tuple[ _jinja2.Environment, __.typx.Optional[ str ] ]:
+    ''' Compiles templates and parses coverage reports during fetch.
+
+        Returns the Jinja environment and the commit of the publication
+        branch, if it was fetched. If preparation fails, then the fetch is
+        cancelled rather than left running.
+    '''
+    fetching = (
+        __.asyncio.create_task( _fetch_publication_branch_and_tarball(
+            locations, publication, releases ) )
+        if fetch else None )
+    try:
+        j2context, _ = await __.asyncio.gather(
+            __.asyncio.to_thread(
+                _provide_jinja_environment,
+                locations.templates, locations.caches / 'jinja2' ),
+            __.asyncio.to_thread( _extract_coverages, releases, coverages ) )
+        commit = await fetching if fetching else None
+    finally:
+        if fetching is not None:
+            fetching.cancel( )
+            await __.asyncio.gather( fetching, return_exceptions = True )
+    return j2context, commit
+
+
+def _prune_website(
+    locations: Locations,
+    retention: _manifests.Retention,
+    protections: __.cabc.Collection[ str ] = ( ),
+    executor: __.typx.Optional[ _Executor ] = None,
+) -> tuple[ dict[ __.typx.Any, __.typx.Any ], tuple[ str, ... ] ]:
+    ''' Prunes versions, which retention policy drops, from website.
+
+        The versions are dropped from the manifest, while it is locked, and
+        their directories and local shards are removed. Returns the updated
+        manifest and the pruned versions.
+    '''
+    with _manifests.acquire_manifest(
+        locations.versions, locations.caches / 'versions.lock'
+    ) as data:
+        pruned = _manifests.survey_prunables( data, retention, protections )
+        _manifests.remove_versions( data, pruned )
+    for version in pruned:
+        directory = locations.website / version
+        if directory.is_dir( ):
+            _filesystem.remove_tree( directory, executor = executor )
+        for shard in _survey_archive_variants(
+            _calculate_shard_location( locations, version )
+        ): shard.unlink( missing_ok = True )
+    return data, pruned
+
+
+@__.funct.cache
+@_tracing.spanned( 'compile-templates' )
+def _provide_jinja_environment(
+    templates: __.Path, cache: __.Path
+) -> _jinja2.Environment:
+    ''' Provides Jinja environment, which is reused for life of process.
+
+        Compiled templates are cached as bytecode in the cache directory, so
+        that later runs need not parse templates again.
+    '''
+    cache.mkdir( exist_ok = True, parents = True )
+    return _jinja2.Environment(
+        loader = _jinja2.FileSystemLoader( templates ),
+        bytecode_cache = _jinja2.FileSystemBytecodeCache( str( cache ) ),
+        autoescape = True )
+
+
+def _restore_artifact_contents(
+    location: __.Path
+) -> dict[ str, tuple[ int, str ] ]:
+    ''' Restores sizes and digests of species artifacts of version by path.
+
+        Fingerprints are kept as plain records rather than as objects, since
+        they are restored for the artifacts of all versions at once.
+    '''
+    base = str( location )
+    return {
+        __.os.path.join( base, species, *name.split( '/' ) ):
+            ( size, digest )
+        for species, records in _restore_fingerprint_records(
+            location ).items( )
+        for name, ( size, _, digest ) in records.items( ) }
+
+
+def _restore_fingerprint_record(
+    record: __.cabc.Sequence[ __.typx.Any ]
+) -> tuple[ int, int, str ]:
+    ''' Restores fingerprint record with or without modification time. '''
+    match record:
+        case [ size, mtime, digest ]:
+            return ( int( size ), int( mtime ), str( digest ) )
+        case [ size, digest ]:
+            return ( int( size ), _MTIME_UNKNOWN, str( digest ) )
+        case _: raise ValueError
+
+
+def _restore_fingerprint_records(
+    location: __.Path
+) -> dict[ str, dict[ str, tuple[ int, int, str ] ] ]:
+    ''' Restores size, modification time, and digest of species artifacts.
+
+        Modification times are only known, if the artifacts were
+        synchronized in this workspace. Otherwise, as when the version was
+        extracted from an archive, they are unknown and never match, so
+        that artifacts are digested and compared with the archived digests
+        rather than copied. Absent or malformed fingerprints are treated as
+        empty, which only causes all artifacts to be digested.
+    '''
+    for name in ( _FINGERPRINTS_LOCAL_NAME, _FINGERPRINTS_NAME ):
+        file = location / name
+        if not file.is_file( ): continue
+        try:
+            data = __.json.loads( file.read_bytes( ) )
+            return {
+                species: {
+                    name: _restore_fingerprint_record( record )
+                    for name, record in entries.items( ) }
+                for species, entries in data[ 'species' ].items( ) }
+        except ( AttributeError, KeyError, TypeError, ValueError ): continue
+    return { }
+
+
+def _restore_fingerprints(
+    location: __.Path
+) -> dict[ str, dict[ str, _filesystem.FileFingerprint ] ]:
+    ''' Restores fingerprints of species artifacts for version. '''
+    return {
+        species: {
+            name: _filesystem.FileFingerprint(
+                size = size, mtime = mtime, digest = digest )
+            for name, ( size, mtime, digest ) in records.items( ) }
+        for species, records in _restore_fingerprint_records(
+            location ).items( ) }
+
+
+@_tracing.spanned( 'extract' )
+def _restore_website( # noqa: PLR0913
+    locations: Locations,
+    executor: __.typx.Optional[ _Executor ] = None,
+    layout: _publications.Layouts = _publications.Layouts.Tarball,
+    versions: __.cabc.Collection[ str ] = ( ),
+    commit: __.typx.Optional[ str ] = None, *,
+    compression: __.typx.Optional[ _compressors.Compression ] = None,
+) -> None:
+    ''' Restores website directory from extant archives, if any.
+
+        With the sharded layout, only the root shard and the shards of the
+        given versions are extracted. If a commit of the publication branch
+        is given and the website directory is recorded as intact for it,
+        then nothing is extracted.
+
+        If compression settings are given and the tarball was written with
+        the same codec, then the tarball is extracted partially, as
+        surveyed by ``_survey_extractable_segments``. Its other segments
+        remain compressed and are retained verbatim, when it is saved, and
+        are extracted afterwards by ``_complete_website``.
+
+        Otherwise, a warm website directory, which is unchanged since it
+        was last recorded, is reconciled with the archives rather than
+        removed and extracted again. Only segments, which changed, are
+        extracted. The website directory is signed once for both checks.
+        It is not recorded again here, since callers change it further and
+        record it with ``_save_extraction_record`` afterwards.
+    '''
+    archive = _find_archive( locations.archive )
+    selection: __.Absential[ frozenset[ str ] ] = __.absent
+    if layout is _publications.Layouts.Shards:
+        archives = tuple( map( _find_archive, _survey_shards(
+            locations, versions ) ) )
+        requisites = frozenset( versions )
+    elif archive.is_file( ):
+        archives = ( archive, )
+        index = _archives.read_archive_index( archive )
+        requisites = frozenset(
+            segment.name for segment in index.segments
+        ) if index else frozenset[ str ]( )
+        if (    index and compression
+            and index.codec is compression.codec
+        ):
+            selection = _survey_extractable_segments(
+                locations, index, versions )
+            requisites = index.survey_dependencies( selection )
+    else: archives, requisites = ( ), frozenset[ str ]( )
+    signature = (
+        _filesystem.calculate_tree_signature( locations.website )
+        if locations.website.is_dir( ) else None )
+    if commit is not None and _is_website_intact(
+        locations, commit, layout, requisites, signature
+    ): return
+    archives = tuple( filter( __.Path.is_file, archives ) )
+    if not _reconcile_website(
+        locations, layout, archives, requisites, signature,
+        executor = executor
+    ):
+        if locations.website.is_dir( ):
+            _filesystem.remove_tree( locations.website, executor = executor )
+        locations.website.mkdir( exist_ok = True, parents = True )
+        for archive_ in archives:
+            _archives.extract_archive(
+                archive_, locations.website,
+                executor = executor, selection = selection )
+
+
+def _digest_archives(
+    locations: Locations,
+    archives: __.cabc.Sequence[ __.Path ],
+    record: __.cabc.Mapping[ str, __.typx.Any ],
+) -> dict[ str, dict[ str, __.typx.Any ] ]:
+    ''' Digests segments of archives by archive name.
+
+        Digests of recorded archives, which are unchanged according to
+        their fingerprints, are reused rather than calculated again.
+    '''
+    recorded = record.get( 'archives', { } )
+    entries: dict[ str, dict[ str, __.typx.Any ] ] = { }
+    for archive in archives:
+        name = _calculate_archive_name( locations, archive )
+        entry = recorded.get( name, { } )
+        if not _is_archive_intact( archive, entry.get( 'fingerprint' ) ):
+            status = archive.stat( )
+            entry = dict(
+                fingerprint = [ status.st_size, status.st_mtime_ns ],
+                digests = _archives.digest_archive( archive ) )
+        entries[ name ] = entry
+    return entries
+
+
+def _reconcile_website( # noqa: PLR0913
+    locations: Locations,
+    layout: _publications.Layouts,
+    archives: __.cabc.Sequence[ __.Path ],
+    requisites: __.cabc.Collection[ str ],
+    signature: __.typx.Optional[ str ], *,
+    executor: __.typx.Optional[ _Executor ] = None,
+) -> bool:
+    ''' Reconciles warm website directory with archives.
+
+        The website directory, whose signature is given, if it exists, must
+        be unchanged since it was recorded along with digests of the
+        segments, from which it was extracted.
+        Directories, whose segments are unchanged, are kept. Others are
+        removed and, if they are required, extracted again, along with
+        directories, which link into them. Top-level files are replaced, if
+        the head of any archive changed. Returns whether the website was
+        reconciled; otherwise, it must be extracted anew.
+    '''
+    website = locations.website
+    if signature is None: return False
+    record = _restore_extraction_record( locations )
+    if record.get( 'layout' ) != layout.value: return False
+    if record.get( 'website' ) != signature: return False
+    extractions = record.get( 'extractions', { } )
+    digests = _digest_archives( locations, archives, record )
+    kept: set[ str ] = set( )
+    selections: dict[ __.Path, frozenset[ str ] ] = { }
+    heads = False
+    for archive in archives:
+        name = _calculate_archive_name( locations, archive )
+        current = digests[ name ][ 'digests' ]
+        previous = extractions.get( name, { } )
+        index = _archives.read_archive_index( archive )
+        # Archives without index can only be extracted whole.
+        if index is None: return False
+        changed = {
+            segment for segment, digest in current.items( )
+            if segment and digest != previous.get( segment ) }
+        stale = changed | index.survey_dependents( changed )
+        kept_ = {
+            segment for segment in previous
+            if segment in current and segment not in stale }
+        kept.update( kept_ )
+        heads = heads or current[ '' ] != previous.get( '' )
+        selections[ archive ] = frozenset(
+            segment.name for segment in index.segments
+            if segment.name in requisites and segment.name not in kept_ )
+    _remove_stale_entries( website, kept, heads, executor )
+    for archive, selection in selections.items( ):
+        if not heads and not selection: continue
+        _archives.extract_archive(
+            archive, website, executor = executor, selection = selection )
+    return True
+
+
+def _remove_stale_entries(
+    website: __.Path,
+    kept: __.cabc.Collection[ str ],
+    heads: bool,
+    executor: __.typx.Optional[ _Executor ] = None,
+) -> None:
+    ''' Removes entries of website, which reconciliation does not keep.
+
+        Top-level files are only removed, if heads of archives changed.
+    '''
+    for entry in website.iterdir( ):
+        if entry.is_dir( ) and not entry.is_symlink( ):
+            if entry.name in kept: continue
+            _filesystem.remove_tree( entry, executor = executor )
+        elif heads: entry.unlink( )
+
+
+def _restore_extraction_record(
+    locations: Locations
+) -> dict[ str, __.typx.Any ]:
+    ''' Restores record of archives, from which website was extracted.
+
+        Absent or malformed records result in empty records.
+    '''
+    location = locations.caches / _EXTRACTION_RECORD_NAME
+    if not location.is_file( ): return { }
+    with __.ctxl.suppress( AttributeError, ValueError ):
+        record = __.json.loads( location.read_text( ) )
+        if record.get( 'website' ): return record
+    return { }
+
+
+def _restore_publication_record(
+    locations: Locations, commit: __.typx.Optional[ str ]
+) -> dict[ str, __.typx.Any ]:
+    ''' Restores record of archives and website for publication commit.
+
+        Records of other commits are stale and result in empty records.
+    '''
+    location = locations.caches / _PUBLICATION_RECORD_NAME
+    if commit is None or not location.is_file( ): return { }
+    with __.ctxl.suppress( ValueError ):
+        record = __.json.loads( location.read_text( ) )
+        if record.get( 'commit' ) == commit: return record
+    return { }
+
+
+def _save_publication_record(
+    locations: Locations,
+    commit: str,
+    record: __.cabc.Mapping[ str, __.typx.Any ],
+) -> None:
+    ''' Saves record of archives and website for publication commit. '''
+    locations.caches.mkdir( exist_ok = True, parents = True )
+    ( locations.caches / _PUBLICATION_RECORD_NAME ).write_text(
+        __.json.dumps( { **record, 'commit': commit }, sort_keys = True ) )
+
+
+def _save_extraction_record(
+    locations: Locations,
+    layout: _publications.Layouts,
+    archives: __.Absential[ __.cabc.Sequence[ __.Path ] ] = __.absent,
+) -> str:
+    ''' Saves record of archives, from which website was extracted.
+
+        The record pairs digests of the head and of each segment, whose
+        directory is present, with the signature of the website directory,
+        so that a later restoration can tell which directories are intact.
+        By default, all extant archives of the layout are recorded. Returns
+        the signature for reuse, while the website directory is unchanged.
+    '''
+    website = locations.website
+    if __.is_absent( archives ):
+        archives = tuple(
+            _survey_website_archives( locations, layout ).values( ) )
+    entries = _digest_archives(
+        locations, archives, _restore_extraction_record( locations ) )
+    extractions = {
+        name: {
+            segment: digest
+            for segment, digest in entry[ 'digests' ].items( )
+            if not segment or ( website / segment ).is_dir( ) }
+        for name, entry in entries.items( ) }
+    signature = _filesystem.calculate_tree_signature( website )
+    locations.caches.mkdir( exist_ok = True, parents = True )
+    ( locations.caches / _EXTRACTION_RECORD_NAME ).write_text( __.json.dumps(
+        {   'archives': entries,
+            'extractions': extractions,
+            'layout': layout.value,
+            'website': signature },
+        sort_keys = True ) )
+    return signature
+
+
+@_tracing.spanned( 'compress' )
+async def _save_website( # noqa: PLR0913
+    locations: Locations,
+    versions: __.cabc.Collection[ str ], *,
+    compression: _compressors.Compression,
+    incremental: bool,
+    layout: _publications.Layouts,
+    prerequisite: _Future[ None ],
+) -> tuple[ __.Path, ... ]:
+    ''' Saves website into archives of layout. Returns changed archives.
+
+        In the sharded layout, the root shard holds the top-level files,
+        such as the index, manifest, and badges. Every other shard holds one
+        version or alias directory. Only the root shard and the shards of
+        the given versions, and of aliases to them, are written, since the
+        other directories are not restored.
+
+        Top-level files are only archived after the prerequisite, which
+        produces them, is complete. Meanwhile, directories are compressed.
+
+        In the tarball layout, segments of published versions, which were
+        not extracted, are retained from the extant tarball.
+
+        Archives are reproducible, so archives, whose content is unchanged,
+        are left as they are and are not returned. Sizes and digests of
+        species artifacts are archived with their versions, but their local
+        modification times are not.
+    '''
+    website = locations.website
+    fingerprints = {
+        archive: _fingerprint_archive( archive ) for archive
+        in _survey_website_archives( locations, layout ).values( ) }
+    if layout is _publications.Layouts.Tarball:
+        reusables = (
+            _survey_reusable_segments( locations, versions )
+            if incremental else frozenset[ str ]( ) )
+        archive = _locate_archive( locations.archive, compression.codec )
+        await __.asyncio.to_thread(
+            _archives.write_archive,
+            archive, website,
+            compression = compression,
+            leaders = ( locations.versions.name, ),
+            trailers = _ALIAS_NAMES,
+            reusables = reusables,
+            retainables = _survey_retainable_segments( locations ),
+            exclusions = ( _FINGERPRINTS_LOCAL_NAME, ),
+            prerequisite = prerequisite )
+        _remove_archive_variants( archive )
+        archives = ( archive, )
+    else:
+        archives = await _save_shards(
+            locations, versions,
+            compression = compression, prerequisite = prerequisite )
+    return tuple(
+        archive for archive in archives
+        if not _is_archive_intact( archive, fingerprints.get( archive ) ) )
+
+
+async def _save_shards(
+    locations: Locations,
+    versions: __.cabc.Collection[ str ], *,
+    compression: _compressors.Compression,
+    prerequisite: _Future[ None ],
+) -> tuple[ __.Path, ... ]:
+    ''' Saves root shard and shards of versions and aliases. '''
+    website = locations.website
+    aliases = tuple(
+        name for name in _ALIAS_NAMES
+        if ( website / name ).is_symlink( ) or ( website / name ).is_dir( ) )
+    archives = await __.asyncio.gather( *(
+        __.asyncio.to_thread( _save_shard, locations, compression, name )
+        for name in ( *versions, *aliases ) ) )
+    await __.asyncio.wrap_future( prerequisite )
+    archive = await __.asyncio.to_thread(
+        _save_shard, locations, compression )
+    return ( archive, *archives )
+
+
+@_tracing.spanned( 'compress-shard' )
+def _save_shard(
+    locations: Locations,
+    compression: _compressors.Compression,
+    name: __.Absential[ str ] = __.absent,
+) -> __.Path:
+    ''' Saves shard of version or alias directory or root shard.
+
+        The root shard holds all top-level files, but no directories.
+    '''
+    website = locations.website
+    archive = _locate_archive(
+        _calculate_shard_location( locations, name ), compression.codec )
+    archive.parent.mkdir( exist_ok = True, parents = True )
+    if __.is_absent( name ):
+        leaders = ( locations.versions.name, )
+        selection = frozenset(
+            entry.name for entry in website.iterdir( )
+            if not entry.is_dir( ) and entry.name not in _ALIAS_NAMES )
+    else: leaders, selection = ( ), ( name, )
+    _archives.write_archive(
+        archive, website,
+        compression = compression, leaders = leaders, selection = selection,
+        exclusions = ( _FINGERPRINTS_LOCAL_NAME, ) )
+    _remove_archive_variants( archive )
+    return archive
+
+
+def _save_fingerprints(
+    location: __.Path,
+    fingerprints: __.cabc.Mapping[
+        str, __.cabc.Mapping[ str, _filesystem.FileFingerprint ] ],
+) -> None:
+    ''' Saves fingerprints of species artifacts for version.
+
+        Sizes and digests are saved apart from modification times, which
+        are local to the workspace, so that they can be archived
+        reproducibly with the version.
+    '''
+    archived = { 'species': {
+        species: {
+            name: ( fingerprint.size, fingerprint.digest )
+            for name, fingerprint in entries.items( ) }
+        for species, entries in fingerprints.items( ) } }
+    local = { 'species': {
+        species: {
+            name: ( fingerprint.size, fingerprint.mtime, fingerprint.digest )
+            for name, fingerprint in entries.items( ) }
+        for species, entries in fingerprints.items( ) } }
+    for name, data in (
+        ( _FINGERPRINTS_NAME, archived ), ( _FINGERPRINTS_LOCAL_NAME, local )
+    ):
+        file = location / name
+        # File may be hard link shared with other versions; replace it.
+        file.unlink( missing_ok = True )
+        file.write_text( __.json.dumps( data, sort_keys = True ) )
+
+
+def _survey_extractable_segments(
+    locations: Locations,
+    index: _archives.ArchiveIndex,
+    versions: __.cabc.Collection[ str ],
+) -> frozenset[ str ]:
+    ''' Surveys segments of tarball, which an update must extract.
+
+        These are the segments of the given versions, of the versions, to
+        which the manifest points, since aliases are created from them, and
+        of directories, which link into the given versions, since they
+        cannot be retained once their link targets are compressed anew.
+        Aliases are created anew and need not be extracted.
+    '''
+    content = _archives.read_archive_member(
+        _find_archive( locations.archive ), locations.versions.name )
+    pointers: list[ str ] = [ ]
+    if content is not None:
+        manifest = _manifests.produce_manifest( __.json.loads( content ) )
+        pointers.extend(
+            version for version in (
+                manifest.get( 'stable_version' ),
+                manifest.get( 'development_version' ) )
+            if version )
+    return frozenset(
+        { *versions, *pointers, *index.survey_dependents( versions ) }
+    ).difference( _ALIAS_NAMES )
+
+
+def _survey_releases(
+    locations: Locations,
+    versions: str | __.cabc.Mapping[ str, __.Absential[ __.Path ] ],
+) -> dict[ str, Locations ]:
+    ''' Surveys locations, including artifacts, for each release version. '''
+    if isinstance( versions, str ): versions = { versions: __.absent }
+    if not versions: raise _exceptions.VersionsAbsence( )
+    releases: dict[ str, Locations ] = { }
+    for version, artifacts in versions.items( ):
+        if __.is_absent( artifacts ):
+            releases[ version ] = locations
+            continue
+        artifacts_ = artifacts.resolve( )
+        if not artifacts_.is_dir( ):
+            raise _exceptions.DirectoryAwol( artifacts_ )
+        releases[ version ] = __.dcls.replace(
+            locations, artifacts = artifacts_ )
+    return releases
+
+
+def _survey_shards(
+    locations: Locations, versions: __.cabc.Collection[ str ]
+) -> tuple[ __.Path, ... ]:
+    ''' Surveys locations of root shard and shards of versions. '''
+    return (
+        _calculate_shard_location( locations ),
+        *( _calculate_shard_location( locations, version )
+           for version in versions ) )
+
+
+def _survey_website_archives(
+    locations: Locations, layout: _publications.Layouts
+) -> dict[ str, __.Path ]:
+    ''' Surveys extant archives of website by top-level directory.
+
+        The root shard or the tarball is keyed by the empty name. Returns
+        nothing, if it does not exist.
+    '''
+    if layout is _publications.Layouts.Tarball:
+        archive = _find_archive( locations.archive )
+        return { '': archive } if archive.is_file( ) else { }
+    root = _find_archive( _calculate_shard_location( locations ) )
+    if not root.is_file( ): return { }
+    shards = sorted(
+        shard
+        for suffix in _compressors.ARCHIVE_SUFFIXES.values( )
+        for shard in root.parent.glob( f"versions/*{suffix}" ) )
+    return { '': root, **{
+        _strip_archive_suffix( shard.name ): shard for shard in shards } }
+
+
+def _survey_retainable_segments( locations: Locations ) -> frozenset[ str ]:
+    ''' Surveys published versions, which were never extracted.
+
+        Their segments are retained from the extant tarball. Versions,
+        which were pruned from the manifest, are not retained.
+    '''
+    website = locations.website
+    manifest = _manifests.restore_manifest( locations.versions )
+    return frozenset(
+        version for version in manifest[ 'versions' ]
+        if not ( website / version ).is_dir( ) )
+
+
+def _survey_reusable_segments(
+    locations: Locations, versions: __.cabc.Collection[ str ]
+) -> frozenset[ str ]:
+    ''' Surveys top-level directories which are unaffected by update.
+
+        The stable and development aliases are always considered affected,
+        since a new release may repoint them.
+    '''
+    affected = { *versions, *_ALIAS_NAMES }
+    return frozenset(
+        entry.name for entry in locations.website.iterdir( )
+        if entry.is_dir( ) and entry.name not in affected )
+
+
+@_tracing.spanned( 'synchronize' )
+async def _update_available_species_concurrently(
+    releases: __.cabc.Mapping[ str, Locations ],
+    executor: __.typx.Optional[ _Executor ] = None,
+) -> dict[ str, tuple[ str, ... ] ]:
+    ''' Synchronizes species artifacts of several versions concurrently.
+
+        Returns available species by version.
+    '''
+    species = await __.asyncio.gather( *(
+        __.asyncio.to_thread(
+            _update_available_species, locations, version, executor )
+        for version, locations in releases.items( ) ) )
+    return dict( zip( releases, species, strict = True ) )
+
+
 def _update_available_species(
-    locations: Locations, version: str
+    locations: Locations,
+    version: str,
+    executor: __.typx.Optional[ _Executor ] = None,
 ) -> tuple[ str, ... ]:
+    ''' Synchronizes species artifacts into version directory.
+
+        Only added or changed files are copied and deleted files are
+        removed, according to fingerprints which are kept with the version.
+    '''
     available_species: list[ str ] = [ ]
+    destination = locations.website / version
+    fingerprints = _restore_fingerprints( destination )
     for species in ( 'coverage-pytest', 'sphinx-html' ):
         origin = locations.artifacts / species
         if not origin.is_dir( ): continue
-        destination = locations.website / version / species
-        if destination.is_dir( ): __.shutil.rmtree( destination )
-        __.shutil.copytree( origin, destination )
+        fingerprints[ species ] = _filesystem.synchronize_tree(
+            origin, destination / species, fingerprints.get( species, { } ),
+            executor = executor )
         available_species.append( species )
+    if available_species: _save_fingerprints( destination, fingerprints )
     return tuple( available_species )
 
 
 def _update_coverage_badge(
-    locations: Locations, j2context: _jinja2.Environment
+    locations: Locations,
+    j2context: _jinja2.Environment,
+    svg_content: __.Absential[ str ] = __.absent,
 ) -> None:
     ''' Updates coverage badge SVG.
 
         Generates a color-coded coverage badge based on the current coverage
-        percentage and writes it to the main coverage.svg location.
+        percentage, unless already rendered, and writes it to the main
+        coverage.svg location.
     '''
-    svg_content = _generate_coverage_badge_svg( locations, j2context )
+    if __.is_absent( svg_content ):
+        svg_content = _generate_coverage_badge_svg( locations, j2context )
     with locations.coverage.open( 'w' ) as file:
         file.write( svg_content )
 
 
-def _update_publication_branch( locations: Locations, version: str ) -> None:
-    ''' Updates publication branch with new tarball.
-
-        Adds the tarball to git, commits to the publication branch, and pushes
-        to origin. Uses the same approach as the GitHub workflow.
-    '''
-    __.subprocess.run(
-        [ 'git', 'add', str( locations.archive ) ],
-        cwd = locations.project,
-        check = True )
-    # Commit to publication branch without checkout
-    # Get current tree hash
-    tree_result = __.subprocess.run(
-        [ 'git', 'write-tree' ],
-        cwd = locations.project,
-        check = True, capture_output = True, text = True )
-    tree_hash = tree_result.stdout.strip( )
-    # Check if publication branch exists
-    publication_exists = __.subprocess.run(
-        [ 'git', 'show-ref', '--verify', '--quiet', 'refs/heads/publication' ],
-        cwd = locations.project,
-        check = False ).returncode == 0
-    commit_result = __.subprocess.run(
-        [ 'git', 'commit-tree', tree_hash,
-          *( ( '-p', 'publication' ) if publication_exists else ( ) ),
-          '-m', f"Update documents for publication. ({version})" ],
-        cwd = locations.project,
-        check = True, capture_output = True, text = True )
-    commit_hash = commit_result.stdout.strip( )
-    __.subprocess.run(
-        [ 'git', 'branch', '--force', 'publication', commit_hash ],
-        cwd = locations.project,
-        check = True )
-    __.subprocess.run(
-        [ 'git', 'push', 'origin', 'publication:publication' ],
-        cwd = locations.project,
-        check = True )
+@_tracing.spanned( 'publish' )
+async def _update_publication_branch( # noqa: PLR0913
+    locations: Locations,
+    message: str,
+    publication: _publications.Publication,
+    archives: __.cabc.Sequence[ __.Path ], *,
+    signature: str,
+    parent: __.typx.Optional[ str ] = None,
+    pruned: __.cabc.Sequence[ str ] = ( ),
+) -> None:
+    ''' Updates publication branch with new archives and pushes it.
+
+        The commit is built without the index of the project, so that
+        nothing is staged on behalf of the user. With the sharded layout,
+        the shards of pruned versions are deleted in the same commit. If
+        there are neither archives nor deletions, then nothing is committed
+        or pushed. Afterwards, the archives and website directory are
+        recorded as intact for the new commit, with the given signature of
+        the website directory. Records of other archives carry over from
+        the parent commit, since the new commit leaves them as they were.
+    '''
+    session = _publications.GitSession(
+        project = locations.project, publication = publication )
+    removals = tuple(
+        shard for version in pruned
+        for shard in _survey_archive_variants(
+            _calculate_shard_location( locations, version ) )
+    ) if publication.layout is _publications.Layouts.Shards else ( )
+    # Variants of other codecs are superseded by published archives.
+    removals += tuple(
+        variant for archive in archives
+        for variant in _survey_archive_variants( archive )
+        if variant != archive )
+    if not archives and not removals:
+        print( "Website is unchanged; nothing to publish." )
+        return
+    commit = await session.publish_archives( archives, message, removals )
+    ictr( 2 )( session.timings )
+    fingerprints = dict(
+        _restore_publication_record( locations, parent ).get(
+            'archives', { } ) )
+    for removal in removals:
+        fingerprints.pop( _calculate_archive_name( locations, removal ), None )
+    for archive in archives:
+        status = archive.stat( )
+        name = _calculate_archive_name( locations, archive )
+        fingerprints[ name ] = ( status.st_size, status.st_mtime_ns )
+    _save_publication_record( locations, commit, {
+        'archives': fingerprints,
+        'directories': sorted(
+            entry.name for entry in locations.website.iterdir( )
+            if entry.is_dir( ) ),
+        'layout': publication.layout.value,
+        'website': signature,
+    } )
+
+
+@_tracing.spanned( 'render-index' )
+def _update_index_and_coverage_badge(
+    locations: Locations,
+    j2context: _jinja2.Environment,
+    data: dict[ __.typx.Any, __.typx.Any ],
+    svg_content: __.Absential[ str ],
+) -> None:
+    ''' Updates index and main coverage badge, if any, of website. '''
+    _update_index_html( locations, j2context, data )
+    if __.is_absent( svg_content ): return
+    _update_coverage_badge( locations, j2context, svg_content )
 
 
 def _update_index_html(
@@ -442,58 +1995,83 @@ def _update_index_html(
     ''' Updates index.html with version information.
 
         Generates the main index page showing all available versions and their
-        associated documentation and coverage reports.
+        associated documentation and coverage reports. Rendered output is
+        streamed into the file rather than gathered in memory.
     '''
     template = j2context.get_template( 'website.html.jinja' )
     # TODO: Add error handling for template rendering failures.
     with locations.index.open( 'w' ) as file:
-        file.write( template.render( **data ) )
+        file.writelines( template.generate( **data ) )
+    _tracing.record_progress(
+        size = locations.index.stat( ).st_size, files = 1 )
+
+
+@_tracing.spanned( 'render-badges' )
+def _update_version_coverage_badges(
+    j2context: _jinja2.Environment,
+    releases: __.cabc.Mapping[ str, Locations ],
+    coverages: __.typx.Optional[ _Coverages ] = None,
+) -> __.Absential[ str ]:
+    ''' Updates coverage badges of versions which have coverage reports.
+
+        Returns the badge of the last such version, which the main coverage
+        badge reflects. Reports, which are shared by several versions, are
+        only parsed once.
+    '''
+    if coverages is None: coverages = { }
+    svg_content: __.Absential[ str ] = __.absent
+    for version, locations in releases.items( ):
+        if not ( locations.artifacts / 'coverage-pytest' ).is_dir( ):
+            continue
+        svg_content = _update_version_coverage_badge(
+            locations, j2context, version, coverages )
+    return svg_content
 
 
 def _update_version_coverage_badge(
-    locations: Locations, j2context: _jinja2.Environment, version: str
-) -> None:
+    locations: Locations,
+    j2context: _jinja2.Environment,
+    version: str,
+    coverages: __.typx.Optional[ _Coverages ] = None,
+) -> str:
     ''' Updates version-specific coverage badge SVG.
 
         Generates a coverage badge for the specific version and places it
         in the version's subtree. This allows each version to have its own
-        coverage badge accessible at version/coverage.svg.
+        coverage badge accessible at version/coverage.svg. Returns the
+        badge, so that it can be reused for the main badge.
     '''
-    svg_content = _generate_coverage_badge_svg( locations, j2context )
+    svg_content = _generate_coverage_badge_svg(
+        locations, j2context, coverages )
     version_coverage_path = locations.website / version / 'coverage.svg'
+    # Badge may be hard link shared with other versions; do not write through.
+    version_coverage_path.unlink( missing_ok = True )
     with version_coverage_path.open( 'w' ) as file:
         file.write( svg_content )
+    return svg_content
 
 
+@_tracing.spanned( 'update-manifest' )
 def _update_versions_json(
     locations: Locations,
-    version: str,
-    species: tuple[ str, ... ],
+    releases: __.cabc.Mapping[ str, tuple[ str, ... ] ],
+    metadata: __.typx.Optional[
+        __.cabc.Mapping[ str, __.cabc.Mapping[ str, __.typx.Any ] ] ] = None,
 ) -> dict[ __.typx.Any, __.typx.Any ]:
     ''' Updates versions.json with new version information.
 
         Maintains a JSON file tracking all versions and their available
-        documentation types. Versions are sorted in descending order, with
-        the latest version marked separately.
+        documentation types. Versions are kept in descending order, with
+        the latest, stable, and development versions marked separately.
+        Manifests in the previous format are upgraded. The file is locked
+        during update, so that versions added concurrently are retained.
     '''
     # TODO: Add validation of version string format.
-    # TODO: Consider file locking for concurrent update protection.
-    from packaging.version import Version
-    if not locations.versions.is_file( ):
-        data: dict[ __.typx.Any, __.typx.Any ] = { 'versions': { } }
-        with locations.versions.open( 'w' ) as file:
-            __.json.dump( data, file, indent = 4 )
-    with locations.versions.open( 'r+' ) as file:
-        data = __.json.load( file )
-        versions = data[ 'versions' ]
-        versions[ version ] = species
-        versions = dict( sorted(
-            versions.items( ),
-            key = lambda entry: Version( entry[ 0 ] ),
-            reverse = True ) )
-        data[ 'latest_version' ] = next( iter( versions ) )
-        data[ 'versions' ] = versions
-        file.seek( 0 )
-        __.json.dump( data, file, indent = 4 )
-        file.truncate( )
+    with _manifests.acquire_manifest(
+        locations.versions, locations.caches / 'versions.lock'
+    ) as data:
+        for version, species in releases.items( ):
+            _manifests.update_version(
+                data, version, species,
+                ( metadata or { } ).get( version, { } ) )
     return data
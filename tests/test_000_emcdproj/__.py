@@ -24,10 +24,17 @@
 import collections.abc as   cabc
 import contextlib as        ctxl
 import dataclasses as       dcls
+import                      json
 import                      os
+import                      platform
+import                      random
+import                      time
+import                      tracemalloc
 import                      types
 import                      unicodedata
 
+from datetime import datetime, timezone
+
 from pathlib import Path, PurePosixPath
 
 import typing_extensions as typx
@@ -38,6 +45,23 @@ from absence import Absential, absent, is_absent
 PACKAGE_NAME = 'emcdproj'
 PACKAGES_NAMES = ( PACKAGE_NAME, )
 
+BENCHMARKS_LOCATION = (
+    Path( __file__ ).parents[ 2 ] / '.auxiliary/artifacts/benchmarks' )
+
+
+_SYNTHETIC_WORDS = (
+    '<div>', '</div>', '<p>', '</p>', 'class="section"', 'function',
+    'module', 'parameter', 'returns', 'release', 'version', 'website',
+    'archive', 'the', 'of', 'and', 'to', 'is', 'a', 'in', 'for', 'with' )
+_SYNTHETIC_VOCABULARIES: cabc.Mapping[ str, tuple[ str, ... ] ] = {
+    '.css': (
+        '{', '}', 'margin:', 'padding:', 'color:', 'display:', 'flex;',
+        '0;', '1em;', '#333;', '.section', '.highlight', 'none;', 'auto;' ),
+    '.js': (
+        'function', 'return', 'var', 'const', 'this', '=>', '(', ')', '{',
+        '}', ';', 'document', 'element', 'if', 'null', 'undefined' ),
+}
+
 
 _modules_cache: dict[ str, types.ModuleType ] = { }
 def cache_import_module( qname: str ) -> types.ModuleType:
@@ -69,6 +93,85 @@ def create_test_files(
             if filepath.exists( ): filepath.unlink( )
 
 
+@dcls.dataclass
+class Measurement:
+    ''' Wall time and peak memory of measured operation. '''
+
+    seconds: float = 0.0
+    peak_memory: int = 0
+
+
+@ctxl.contextmanager
+def measure_performance( ) -> typx.Iterator[ Measurement ]:
+    ''' Measures wall time and peak memory of Python allocations.
+
+        Allocations of all threads are traced, but not those of extension
+        libraries, such as compressors, which bypass the Python allocator.
+        Tracing allocations slows operations somewhat.
+    '''
+    measurement = Measurement( )
+    tracemalloc.start( )
+    start = time.perf_counter( )
+    try: yield measurement
+    finally:
+        measurement.seconds = time.perf_counter( ) - start
+        _, measurement.peak_memory = tracemalloc.get_traced_memory( )
+        tracemalloc.stop( )
+
+
+def produce_synthetic_artifacts(
+    location: Path,
+    variant: str,
+    files: int,
+    size: int = 4096,
+    suffixes: cabc.Sequence[ str ] = ( '.html', ),
+) -> Path:
+    ''' Produces synthetic documentation artifacts for variant.
+
+        Every other file is identical across variants, as theme assets are.
+        The other files, like pages, are particular to the variant. Content
+        resembles markup, so that it compresses as documentation does.
+        Suffixes of files are cycled through, with vocabularies of files
+        varying by suffix, as those of pages, stylesheets, and scripts do.
+    '''
+    for index in range( files ):
+        shared = index % 2 == 1
+        seed = f"shared-{index}" if shared else f"{variant}-{index}"
+        suffix = suffixes[ index % len( suffixes ) ]
+        words = random.Random( seed ).choices( # noqa: S311
+            _SYNTHETIC_VOCABULARIES.get( suffix, _SYNTHETIC_WORDS ),
+            k = size // 6 )
+        directory = '_static' if shared else 'pages'
+        path = location / 'sphinx-html' / directory / f"{index:05}{suffix}"
+        path.parent.mkdir( parents = True, exist_ok = True )
+        path.write_text( ' '.join( words ) )
+    return location
+
+
+def record_benchmark(
+    suite: str, result: cabc.Mapping[ str, typx.Any ]
+) -> Path:
+    ''' Appends benchmark result, along with its environment, to history.
+
+        History of suite is kept as JSON lines, one result per line, so
+        that results can be compared across releases and runs.
+    '''
+    record = {
+        'suite': suite,
+        'timestamp': datetime.now( timezone.utc ).isoformat(
+            timespec = 'seconds' ),
+        'package_version': cache_import_module( PACKAGE_NAME ).__version__,
+        'python': platform.python_version( ),
+        'platform': platform.platform( ),
+        **result,
+    }
+    location = BENCHMARKS_LOCATION / f"{suite}.jsonl"
+    location.parent.mkdir( parents = True, exist_ok = True )
+    with location.open( 'a' ) as file:
+        file.write( json.dumps( record, sort_keys = True ) + '\n' )
+    return location
+
+
 @dcls.dataclass
 class Pathetic:
     ''' Handles cross-platform path nativization and normalization. '''
@@ -25,9 +25,15 @@ import tempfile
 
 from pathlib import Path
 
+import ictruck
 import pytest
 import typing_extensions as typx
 
+from .__ import PACKAGE_NAME
+
+
+ictruck.register_module( PACKAGE_NAME )
+
 
 @pytest.fixture
 def provide_tempdir( ) -> typx.Iterator[ Path ]:
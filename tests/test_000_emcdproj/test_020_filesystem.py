@@ -0,0 +1,215 @@
+# vim: set filetype=python fileencoding=utf-8:
+# -*- coding: utf-8 -*-
+
+#============================================================================#
+#                                                                            #
+#  Licensed under the Apache License, Version 2.0 (the "License");           #
+#  you may not use this file except in compliance with the License.          #
+#  You may obtain a copy of the License at                                   #
+#                                                                            #
+#      http://www.apache.org/licenses/LICENSE-2.0                            #
+#                                                                            #
+#  Unless required by applicable law or agreed to in writing, software       #
+#  distributed under the License is distributed on an "AS IS" BASIS,         #
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  #
+#  See the License for the specific language governing permissions and       #
+#  limitations under the License.                                            #
+#                                                                            #
+#============================================================================#
+
+
+
+''' Tests for filesystem utilities. '''
+
+
+import hashlib
+import os
+import threading
+
+import pytest
+
+from .__ import PACKAGE_NAME, cache_import_module, create_test_files
+
+
+@pytest.fixture
+def filesystem( ):
+    ''' Provides filesystem module. '''
+    return cache_import_module( f"{ PACKAGE_NAME }.filesystem" )
+
+
+_VERSIONS_FILES = {
+    '1.0/_static/theme.css': 'body { color: black; }',
+    '1.0/index.html': 'one',
+    '1.1/_static/theme.css': 'body { color: black; }',
+    '1.1/index.html': 'two',
+    '1.2/_static/theme.css': 'body { color: white; }',
+    '1.2/empty.txt': '',
+    '1.3/empty.txt': '',
+}
+
+
+def _describe_content( filesystem, file ):
+    return ( file.stat( ).st_size, filesystem.calculate_digest( file ) )
+
+
+def test_100_deduplicate_files( filesystem, provide_tempdir ):
+    ''' Identical files become hard links to earliest copy. '''
+    with create_test_files( provide_tempdir, _VERSIONS_FILES ):
+        locations = [
+            provide_tempdir / version
+            for version in ( '1.0', '1.1', '1.2', '1.3' ) ]
+        saved = filesystem.deduplicate_files( locations )
+        themes = [
+            location / '_static/theme.css' for location in locations[ : 3 ] ]
+        assert saved == themes[ 0 ].stat( ).st_size
+        assert themes[ 0 ].samefile( themes[ 1 ] )
+        assert not themes[ 0 ].samefile( themes[ 2 ] )
+        assert themes[ 1 ].read_text( ) == 'body { color: black; }'
+        assert not ( locations[ 0 ] / 'index.html' ).samefile(
+            locations[ 1 ] / 'index.html' )
+        # Empty files are not worth linking.
+        assert ( locations[ 2 ] / 'empty.txt' ).stat( ).st_nlink == 1
+        # Deduplication is idempotent.
+        assert filesystem.deduplicate_files( locations ) == 0
+
+
+def test_110_deduplicate_files_against_references(
+    filesystem, provide_tempdir
+):
+    ''' Files are linked to fingerprinted references, once confirmed. '''
+    with create_test_files( provide_tempdir, _VERSIONS_FILES ):
+        reference = provide_tempdir / '1.0/_static/theme.css'
+        decoy = provide_tempdir / '1.0/index.html'
+        theme = provide_tempdir / '1.1/_static/theme.css'
+        # Stale digest claims that decoy duplicates other index.
+        references = {
+            str( reference ): _describe_content( filesystem, reference ),
+            str( decoy ): _describe_content(
+                filesystem, provide_tempdir / '1.1/index.html' ) }
+        saved = filesystem.deduplicate_files(
+            ( provide_tempdir / '1.1', ),
+            references = references,
+            contents = {
+                str( theme ): _describe_content( filesystem, theme ) } )
+        assert saved == reference.stat( ).st_size
+        assert theme.samefile( reference )
+        assert decoy.read_text( ) == 'one'
+        assert not ( provide_tempdir / '1.1/index.html' ).samefile( decoy )
+
+
+def test_200_calculate_digest( filesystem, provide_tempdir ):
+    ''' Digests of small and memory-mapped large files are SHA-256. '''
+    small = provide_tempdir / 'small.bin'
+    large = provide_tempdir / 'large.bin'
+    small.write_bytes( b'small' )
+    large.write_bytes( b'\x00' * ( 3 << 20 ) )
+    assert filesystem.calculate_digest( small ) == (
+        hashlib.sha256( b'small' ).hexdigest( ) )
+    assert filesystem.calculate_digest( large ) == (
+        hashlib.sha256( b'\x00' * ( 3 << 20 ) ).hexdigest( ) )
+
+
+def test_300_synchronize_tree( filesystem, provide_tempdir ):
+    ''' Only changed files are copied and stray files are removed. '''
+    source = provide_tempdir / 'source'
+    destination = provide_tempdir / 'destination'
+    files = {
+        'source/index.html': 'index',
+        'source/_static/theme.css': 'theme',
+        'source/_static/old.js': 'old',
+    }
+    with create_test_files( provide_tempdir, files ):
+        fingerprints = filesystem.synchronize_tree( source, destination, { } )
+        assert set( fingerprints ) == {
+            'index.html', '_static/theme.css', '_static/old.js' }
+        theme = destination / '_static/theme.css'
+        index = destination / 'index.html'
+        # Hard link from elsewhere must survive changes to source.
+        ( provide_tempdir / 'alias.html' ).hardlink_to( index )
+        inode = theme.stat( ).st_ino
+        ( source / '_static/old.js' ).unlink( )
+        ( source / 'index.html' ).write_text( 'changed' )
+        ( source / 'docs' ).mkdir( )
+        # Same content with new modification time is not copied.
+        ( source / '_static/theme.css' ).write_text( 'theme' )
+        fingerprints = filesystem.synchronize_tree(
+            source, destination, fingerprints )
+        assert theme.stat( ).st_ino == inode
+        assert index.read_text( ) == 'changed'
+        assert ( provide_tempdir / 'alias.html' ).read_text( ) == 'index'
+        assert not ( destination / '_static/old.js' ).exists( )
+        assert ( destination / 'docs' ).is_dir( )
+        assert set( fingerprints ) == { 'index.html', '_static/theme.css' }
+        ( provide_tempdir / 'alias.html' ).unlink( )
+
+
+def test_400_copy_and_remove_tree( filesystem, provide_tempdir ):
+    ''' Trees are copied and removed with worker threads. '''
+    source = provide_tempdir / 'source'
+    destination = provide_tempdir / 'destination'
+    with (
+        create_test_files( provide_tempdir, _VERSIONS_FILES ),
+        filesystem.produce_executor( 2 ) as executor,
+    ):
+        ( source / 'empty' ).mkdir( parents = True )
+        for name in ( '1.0', '1.1' ):
+            ( source / name ).symlink_to(
+                provide_tempdir / name, target_is_directory = True )
+        filesystem.copy_tree( provide_tempdir / '1.0', destination )
+        assert ( destination / '_static/theme.css' ).is_file( )
+        filesystem.copy_tree(
+            provide_tempdir / '1.1', destination / 'linked',
+            copier = os.link, executor = executor )
+        assert ( destination / 'linked/index.html' ).samefile(
+            provide_tempdir / '1.1/index.html' )
+        filesystem.remove_tree( destination, executor = executor )
+        filesystem.remove_tree( source )
+        assert not destination.exists( )
+        assert not source.exists( )
+        # Symlinked directories are removed without their targets.
+        assert ( provide_tempdir / '1.0/index.html' ).is_file( )
+
+
+@pytest.mark.parametrize(
+    'path', ( '../escape', 'a/../../escape', '/etc/passwd', '..' ) )
+def test_500_locate_within_rejects_escapes(
+    filesystem, provide_tempdir, path
+):
+    ''' Paths, which climb out of directory, are rejected. '''
+    exceptions = cache_import_module( f"{ PACKAGE_NAME }.exceptions" )
+    with pytest.raises( exceptions.PathInvalidity ):
+        filesystem.locate_within( provide_tempdir, path )
+
+
+def test_510_locate_within( filesystem, provide_tempdir ):
+    ''' Relative paths are resolved within directory through symlinks. '''
+    exceptions = cache_import_module( f"{ PACKAGE_NAME }.exceptions" )
+    root = provide_tempdir.resolve( )
+    assert filesystem.locate_within( provide_tempdir, 'a/./b/../c' ) == (
+        root / 'a/c' )
+    assert filesystem.locate_within( provide_tempdir, '..a' ) == root / '..a'
+    ( provide_tempdir / 'inside' ).symlink_to( 'a' )
+    ( provide_tempdir / 'outside' ).symlink_to( '..' )
+    ( provide_tempdir / 'loop' ).symlink_to( '.' )
+    assert filesystem.locate_within( provide_tempdir, 'inside/c' ) == (
+        root / 'a/c' )
+    for path in ( 'outside/escape', 'loop/outside', 'loop/..' ):
+        with pytest.raises( exceptions.PathInvalidity ):
+            filesystem.locate_within( provide_tempdir, path )
+
+
+def test_600_lock_file( filesystem, provide_tempdir ):
+    ''' Lock on file excludes other holders until it is released. '''
+    location = provide_tempdir / 'workspace.lock'
+    acquired = threading.Event( )
+
+    def acquire( ):
+        with filesystem.lock_file( location ): acquired.set( )
+
+    with filesystem.lock_file( location ):
+        assert location.is_file( )
+        thread = threading.Thread( target = acquire )
+        thread.start( )
+        assert not acquired.wait( 0.2 )
+    thread.join( 5 )
+    assert acquired.is_set( )
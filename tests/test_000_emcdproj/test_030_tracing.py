@@ -0,0 +1,105 @@
+# vim: set filetype=python fileencoding=utf-8:
+# -*- coding: utf-8 -*-
+
+#============================================================================#
+#                                                                            #
+#  Licensed under the Apache License, Version 2.0 (the "License");           #
+#  you may not use this file except in compliance with the License.          #
+#  You may obtain a copy of the License at                                   #
+#                                                                            #
+#      http://www.apache.org/licenses/LICENSE-2.0                            #
+#                                                                            #
+#  Unless required by applicable law or agreed to in writing, software       #
+#  distributed under the License is distributed on an "AS IS" BASIS,         #
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  #
+#  See the License for the specific language governing permissions and       #
+#  limitations under the License.                                            #
+#                                                                            #
+#============================================================================#
+
+
+
+''' Tests for timing spans of stages. '''
+
+
+import asyncio
+import json
+
+import pytest
+
+from .__ import PACKAGE_NAME, cache_import_module
+
+
+@pytest.fixture
+def tracing( ):
+    ''' Provides tracing module. '''
+    return cache_import_module( f"{ PACKAGE_NAME }.tracing" )
+
+
+def test_000_spans_without_tracer( tracing ):
+    ''' Spans and progress are ignored without active tracer. '''
+    with tracing.span( 'stage' ): tracing.record_progress( size = 1 )
+    with tracing.activate_tracer( ) as tracer: assert tracer is None
+
+
+def test_010_nested_spans_accumulate_progress( tracing, provide_tempdir ):
+    ''' Progress of nested spans counts towards enclosing spans. '''
+    location = provide_tempdir / 'trace.json'
+
+    @tracing.spanned( 'inner' )
+    def work( size ):
+        tracing.record_progress( size = size, files = 1 )
+        return size
+
+    with (
+        tracing.activate_tracer( location ) as tracer,
+        tracing.span( 'outer' ),
+    ):
+        assert work( 3 ) == 3
+        tracing.record_progress( size = 2 )
+    spans = { span.name: span for span in tracer.spans }
+    assert ( spans[ 'inner' ].size, spans[ 'inner' ].files ) == ( 3, 1 )
+    assert ( spans[ 'outer' ].size, spans[ 'outer' ].files ) == ( 5, 1 )
+    assert spans[ 'inner' ].lane != spans[ 'outer' ].lane
+    assert spans[ 'outer' ].wall >= spans[ 'inner' ].wall
+    trace = json.loads( location.read_text( ) )
+    assert [ event[ 'name' ] for event in trace[ 'traceEvents' ] ] == [
+        'outer', 'inner' ]
+    event = trace[ 'traceEvents' ][ 1 ]
+    assert event[ 'ph' ] == 'X'
+    assert event[ 'args' ][ 'bytes' ] == 3
+
+
+@pytest.mark.asyncio
+async def test_020_concurrent_spans( tracing, provide_tempdir ):
+    ''' Concurrent spans in tasks and threads occupy separate lanes. '''
+    location = provide_tempdir / 'trace.json'
+
+    @tracing.spanned( 'task' )
+    async def wait( ):
+        await asyncio.sleep( 0.01 )
+
+    @tracing.spanned( 'thread' )
+    def record( ):
+        tracing.record_progress( files = 2 )
+
+    with tracing.activate_tracer( location ) as tracer:
+        await asyncio.gather( wait( ), wait( ), asyncio.to_thread( record ) )
+        await asyncio.to_thread( record )
+    spans = [ span for span in tracer.spans if span.name == 'task' ]
+    assert { span.lane for span in spans } == { 0, 1 }
+    assert [ span.files for span in tracer.spans
+             if span.name == 'thread' ] == [ 2, 2 ]
+    assert not tracer.lanes
+
+
+def test_030_trace_saved_on_failure( tracing, provide_tempdir ):
+    ''' Trace is saved even if traced operations fail. '''
+    location = provide_tempdir / 'traces/trace.json'
+    with (
+        pytest.raises( RuntimeError ),
+        tracing.activate_tracer( location ),
+        tracing.span( 'failure' ),
+    ): raise RuntimeError
+    trace = json.loads( location.read_text( ) )
+    assert trace[ 'traceEvents' ][ 0 ][ 'name' ] == 'failure'
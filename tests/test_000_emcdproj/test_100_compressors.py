@@ -0,0 +1,110 @@
+# vim: set filetype=python fileencoding=utf-8:
+# -*- coding: utf-8 -*-
+
+#============================================================================#
+#                                                                            #
+#  Licensed under the Apache License, Version 2.0 (the "License");           #
+#  you may not use this file except in compliance with the License.          #
+#  You may obtain a copy of the License at                                   #
+#                                                                            #
+#      http://www.apache.org/licenses/LICENSE-2.0                            #
+#                                                                            #
+#  Unless required by applicable law or agreed to in writing, software       #
+#  distributed under the License is distributed on an "AS IS" BASIS,         #
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  #
+#  See the License for the specific language governing permissions and       #
+#  limitations under the License.                                            #
+#                                                                            #
+#============================================================================#
+
+
+
+''' Tests for compression codecs. '''
+
+
+import io
+import lzma
+
+import pytest
+
+from .__ import PACKAGE_NAME, cache_import_module
+
+
+@pytest.fixture
+def compressors( ):
+    ''' Provides compressors module. '''
+    return cache_import_module( f"{ PACKAGE_NAME }.compressors" )
+
+
+@pytest.fixture
+def exceptions( ):
+    ''' Provides exceptions module. '''
+    return cache_import_module( f"{ PACKAGE_NAME }.exceptions" )
+
+
+def _is_zstd_available( compressors, exceptions ):
+    try: compressors.provide_codec( compressors.Codecs.Zstd )
+    except exceptions.CodecAwol: return False
+    return True
+
+
+def test_000_compression_workers( compressors ):
+    ''' Zero workers means one per processor. '''
+    assert compressors.Compression( workers = 3 ).calculate_workers( ) == 3
+    assert compressors.Compression( ).calculate_workers( ) >= 1
+
+
+def test_100_compress_streams( compressors ):
+    ''' Sources become consecutive streams, readable as one. '''
+    target = io.BytesIO( )
+    compression = compressors.Compression( workers = 2, level = 1 )
+    sizes = compressors.compress_streams(
+        target, ( ( b'alpha', b'beta' ), ( ), ( b'gamma', ) ), compression )
+    assert sizes[ 1 ] == 0
+    assert sum( sizes ) == len( target.getvalue( ) )
+    # Ordinary decompressor reads concatenated streams.
+    assert lzma.decompress( target.getvalue( ) ) == b'alphabetagamma'
+    target.seek( 0 )
+    with compressors.produce_decompression_stream( target ) as stream:
+        assert stream.read( ) == b'alphabetagamma'
+
+
+def test_110_decompress_truncated_stream( compressors, exceptions ):
+    ''' Truncated stream is reported as invalid archive. '''
+    data = lzma.compress( b'x' * 100_000, format = lzma.FORMAT_XZ )
+    file = io.BytesIO( data[ : len( data ) // 2 ] )
+    file.name = 'truncated.xz'
+    with (
+        pytest.raises( exceptions.ArchiveInvalidity ),
+        compressors.produce_decompression_stream( file ) as stream,
+    ): stream.read( )
+
+
+def test_200_detect_codec( compressors, exceptions ):
+    ''' Codecs are detected from magic numbers. '''
+    file = io.BytesIO( lzma.compress( b'data', format = lzma.FORMAT_XZ ) )
+    assert compressors.detect_codec( file ) is compressors.Codecs.Xz
+    assert file.tell( ) == 0
+    file = io.BytesIO( b'\x28\xb5\x2f\xfd' + b'\x00' * 8 )
+    assert compressors.detect_codec( file ) is compressors.Codecs.Zstd
+    file = io.BytesIO( b'PK\x03\x04' )
+    file.name = 'archive.zip'
+    with pytest.raises( exceptions.ArchiveInvalidity ):
+        compressors.detect_codec( file )
+
+
+def test_300_zstd_roundtrip( compressors, exceptions ):
+    ''' Zstandard streams are compressed and decompressed, if available. '''
+    if not _is_zstd_available( compressors, exceptions ):
+        with pytest.raises( exceptions.CodecAwol ):
+            compressors.provide_codec( compressors.Codecs.Zstd )
+        return
+    target = io.BytesIO( )
+    compression = compressors.Compression(
+        codec = compressors.Codecs.Zstd )
+    compressors.compress_streams(
+        target, ( ( b'alpha', ), ( b'beta', ) ), compression )
+    target.seek( 0 )
+    with compressors.produce_decompression_stream(
+        target
+    ) as stream: assert stream.read( ) == b'alphabeta'
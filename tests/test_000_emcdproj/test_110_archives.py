@@ -0,0 +1,436 @@
+# vim: set filetype=python fileencoding=utf-8:
+# -*- coding: utf-8 -*-
+
+#============================================================================#
+#                                                                            #
+#  Licensed under the Apache License, Version 2.0 (the "License");           #
+#  you may not use this file except in compliance with the License.          #
+#  You may obtain a copy of the License at                                   #
+#                                                                            #
+#      http://www.apache.org/licenses/LICENSE-2.0                            #
+#                                                                            #
+#  Unless required by applicable law or agreed to in writing, software       #
+#  distributed under the License is distributed on an "AS IS" BASIS,         #
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  #
+#  See the License for the specific language governing permissions and       #
+#  limitations under the License.                                            #
+#                                                                            #
+#============================================================================#
+
+
+''' Tests for segmented website archives. '''
+
+
+import io
+import os
+import tarfile
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from .__ import PACKAGE_NAME, cache_import_module, create_test_files
+
+
+@pytest.fixture
+def archives( ):
+    ''' Provides archives module. '''
+    return cache_import_module( f"{ PACKAGE_NAME }.archives" )
+
+
+@pytest.fixture
+def exceptions( ):
+    ''' Provides exceptions module. '''
+    return cache_import_module( f"{ PACKAGE_NAME }.exceptions" )
+
+
+_WEBSITE_FILES = {
+    'website/index.html': '<html></html>',
+    'website/versions.json': '{"versions": {}}',
+    'website/1.0/sphinx-html/index.html': 'one',
+    'website/1.0/sphinx-html/_static/style.css': 'body { }',
+    'website/2.0/sphinx-html/index.html': 'two',
+}
+
+
+def test_000_write_and_read_index( archives, provide_tempdir ):
+    ''' Written archive has segment per top-level directory. '''
+    location = provide_tempdir / 'website.tar.xz'
+    with create_test_files( provide_tempdir, _WEBSITE_FILES ):
+        index = archives.write_archive(
+            location, provide_tempdir / 'website' )
+    assert tuple( s.name for s in index.segments ) == ( '1.0', '2.0' )
+    assert index == archives.read_archive_index( location )
+    size = location.stat( ).st_size
+    assert size == (
+        index.head + sum( s.size for s in index.segments ) + index.coda )
+
+
+def test_010_ordinary_tools_read_archive( archives, provide_tempdir ):
+    ''' Segmented archive is an ordinary tarball to ordinary readers. '''
+    location = provide_tempdir / 'website.tar.xz'
+    with create_test_files( provide_tempdir, _WEBSITE_FILES ):
+        archives.write_archive( location, provide_tempdir / 'website' )
+    with tarfile.open( location, 'r:xz' ) as archive:
+        names = set( archive.getnames( ) )
+        member = archive.extractfile( '2.0/sphinx-html/index.html' )
+        assert member is not None
+        assert member.read( ) == b'two'
+    assert '1.0/sphinx-html/_static/style.css' in names
+    assert archives.ARCHIVE_INDEX_NAME in names
+
+
+def test_020_extract_archive( archives, provide_tempdir ):
+    ''' Extraction restores website but omits archive index. '''
+    location = provide_tempdir / 'website.tar.xz'
+    destination = provide_tempdir / 'extraction'
+    with create_test_files( provide_tempdir, _WEBSITE_FILES ):
+        archives.write_archive( location, provide_tempdir / 'website' )
+    archives.extract_archive( location, destination )
+    assert ( destination / '1.0/sphinx-html/index.html' ).read_text( ) == (
+        'one' )
+    assert ( destination / 'versions.json' ).is_file( )
+    assert not ( destination / archives.ARCHIVE_INDEX_NAME ).exists( )
+
+
+@pytest.mark.parametrize(
+    'name, linkname',
+    ( ( '../escape.txt', '' ), ( 'link', '../..' ), ( 'link', '/etc' ) ) )
+def test_021_extract_rejects_escapes(
+    archives, exceptions, provide_tempdir, name, linkname
+):
+    ''' Members which would land outside destination invalidate archive. '''
+    location = provide_tempdir / 'website.tar.xz'
+    with tarfile.open( location, 'w:xz' ) as archive:
+        info = tarfile.TarInfo( name )
+        if linkname:
+            info.type = tarfile.SYMTYPE
+            info.linkname = linkname
+        archive.addfile( info, io.BytesIO( b'' ) )
+    with pytest.raises( exceptions.ArchiveInvalidity ):
+        archives.extract_archive( location, provide_tempdir / 'extraction' )
+    assert not ( provide_tempdir / 'escape.txt' ).exists( )
+
+
+@pytest.mark.parametrize(
+    'members',
+    (   ( ( 's1', '.' ), ( 's1/s2', '..' ), ( 's2/escape.txt', '' ) ),
+        ( ( 'up', '..' ), ),
+        ( ( 'inner', '.' ), ( 'inner/up', '..' ) ),
+    ),
+    ids = ( 'chained', 'direct', 'nested' ) )
+def test_022_extract_rejects_symlinked_escapes(
+    archives, exceptions, provide_tempdir, members
+):
+    ''' Escapes by way of symlinks, created by members, are rejected. '''
+    location = provide_tempdir / 'website.tar.xz'
+    destination = provide_tempdir / 'nest/extraction'
+    with tarfile.open( location, 'w:xz' ) as archive:
+        for name, linkname in members:
+            info = tarfile.TarInfo( name )
+            if linkname:
+                info.type = tarfile.SYMTYPE
+                info.linkname = linkname
+            archive.addfile( info, io.BytesIO( b'' ) )
+    with pytest.raises( exceptions.ArchiveInvalidity ):
+        archives.extract_archive( location, destination )
+    assert not ( provide_tempdir / 'nest/escape.txt' ).exists( )
+
+
+def test_023_extract_rejects_hard_links_through_symlinks(
+    archives, exceptions, provide_tempdir
+):
+    ''' Hard links to targets beneath outward symlinks are rejected. '''
+    location = provide_tempdir / 'website.tar.xz'
+    destination = provide_tempdir / 'nest/extraction'
+    destination.mkdir( parents = True )
+    ( provide_tempdir / 'nest/secret.txt' ).write_text( 'secret' )
+    ( destination / 'up' ).symlink_to( '..' )
+    with tarfile.open( location, 'w:xz' ) as archive:
+        info = tarfile.TarInfo( 'link' )
+        info.type = tarfile.LNKTYPE
+        info.linkname = 'up/secret.txt'
+        archive.addfile( info )
+    with pytest.raises( exceptions.ArchiveInvalidity ):
+        archives.extract_archive( location, destination )
+    assert not ( destination / 'link' ).exists( )
+
+
+def test_025_extract_selection( archives, provide_tempdir ):
+    ''' Selective extraction seeks past segments, which are not needed. '''
+    location = provide_tempdir / 'website.tar.xz'
+    source = provide_tempdir / 'website'
+    destination = provide_tempdir / 'extraction'
+    with create_test_files( provide_tempdir, _WEBSITE_FILES ):
+        ( source / 'stable/sphinx-html' ).mkdir( parents = True )
+        ( source / 'stable/sphinx-html/index.html' ).hardlink_to(
+            source / '2.0/sphinx-html/index.html' )
+        index = archives.write_archive(
+            location, source, trailers = ( 'stable', ) )
+    assert index.survey_dependencies( ( 'stable', ) ) == {
+        'stable', '2.0' }
+    assert index.survey_dependents( ( '2.0', ) ) == { 'stable' }
+    # Link targets of selected segments are extracted too.
+    archives.extract_archive(
+        location, destination, selection = ( 'stable', ) )
+    assert ( destination / 'versions.json' ).is_file( )
+    assert ( destination / 'stable/sphinx-html/index.html' ).read_text( ) == (
+        'two' )
+    assert ( destination / '2.0/sphinx-html/index.html' ).is_file( )
+    assert not ( destination / '1.0' ).exists( )
+
+
+def test_027_reproducible_archives( archives, provide_tempdir ):
+    ''' Identical content yields identical archives, regardless of metadata.
+
+        Unchanged archives are not rewritten at all.
+    '''
+    location = provide_tempdir / 'website.tar.xz'
+    location_ = provide_tempdir / 'website-.tar.xz'
+    source = provide_tempdir / 'website'
+    with create_test_files( provide_tempdir, _WEBSITE_FILES ):
+        index = archives.write_archive(
+            location, source, exclusions = ( '_static', ) )
+        status = location.stat( )
+        for file in source.rglob( '*' ): os.utime( file, ( 0, 12345 ) )
+        assert archives.write_archive(
+            location, source, exclusions = ( '_static', ) ) == index
+        archives.write_archive(
+            location_, source, exclusions = ( '_static', ) )
+    assert location.stat( ).st_mtime_ns == status.st_mtime_ns
+    assert location.read_bytes( ) == location_.read_bytes( )
+    assert all( segment.digest for segment in index.segments )
+    with tarfile.open( location, 'r:xz' ) as archive:
+        members = archive.getmembers( )
+    assert not any( '_static' in member.name for member in members )
+    assert { ( m.mtime, m.uid, m.gid, m.uname ) for m in members } == {
+        ( 0, 0, 0, '' ) }
+
+
+def test_028_clustered_ordering( archives, provide_tempdir ):
+    ''' Clustered members are grouped by type within each segment. '''
+    compressors = cache_import_module( f"{ PACKAGE_NAME }.compressors" )
+    location = provide_tempdir / 'website.tar.xz'
+    destination = provide_tempdir / 'extraction'
+    compression = compressors.Compression(
+        ordering = compressors.Orderings.Clustered )
+    with create_test_files( provide_tempdir, _WEBSITE_FILES ):
+        ( provide_tempdir / 'website/1.0/sphinx-html/_static/index.js'
+        ).write_text( 'void 0;' )
+        archives.write_archive(
+            location, provide_tempdir / 'website', compression = compression )
+    with tarfile.open( location, 'r:xz' ) as archive:
+        names = [
+            name for name in archive.getnames( ) if name.startswith( '1.0' ) ]
+    assert names == [
+        '1.0', '1.0/sphinx-html', '1.0/sphinx-html/_static',
+        '1.0/sphinx-html/_static/style.css',
+        '1.0/sphinx-html/index.html',
+        '1.0/sphinx-html/_static/index.js' ]
+    archives.extract_archive( location, destination )
+    script = destination / '1.0/sphinx-html/_static/index.js'
+    assert script.read_text( ) == 'void 0;'
+
+
+def test_030_reuse_segments( archives, provide_tempdir ):
+    ''' Reusable segments are copied verbatim from extant archive. '''
+    location = provide_tempdir / 'website.tar.xz'
+    source = provide_tempdir / 'website'
+    with create_test_files( provide_tempdir, _WEBSITE_FILES ):
+        index0 = archives.write_archive( location, source )
+        content0 = location.read_bytes( )
+        ( source / '2.0/sphinx-html/index.html' ).write_text( 'deux' )
+        ( source / '1.0/sphinx-html/index.html' ).write_text( 'un' )
+        index1 = archives.write_archive(
+            location, source, reusables = ( '1.0', ) )
+        content1 = location.read_bytes( )
+    segment0 = index0.access_segment( '1.0' )
+    segment1 = index1.access_segment( '1.0' )
+    assert segment0 is not None and segment1 is not None
+    assert (
+        content0[ segment0.offset : segment0.offset + segment0.size ]
+        == content1[ segment1.offset : segment1.offset + segment1.size ] )
+    with tarfile.open( location, 'r:xz' ) as archive:
+        reused = archive.extractfile( '1.0/sphinx-html/index.html' )
+        renewed = archive.extractfile( '2.0/sphinx-html/index.html' )
+        assert reused is not None and renewed is not None
+        # Reused segment retains content from previous archive.
+        assert reused.read( ) == b'one'
+        assert renewed.read( ) == b'deux'
+
+
+def test_032_retain_segments( archives, exceptions, provide_tempdir ):
+    ''' Retained segments are kept without directories in source. '''
+    location = provide_tempdir / 'website.tar.xz'
+    source = provide_tempdir / 'website'
+    with create_test_files( provide_tempdir, _WEBSITE_FILES ):
+        index0 = archives.write_archive( location, source )
+        content0 = location.read_bytes( )
+        ( source / '1.0/sphinx-html/_static/style.css' ).unlink( )
+        ( source / '1.0/sphinx-html/_static' ).rmdir( )
+        ( source / '1.0/sphinx-html/index.html' ).unlink( )
+        ( source / '1.0/sphinx-html' ).rmdir( )
+        ( source / '1.0' ).rmdir( )
+        ( source / '2.0/sphinx-html/index.html' ).write_text( 'deux' )
+        index1 = archives.write_archive(
+            location, source, retainables = ( '1.0', '2.0' ) )
+        content1 = location.read_bytes( )
+        with pytest.raises( exceptions.DirectoryAwol ):
+            archives.write_archive(
+                location, source, retainables = ( '0.9', ) )
+    assert tuple( s.name for s in index1.segments ) == ( '1.0', '2.0' )
+    segment0 = index0.access_segment( '1.0' )
+    segment1 = index1.access_segment( '1.0' )
+    assert segment0 is not None and segment1 is not None
+    assert (
+        content0[ segment0.offset : segment0.offset + segment0.size ]
+        == content1[ segment1.offset : segment1.offset + segment1.size ] )
+    assert archives.read_archive_member(
+        location, '2.0/sphinx-html/index.html' ) == b'deux'
+
+
+def test_035_leaders_come_first( archives, provide_tempdir ):
+    ''' Leading files are first members of archive. '''
+    location = provide_tempdir / 'website.tar.xz'
+    with create_test_files( provide_tempdir, _WEBSITE_FILES ):
+        archives.write_archive(
+            location, provide_tempdir / 'website',
+            leaders = ( 'versions.json', ) )
+    with tarfile.open( location, 'r:xz' ) as archive:
+        first = archive.next( )
+    assert first is not None
+    assert first.name == 'versions.json'
+
+
+def test_037_hard_links_across_segments( archives, provide_tempdir ):
+    ''' Hard-linked files are stored once and referenced by later segments. '''
+    location = provide_tempdir / 'website.tar.xz'
+    source = provide_tempdir / 'website'
+    destination = provide_tempdir / 'extraction'
+    with create_test_files( provide_tempdir, _WEBSITE_FILES ):
+        ( source / 'stable/sphinx-html' ).mkdir( parents = True )
+        ( source / 'stable/sphinx-html/index.html' ).hardlink_to(
+            source / '2.0/sphinx-html/index.html' )
+        index = archives.write_archive(
+            location, source, trailers = ( 'stable', ) )
+        # Linked segment is only reused along with its link targets.
+        index_ = archives.write_archive(
+            location, source, reusables = ( '1.0', 'stable' ) )
+    assert tuple( s.name for s in index.segments ) == (
+        '1.0', '2.0', 'stable' )
+    stable = index.access_segment( 'stable' )
+    assert stable is not None
+    assert stable.references == ( '2.0', )
+    assert index_.segments[ -1 ].references == ( '2.0', )
+    with tarfile.open( location, 'r:xz' ) as archive:
+        member = archive.getmember( 'stable/sphinx-html/index.html' )
+    assert member.islnk( )
+    assert member.linkname == '2.0/sphinx-html/index.html'
+    archives.extract_archive( location, destination )
+    assert ( destination / 'stable/sphinx-html/index.html' ).read_text( ) == (
+        'two' )
+
+
+def test_039_heads_follow_prerequisite( archives, provide_tempdir ):
+    ''' Top-level files, produced during compression, are archived. '''
+    location = provide_tempdir / 'website.tar.xz'
+    source = provide_tempdir / 'website'
+    with (
+        create_test_files( provide_tempdir, _WEBSITE_FILES ),
+        ThreadPoolExecutor( max_workers = 1 ) as executor,
+    ):
+        rendering = executor.submit(
+            ( source / 'coverage.svg' ).write_text, '<svg/>' )
+        archives.write_archive(
+            location, source, prerequisite = rendering )
+        ( source / 'coverage.svg' ).unlink( )
+    assert archives.read_archive_member( location, 'coverage.svg' ) == (
+        b'<svg/>' )
+
+
+def test_040_read_index_of_ordinary_archive( archives, provide_tempdir ):
+    ''' Archives from ordinary tools have no index. '''
+    location = provide_tempdir / 'website.tar.xz'
+    with (
+        create_test_files( provide_tempdir, _WEBSITE_FILES ),
+        tarfile.open( location, 'w:xz' ) as archive,
+    ): archive.add( provide_tempdir / 'website', arcname = '.' )
+    assert archives.read_archive_index( location ) is None
+
+
+def test_050_read_invalid_index( archives, exceptions, provide_tempdir ):
+    ''' Malformed archive index is reported as invalid archive. '''
+    location = provide_tempdir / 'website.tar.xz'
+    files = { 'website/.archive-index.json': '{"segments": 42}' }
+    with (
+        create_test_files( provide_tempdir, files ),
+        tarfile.open( location, 'w:xz' ) as archive,
+    ):
+        archive.add(
+            provide_tempdir / 'website/.archive-index.json',
+            arcname = '.archive-index.json' )
+    with pytest.raises( exceptions.ArchiveInvalidity ):
+        archives.read_archive_index( location )
+
+
+def test_100_read_archive_member( archives, provide_tempdir ):
+    ''' Members are read without extraction. '''
+    location = provide_tempdir / 'website.tar.xz'
+    with create_test_files( provide_tempdir, _WEBSITE_FILES ):
+        archives.write_archive( location, provide_tempdir / 'website' )
+    assert archives.read_archive_member( location, 'versions.json' ) == (
+        b'{"versions": {}}' )
+    assert archives.read_archive_member( location, '2.0' ) is None
+    assert archives.read_archive_member( location, 'absent.txt' ) is None
+    assert not ( provide_tempdir / 'versions.json' ).exists( )
+
+
+def test_110_read_member_of_ordinary_archive( archives, provide_tempdir ):
+    ''' Members of archives from ordinary tools are found by name. '''
+    location = provide_tempdir / 'website.tar.xz'
+    with (
+        create_test_files( provide_tempdir, _WEBSITE_FILES ),
+        tarfile.open( location, 'w:xz' ) as archive,
+    ): archive.add( provide_tempdir / 'website', arcname = '.' )
+    content = archives.read_archive_member(
+        location, '1.0/sphinx-html/index.html' )
+    assert content == b'one'
+
+
+def test_120_survey_archive( archives, provide_tempdir ):
+    ''' Survey hashes members and resolves hard links in one pass. '''
+    location = provide_tempdir / 'website.tar.xz'
+    source = provide_tempdir / 'website'
+    with create_test_files( provide_tempdir, _WEBSITE_FILES ):
+        ( source / 'stable/sphinx-html' ).mkdir( parents = True )
+        ( source / 'stable/sphinx-html/index.html' ).hardlink_to(
+            source / '2.0/sphinx-html/index.html' )
+        index = archives.write_archive(
+            location, source, trailers = ( 'stable', ) )
+    survey = archives.survey_archive( location )
+    assert survey.index == index
+    members = { member.name: member for member in survey.members }
+    assert archives.ARCHIVE_INDEX_NAME not in members
+    assert set( members ) == {
+        *( name.removeprefix( 'website/' ) for name in _WEBSITE_FILES ),
+        'stable/sphinx-html/index.html' }
+    link = members[ 'stable/sphinx-html/index.html' ]
+    target = members[ '2.0/sphinx-html/index.html' ]
+    assert link.link and not target.link
+    assert ( link.size, link.digest ) == ( 3, target.digest )
+    assert target.digest != members[ '1.0/sphinx-html/index.html' ].digest
+
+
+def test_130_digest_archive( archives, provide_tempdir ):
+    ''' Segments are digested by name; reused segments keep digests. '''
+    location = provide_tempdir / 'website.tar.xz'
+    source = provide_tempdir / 'website'
+    with create_test_files( provide_tempdir, _WEBSITE_FILES ):
+        archives.write_archive( location, source )
+        digests0 = archives.digest_archive( location )
+        ( source / '2.0/sphinx-html/index.html' ).write_text( 'deux' )
+        archives.write_archive( location, source, reusables = ( '1.0', ) )
+        digests1 = archives.digest_archive( location )
+    assert set( digests0 ) == { '', '1.0', '2.0' }
+    assert digests0[ '1.0' ] == digests1[ '1.0' ]
+    assert digests0[ '2.0' ] != digests1[ '2.0' ]
@@ -0,0 +1,170 @@
+# vim: set filetype=python fileencoding=utf-8:
+# -*- coding: utf-8 -*-
+
+#============================================================================#
+#                                                                            #
+#  Licensed under the Apache License, Version 2.0 (the "License");           #
+#  you may not use this file except in compliance with the License.          #
+#  You may obtain a copy of the License at                                   #
+#                                                                            #
+#      http://www.apache.org/licenses/LICENSE-2.0                            #
+#                                                                            #
+#  Unless required by applicable law or agreed to in writing, software       #
+#  distributed under the License is distributed on an "AS IS" BASIS,         #
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  #
+#  See the License for the specific language governing permissions and       #
+#  limitations under the License.                                            #
+#                                                                            #
+#============================================================================#
+
+
+''' Tests for manifest of published release versions. '''
+
+
+import json
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from .__ import PACKAGE_NAME, cache_import_module
+
+
+@pytest.fixture
+def manifests( ):
+    ''' Provides manifests module. '''
+    return cache_import_module( f"{ PACKAGE_NAME }.manifests" )
+
+
+def test_000_sort_keys_follow_pep440( manifests ):
+    ''' Sort keys order versions as PEP 440 does. '''
+    versions = (
+        '1.0.dev0', '1.0a1', '1.0a2.dev1', '1.0a2', '1.0b1', '1.0rc1',
+        '1.0', '1.0.post1.dev0', '1.0.post1', '1.1', '2!0.1' )
+    keys = [ manifests.calculate_sort_key( v ) for v in versions ]
+    assert keys == sorted( keys )
+    assert len( { json.dumps( key ) for key in keys } ) == len( keys )
+    assert manifests.calculate_sort_key( '1.0' ) == (
+        manifests.calculate_sort_key( '1.0.0' ) )
+
+
+def test_100_upgrade_format_1( manifests ):
+    ''' Manifests in format 1 are upgraded with pointers and records. '''
+    data = {
+        'latest_version': '2.0rc1',
+        'versions': {
+            '2.0rc1': [ 'sphinx-html' ],
+            '1.10': [ 'sphinx-html' ],
+            '1.9': [ 'coverage-pytest', 'sphinx-html' ],
+        },
+    }
+    manifest = manifests.produce_manifest( data )
+    assert manifest[ 'format' ] == manifests.MANIFEST_FORMAT
+    assert manifest[ 'versions' ] == data[ 'versions' ]
+    assert tuple( manifest[ 'versions' ] ) == ( '2.0rc1', '1.10', '1.9' )
+    assert manifest[ 'latest_version' ] == '2.0rc1'
+    assert manifest[ 'stable_version' ] == '1.10'
+    assert manifest[ 'development_version' ] == '2.0rc1'
+    assert manifest[ 'releases' ][ '2.0rc1' ][ 'prerelease' ]
+    assert manifests.produce_manifest( manifest ) == manifest
+
+
+def test_110_update_version_in_order( manifests ):
+    ''' New versions are inserted in order and advance pointers. '''
+    manifest = manifests.produce_manifest( { } )
+    for version in ( '1.1', '1.0', '1.2a1', '1.1.post1' ):
+        manifests.update_version( manifest, version, [ 'sphinx-html' ] )
+    assert tuple( manifest[ 'versions' ] ) == (
+        '1.2a1', '1.1.post1', '1.1', '1.0' )
+    assert manifest[ 'latest_version' ] == '1.2a1'
+    assert manifest[ 'stable_version' ] == '1.1.post1'
+    assert manifest[ 'development_version' ] == '1.2a1'
+    manifests.update_version(
+        manifest, '1.0', [ 'coverage-pytest' ], { 'files': 3 } )
+    assert manifest[ 'versions' ][ '1.0' ] == [ 'coverage-pytest' ]
+    assert manifest[ 'releases' ][ '1.0' ][ 'files' ] == 3
+    assert manifest[ 'stable_version' ] == '1.1.post1'
+
+
+def test_200_save_and_restore( manifests, provide_tempdir ):
+    ''' Saved manifests are restored; absent manifests are empty. '''
+    location = provide_tempdir / 'versions.json'
+    manifest = manifests.restore_manifest( location )
+    assert manifest[ 'versions' ] == { }
+    manifests.update_version( manifest, '1.0', [ 'sphinx-html' ] )
+    manifests.save_manifest( location, manifest )
+    assert manifests.restore_manifest( location ) == manifest
+
+
+def test_210_concurrent_updates_are_merged( manifests, provide_tempdir ):
+    ''' Versions added by concurrent updaters are all retained. '''
+    location = provide_tempdir / 'versions.json'
+    versions = [ f"1.{minor}" for minor in range( 8 ) ]
+
+    def add_version( version ):
+        with manifests.acquire_manifest( location ) as manifest:
+            manifests.update_version( manifest, version, [ 'sphinx-html' ] )
+
+    with ThreadPoolExecutor( max_workers = 4 ) as executor:
+        tuple( executor.map( add_version, versions ) )
+    manifest = manifests.restore_manifest( location )
+    assert tuple( manifest[ 'versions' ] ) == tuple( reversed( versions ) )
+    assert { path.name for path in provide_tempdir.iterdir( ) } == {
+        'versions.json', '.versions.json.lock' }
+
+
+def test_220_failed_update_is_not_saved( manifests, provide_tempdir ):
+    ''' Manifest is left intact if update fails. '''
+    location = provide_tempdir / 'versions.json'
+    lock = provide_tempdir / 'locks/versions.lock'
+    with manifests.acquire_manifest( location, lock ) as manifest:
+        manifests.update_version( manifest, '1.0', [ 'sphinx-html' ] )
+    content = location.read_bytes( )
+    with (
+        pytest.raises( RuntimeError ),
+        manifests.acquire_manifest( location, lock ) as manifest,
+    ):
+        manifests.update_version( manifest, '1.1', [ 'sphinx-html' ] )
+        raise RuntimeError
+    assert location.read_bytes( ) == content
+
+
+def test_300_survey_prunables( manifests ):
+    ''' Retention policy keeps latest versions per series and pointers. '''
+    manifest = manifests.produce_manifest( { } )
+    for version in (
+        '1.0', '1.0.1', '1.0.2', '1.1.0', '1.1.1',
+        '1.2rc1', '1.2rc2', '2.0a1', '2.0a2', '2.0b1',
+    ): manifests.update_version( manifest, version, [ 'sphinx-html' ] )
+    retention = manifests.Retention( patches = 1, prereleases = 1 )
+    assert retention.is_active( )
+    assert not manifests.Retention( ).is_active( )
+    assert manifests.survey_prunables( manifest, retention ) == (
+        '2.0a2', '2.0a1', '1.2rc1', '1.1.0', '1.0.1', '1.0' )
+    assert manifests.survey_prunables(
+        manifest, retention, protections = ( '1.0', ) ) == (
+            '2.0a2', '2.0a1', '1.2rc1', '1.1.0', '1.0.1' )
+    manifests.update_version( manifest, '1.2', [ 'sphinx-html' ] )
+    retention = manifests.Retention( superseded = True )
+    # Development pointer is kept, even though its series is final.
+    assert manifests.survey_prunables( manifest, retention ) == (
+        '1.2rc2', '1.2rc1' )
+    assert manifests.survey_prunables( manifest, manifests.Retention( ) ) == (
+        ( ) )
+
+
+def test_310_remove_versions( manifests ):
+    ''' Removal of versions repoints pointers to remaining versions. '''
+    manifest = manifests.produce_manifest( { } )
+    for version in ( '1.0', '1.1', '1.2a1', '1.2a2' ):
+        manifests.update_version( manifest, version, [ 'sphinx-html' ] )
+    manifests.remove_versions( manifest, ( '1.2a2', '1.0' ) )
+    assert tuple( manifest[ 'versions' ] ) == ( '1.2a1', '1.1' )
+    assert set( manifest[ 'releases' ] ) == { '1.2a1', '1.1' }
+    assert manifest[ 'latest_version' ] == '1.2a1'
+    assert manifest[ 'stable_version' ] == '1.1'
+    assert manifest[ 'development_version' ] == '1.2a1'
+    manifests.remove_versions( manifest, ( '1.2a1', '1.1' ) )
+    assert manifest[ 'latest_version' ] is None
+    assert manifest[ 'stable_version' ] is None
+    assert manifest[ 'development_version' ] is None
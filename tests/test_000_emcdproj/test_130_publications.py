@@ -0,0 +1,158 @@
+# vim: set filetype=python fileencoding=utf-8:
+# -*- coding: utf-8 -*-
+
+#============================================================================#
+#                                                                            #
+#  Licensed under the Apache License, Version 2.0 (the "License");           #
+#  you may not use this file except in compliance with the License.          #
+#  You may obtain a copy of the License at                                   #
+#                                                                            #
+#      http://www.apache.org/licenses/LICENSE-2.0                            #
+#                                                                            #
+#  Unless required by applicable law or agreed to in writing, software       #
+#  distributed under the License is distributed on an "AS IS" BASIS,         #
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  #
+#  See the License for the specific language governing permissions and       #
+#  limitations under the License.                                            #
+#                                                                            #
+#============================================================================#
+
+
+''' Tests for publication of website archives on Git branch. '''
+
+
+import subprocess
+
+import pytest
+
+from .__ import PACKAGE_NAME, cache_import_module
+
+
+_ARCHIVE_NAME = '.auxiliary/publications/website.tar.xz'
+
+
+@pytest.fixture
+def publications( ):
+    ''' Provides publications module. '''
+    return cache_import_module( f"{ PACKAGE_NAME }.publications" )
+
+
+@pytest.fixture
+def repositories( provide_tempdir, monkeypatch ):
+    ''' Provides project clone of bare repository standing in for origin. '''
+    for variable in ( 'AUTHOR', 'COMMITTER' ):
+        monkeypatch.setenv( f"GIT_{variable}_NAME", 'Tester' )
+        monkeypatch.setenv( f"GIT_{variable}_EMAIL", 'tester@example.com' )
+    origin = provide_tempdir / 'origin.git'
+    project = provide_tempdir / 'project'
+    _git( provide_tempdir, 'init', '--quiet', '--bare', str( origin ) )
+    _git( provide_tempdir, 'clone', '--quiet', str( origin ), str( project ) )
+    ( project / 'README' ).write_text( 'project' )
+    _git( project, 'add', 'README' )
+    _git( project, 'commit', '--quiet', '--message', 'Initial.' )
+    return origin, project
+
+
+def _git( location, *arguments ):
+    return subprocess.run( # noqa: S603
+        [ 'git', *arguments ], # noqa: S607
+        cwd = location, check = True, capture_output = True, text = True,
+    ).stdout.strip( )
+
+
+@pytest.mark.asyncio
+async def test_000_publish_archive( publications, repositories ):
+    ''' Archive is committed onto branch and pushed without index. '''
+    origin, project = repositories
+    archive = project / _ARCHIVE_NAME
+    archive.parent.mkdir( parents = True )
+    session = publications.GitSession( project = project )
+    archive.write_bytes( b'first' )
+    commit0 = await session.publish_archive( archive, 'First.' )
+    archive.write_bytes( b'second' )
+    commit1 = await session.publish_archive( archive, 'Second.' )
+    assert _git( origin, 'rev-parse', 'publication' ) == commit1
+    assert _git( origin, 'rev-parse', f"{commit1}^" ) == commit0
+    assert _git(
+        origin, 'cat-file', 'blob', f"publication:{_ARCHIVE_NAME}" ) == (
+            'second' )
+    assert _git( project, 'log', '-1', '--format=%s', commit1 ) == 'Second.'
+    # Nothing is staged in index of project.
+    assert _git( project, 'diff', '--cached', '--name-only' ) == ''
+    assert set( session.timings ) == {
+        'inspect', 'identify', 'import', 'push' }
+
+
+@pytest.mark.asyncio
+async def test_005_publish_large_archive( publications, repositories ):
+    ''' Archive, which exceeds pipe buffers, is fed to Git completely. '''
+    origin, project = repositories
+    archive = project / _ARCHIVE_NAME
+    archive.parent.mkdir( parents = True )
+    content = bytes( range( 256 ) ) * ( 6 * 4096 )
+    archive.write_bytes( content )
+    session = publications.GitSession( project = project )
+    commit = await session.publish_archive( archive, 'Large.' )
+    assert _git( origin, 'rev-parse', 'publication' ) == commit
+    size = _git( origin, 'cat-file', '-s', f"publication:{_ARCHIVE_NAME}" )
+    assert int( size ) == len( content )
+
+
+@pytest.mark.asyncio
+async def test_010_fetch_archive(
+    publications, repositories, provide_tempdir
+):
+    ''' Archive is restored from fetched branch without checkout. '''
+    origin, project = repositories
+    archive = project / _ARCHIVE_NAME
+    archive.parent.mkdir( parents = True )
+    session = publications.GitSession( project = project )
+    assert not await session.fetch_archive( archive )
+    assert not archive.exists( )
+    archive.write_bytes( b'content' )
+    await session.publish_archive( archive, 'Publish.' )
+    clone = provide_tempdir / 'clone'
+    _git( provide_tempdir, 'clone', '--quiet', str( origin ), str( clone ) )
+    archive_ = clone / _ARCHIVE_NAME
+    archive_.parent.mkdir( parents = True )
+    session_ = publications.GitSession(
+        project = clone,
+        publication = publications.Publication( timeout = 30.0 ) )
+    assert await session_.fetch_archive( archive_ )
+    assert archive_.read_bytes( ) == b'content'
+    assert _git( clone, 'status', '--porcelain' ) == '?? .auxiliary/'
+    assert set( session_.timings ) == { 'fetch', 'restore' }
+
+
+@pytest.mark.asyncio
+async def test_020_publish_shards(
+    publications, repositories, provide_tempdir
+):
+    ''' Only given shards are replaced; other shards remain. '''
+    origin, project = repositories
+    shards = project / '.auxiliary/publications/website'
+    ( shards / 'versions' ).mkdir( parents = True )
+    session = publications.GitSession( project = project )
+    for name, content in (
+        ( 'root.tar.xz', b'root0' ), ( 'versions/1.0.tar.xz', b'one' )
+    ): ( shards / name ).write_bytes( content )
+    await session.publish_archives(
+        ( shards / 'root.tar.xz', shards / 'versions/1.0.tar.xz' ), 'First.' )
+    ( shards / 'root.tar.xz' ).write_bytes( b'root1' )
+    ( shards / 'versions/1.1.tar.xz' ).write_bytes( b'two' )
+    await session.publish_archives(
+        ( shards / 'root.tar.xz', shards / 'versions/1.1.tar.xz' ), 'Next.' )
+    prefix = '.auxiliary/publications/website'
+    assert _git(
+        origin, 'ls-tree', '-r', '--name-only', 'publication', prefix
+    ).splitlines( ) == [
+        f"{prefix}/root.tar.xz",
+        f"{prefix}/versions/1.0.tar.xz",
+        f"{prefix}/versions/1.1.tar.xz" ]
+    clone = provide_tempdir / 'clone'
+    _git( provide_tempdir, 'clone', '--quiet', str( origin ), str( clone ) )
+    session_ = publications.GitSession( project = clone )
+    assert await session_.fetch_branch( )
+    assert await session_.restore_archive( clone / prefix / 'root.tar.xz' )
+    assert ( clone / prefix / 'root.tar.xz' ).read_bytes( ) == b'root1'
+    assert not ( clone / prefix / 'versions' ).exists( )
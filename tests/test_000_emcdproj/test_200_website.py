@@ -21,11 +21,14 @@
 ''' Tests for website maintenance utilities. '''
 
 
+import asyncio
+import json
+import subprocess
+
 from contextlib import AsyncExitStack
 from pathlib import Path
 from shutil import rmtree
 
-import ictruck
 import pytest
 
 from platformdirs import PlatformDirs
@@ -33,9 +36,6 @@ from platformdirs import PlatformDirs
 from .__ import PACKAGE_NAME, cache_import_module, create_test_files
 
 
-ictruck.register_module( PACKAGE_NAME )
-
-
 @pytest.fixture
 def application( ):
     ''' Provides appcore application module. '''
@@ -190,6 +190,23 @@ def test_010_extract_coverage( locations, website, fs ):
     assert website._extract_coverage( locations ) == 85
 
 
+def test_015_extract_coverage_streaming( locations, website, fs ):
+    ''' Coverage extraction stops at root and shares results by report. '''
+    xml_content = (
+        '<?xml version="1.0" ?><coverage line-rate="0.5">'
+        '<packages><unterminated' )
+    fs.create_file(
+        locations.artifacts / 'coverage-pytest/coverage.xml',
+        contents = xml_content )
+    coverages = { }
+    assert website._extract_coverage( locations, coverages ) == 50
+    assert list( coverages.values( ) ) == [ 50 ]
+    key, = coverages
+    assert key[ 1 ] == len( xml_content )
+    coverages[ key ] = 42
+    assert website._extract_coverage( locations, coverages ) == 42
+
+
 def test_020_extract_coverage_missing_file( locations, website, exceptions ):
     ''' Coverage extraction raises FileAwol for missing XML. '''
     with pytest.raises( exceptions.FileAwol ):
@@ -207,6 +224,24 @@ def test_030_update_available_species( locations, website, fs ):
     assert ( locations.website / 'v1.0/coverage-pytest/test.txt' ).exists( )
 
 
+def test_035_update_available_species_synchronizes( locations, website, fs ):
+    ''' Species directories are synchronized with fingerprints. '''
+    origin = locations.artifacts / 'sphinx-html'
+    fs.create_file( origin / 'index.html', contents = 'index' )
+    fs.create_file( origin / 'old.html', contents = 'old' )
+    website._update_available_species( locations, 'v1.0' )
+    destination = locations.website / 'v1.0'
+    assert ( destination / '.fingerprints.json' ).is_file( )
+    ( origin / 'old.html' ).unlink( )
+    ( origin / 'index.html' ).write_text( 'new' )
+    species = website._update_available_species( locations, 'v1.0' )
+    assert species == ( 'sphinx-html', )
+    assert ( destination / 'sphinx-html/index.html' ).read_text( ) == 'new'
+    assert not ( destination / 'sphinx-html/old.html' ).exists( )
+    fingerprints = website._restore_fingerprints( destination )
+    assert set( fingerprints[ 'sphinx-html' ] ) == { 'index.html' }
+
+
 def test_040_update_coverage_badge( locations, website, fs ):
     ''' Coverage badge is updated with injected jinja context. '''
     fs.create_dir( locations.artifacts / 'coverage-pytest' )
@@ -246,13 +281,14 @@ def test_060_update_versions_json( locations, website, fs ):
     ''' Versions JSON is updated correctly. '''
     fs.create_dir( locations.website )
     species = ( 'coverage-pytest', )
-    data = website._update_versions_json( locations, 'v1.0', species )
+    data = website._update_versions_json( locations, { 'v1.0': species } )
     assert locations.versions.exists( )
     assert data[ 'latest_version' ] == 'v1.0'
     assert data[ 'versions' ][ 'v1.0' ] == species
 
 
-def test_100_integration_update(
+@pytest.mark.asyncio
+async def test_100_integration_update(
     auxdata_tmpdir, locations_tmpdir, website, provide_tempdir
 ):
     ''' Update with real filesystem. '''
@@ -273,15 +309,857 @@ def test_100_integration_update(
     }
     with create_test_files( provide_tempdir, test_files ):
         locations_tmpdir.website.mkdir( parents = True, exist_ok = True )
-        website.update(
+        await website.update(
             auxdata_tmpdir, 'v1.0',
             project_anchor = locations_tmpdir.project )
         assert locations_tmpdir.coverage.exists( )
         assert locations_tmpdir.index.read_text( ) == 'v1.0'
         assert ( locations_tmpdir.website / '.nojekyll' ).exists( )
         assert locations_tmpdir.archive.exists( )
+        # Compiled templates are cached for later runs.
+        assert any( ( locations_tmpdir.caches / 'jinja2' ).iterdir( ) )
         # Second pass to cover some branches not hit on first pass.
         rmtree( locations_tmpdir.artifacts / 'coverage-pytest' )
-        website.update(
+        await website.update(
             auxdata_tmpdir, 'v1.0',
             project_anchor = locations_tmpdir.project )
+
+
+@pytest.mark.asyncio
+async def test_110_integration_update_incremental(
+    auxdata_tmpdir, locations_tmpdir, website, provide_tempdir
+):
+    ''' Update reuses compressed segments of untouched versions. '''
+    archives = cache_import_module( f"{ PACKAGE_NAME }.archives" )
+    test_files = {
+        'project/.auxiliary/artifacts/sphinx-html/index.html': 'docs',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    with create_test_files( provide_tempdir, test_files ):
+        await website.update(
+            auxdata_tmpdir, '1.0', project_anchor = locations_tmpdir.project )
+        index0 = archives.read_archive_index( locations_tmpdir.archive )
+        content0 = locations_tmpdir.archive.read_bytes( )
+        await website.update(
+            auxdata_tmpdir, '1.1', project_anchor = locations_tmpdir.project )
+        index1 = archives.read_archive_index( locations_tmpdir.archive )
+        content1 = locations_tmpdir.archive.read_bytes( )
+    assert index0 is not None and index1 is not None
+    segment0 = index0.access_segment( '1.0' )
+    segment1 = index1.access_segment( '1.0' )
+    assert segment0 is not None and segment1 is not None
+    assert (
+        content0[ segment0.offset : segment0.offset + segment0.size ]
+        == content1[ segment1.offset : segment1.offset + segment1.size ] )
+    assert index1.access_segment( '1.1' ) is not None
+    assert locations_tmpdir.index.read_text( ) == '1.1'
+
+
+@pytest.mark.parametrize( 'mode', ( 'copy', 'hardlink', 'symlink' ) )
+@pytest.mark.asyncio
+async def test_115_integration_update_aliases(
+    auxdata_tmpdir, locations_tmpdir, website, provide_tempdir, mode
+):
+    ''' Stable and development aliases survive round trip through tarball. '''
+    aliases = website.AliasModes( mode )
+    test_files = {
+        'project/.auxiliary/artifacts/sphinx-html/index.html': 'docs',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    with create_test_files( provide_tempdir, test_files ):
+        for version in ( '1.0', '1.1rc1' ):
+            await website.update(
+                auxdata_tmpdir, version,
+                project_anchor = locations_tmpdir.project,
+                aliases = aliases, deduplicate = False )
+        rmtree( locations_tmpdir.website )
+        await website.update(
+            auxdata_tmpdir, '1.1',
+            project_anchor = locations_tmpdir.project,
+            aliases = aliases, deduplicate = False )
+    stable = locations_tmpdir.website / 'stable'
+    development = locations_tmpdir.website / 'development'
+    assert ( stable / 'sphinx-html/index.html' ).read_text( ) == 'docs'
+    assert ( development / 'sphinx-html/index.html' ).is_file( )
+    assert stable.is_symlink( ) == ( mode == 'symlink' )
+    if mode == 'symlink': assert stable.readlink( ) == Path( '1.1' )
+    linked = ( stable / 'sphinx-html/index.html' ).samefile(
+        locations_tmpdir.website / '1.1/sphinx-html/index.html' )
+    assert linked == ( mode != 'copy' )
+
+
+@pytest.mark.asyncio
+async def test_116_integration_update_shards(
+    auxdata_tmpdir, locations_tmpdir, website, provide_tempdir
+):
+    ''' Sharded layout writes only root shard and touched shards. '''
+    archives = cache_import_module( f"{ PACKAGE_NAME }.archives" )
+    publications = cache_import_module( f"{ PACKAGE_NAME }.publications" )
+    publication = publications.Publication(
+        layout = publications.Layouts.Shards )
+    test_files = {
+        'project/.auxiliary/artifacts/sphinx-html/index.html': 'docs',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    shards = locations_tmpdir.shards
+    with create_test_files( provide_tempdir, test_files ):
+        await website.update(
+            auxdata_tmpdir, '1.0',
+            project_anchor = locations_tmpdir.project,
+            publication = publication )
+        content0 = ( shards / 'versions/1.0.tar.xz' ).read_bytes( )
+        await website.update(
+            auxdata_tmpdir, '1.1',
+            project_anchor = locations_tmpdir.project,
+            publication = publication )
+    assert not locations_tmpdir.archive.exists( )
+    assert { path.name for path in ( shards / 'versions' ).iterdir( ) } == {
+        '1.0.tar.xz', '1.1.tar.xz', 'stable.tar.xz' }
+    # Untouched version is neither restored nor written again.
+    assert not ( locations_tmpdir.website / '1.0' ).exists( )
+    assert ( shards / 'versions/1.0.tar.xz' ).read_bytes( ) == content0
+    manifest = json.loads( archives.read_archive_member(
+        shards / 'root.tar.xz', 'versions.json' ) )
+    assert tuple( manifest[ 'versions' ] ) == ( '1.1', '1.0' )
+    # Shards together form whole website.
+    destination = provide_tempdir / 'extraction'
+    versions = tuple( ( shards / 'versions' ).iterdir( ) )
+    for shard in ( shards / 'root.tar.xz', *versions ):
+        archives.extract_archive( shard, destination )
+    assert ( destination / '1.0/sphinx-html/index.html' ).is_file( )
+    assert ( destination / 'stable/sphinx-html/index.html' ).is_file( )
+    assert ( destination / 'index.html' ).read_text( ) == '1.1'
+
+
+@pytest.mark.asyncio
+async def test_117_integration_update_deduplication(
+    auxdata_tmpdir, locations_tmpdir, website, provide_tempdir
+):
+    ''' Identical files across versions are stored once in tarball. '''
+    archives = cache_import_module( f"{ PACKAGE_NAME }.archives" )
+    test_files = {
+        'project/.auxiliary/artifacts/sphinx-html/_static/theme.css':
+            'body { color: black; }',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    with create_test_files( provide_tempdir, test_files ):
+        for version in ( '1.0', '1.1' ):
+            await website.update(
+                auxdata_tmpdir, version,
+                project_anchor = locations_tmpdir.project,
+                aliases = website.AliasModes.Copy )
+    theme = 'sphinx-html/_static/theme.css'
+    assert ( locations_tmpdir.website / '1.0' / theme ).samefile(
+        locations_tmpdir.website / '1.1' / theme )
+    assert ( locations_tmpdir.website / '1.0' / theme ).samefile(
+        locations_tmpdir.website / 'stable' / theme )
+    index = archives.read_archive_index( locations_tmpdir.archive )
+    assert index is not None
+    segment = index.access_segment( '1.1' )
+    assert segment is not None
+    assert segment.references == ( '1.0', )
+
+
+@pytest.mark.asyncio
+async def test_118_integration_update_batch(
+    auxdata_tmpdir, locations_tmpdir, website, exceptions, provide_tempdir
+):
+    ''' Several versions, with own artifacts, are updated in one pass. '''
+    archives = cache_import_module( f"{ PACKAGE_NAME }.archives" )
+    test_files = {
+        'project/.auxiliary/artifacts/sphinx-html/index.html': 'docs',
+        'backfill/1.0/sphinx-html/index.html': 'old docs',
+        'backfill/1.0/coverage-pytest/coverage.xml':
+            '<?xml version="1.0" ?><coverage line-rate="0.4"></coverage>',
+        'package/data/templates/coverage.svg.jinja': '{{ color }}',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    with create_test_files( provide_tempdir, test_files ):
+        versions = dict(
+            website._parse_version_specification( specification )
+            for specification in (
+                f"1.0={ provide_tempdir / 'backfill/1.0' }", '1.1' ) )
+        assert versions[ '1.1' ] is website.__.absent
+        await website.update(
+            auxdata_tmpdir, versions,
+            project_anchor = locations_tmpdir.project )
+        with pytest.raises( exceptions.VersionsAbsence ):
+            await website.update(
+                auxdata_tmpdir, { },
+                project_anchor = locations_tmpdir.project )
+        with pytest.raises( exceptions.DirectoryAwol ):
+            await website.update(
+                auxdata_tmpdir, { '1.2': provide_tempdir / 'absent' },
+                project_anchor = locations_tmpdir.project )
+    site = locations_tmpdir.website
+    assert ( site / '1.0/sphinx-html/index.html' ).read_text( ) == 'old docs'
+    assert ( site / '1.1/sphinx-html/index.html' ).read_text( ) == 'docs'
+    assert ( site / '1.0/coverage.svg' ).read_text( ) == 'red'
+    assert locations_tmpdir.coverage.read_text( ) == 'red'
+    assert locations_tmpdir.index.read_text( ) == '1.1'
+    versions_data = json.loads( locations_tmpdir.versions.read_text( ) )
+    assert versions_data[ 'versions' ] == {
+        '1.1': [ 'sphinx-html' ],
+        '1.0': [ 'coverage-pytest', 'sphinx-html' ] }
+    assert versions_data[ 'stable_version' ] == '1.1'
+    record = versions_data[ 'releases' ][ '1.0' ]
+    assert record[ 'files' ] == 2
+    assert record[ 'size' ] == len( 'old docs' ) + len(
+        test_files[ 'backfill/1.0/coverage-pytest/coverage.xml' ] )
+    assert record[ 'coverage' ] == 40
+    assert versions_data[ 'releases' ][ '1.1' ][ 'coverage' ] is None
+    index = archives.read_archive_index( locations_tmpdir.archive )
+    assert index is not None
+    assert { '1.0', '1.1' } <= { s.name for s in index.segments }
+
+
+@pytest.mark.asyncio
+async def test_119_integration_update_with_retention(
+    auxdata_tmpdir, locations_tmpdir, website, provide_tempdir
+):
+    ''' Versions, which retention policy drops, are pruned in same pass. '''
+    archives = cache_import_module( f"{ PACKAGE_NAME }.archives" )
+    manifests = cache_import_module( f"{ PACKAGE_NAME }.manifests" )
+    test_files = {
+        'project/.auxiliary/artifacts/sphinx-html/index.html': 'docs',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    with create_test_files( provide_tempdir, test_files ):
+        await website.update(
+            auxdata_tmpdir, { '1.0.0': website.__.absent, '1.0.1': (
+                website.__.absent ) },
+            project_anchor = locations_tmpdir.project )
+        await website.update(
+            auxdata_tmpdir, '1.0.2',
+            project_anchor = locations_tmpdir.project,
+            retention = manifests.Retention( patches = 1 ) )
+    site = locations_tmpdir.website
+    assert not ( site / '1.0.0' ).exists( )
+    assert not ( site / '1.0.1' ).exists( )
+    assert ( site / '1.0.2/sphinx-html/index.html' ).is_file( )
+    versions_data = json.loads( locations_tmpdir.versions.read_text( ) )
+    assert tuple( versions_data[ 'versions' ] ) == ( '1.0.2', )
+    assert set( versions_data[ 'releases' ] ) == { '1.0.2' }
+    index = archives.read_archive_index( locations_tmpdir.archive )
+    assert index is not None
+    assert { s.name for s in index.segments } == { '1.0.2', 'stable' }
+
+
+@pytest.mark.asyncio
+async def test_120_survey_published_without_extraction(
+    auxdata_tmpdir, locations_tmpdir, website, provide_tempdir, capsys
+):
+    ''' Survey of published versions reads manifest from tarball. '''
+    test_files = {
+        'project/.auxiliary/artifacts/sphinx-html/index.html': 'docs',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    with create_test_files( provide_tempdir, test_files ):
+        await website.update(
+            auxdata_tmpdir, '1.0', project_anchor = locations_tmpdir.project )
+    rmtree( locations_tmpdir.website )
+    capsys.readouterr( )
+    await website.survey(
+        auxdata_tmpdir,
+        project_anchor = locations_tmpdir.project, use_extant = True )
+    output = capsys.readouterr( ).out
+    assert 'Published versions:' in output
+    assert '1.0 (latest): sphinx-html' in output
+    assert not locations_tmpdir.website.exists( )
+
+
+@pytest.mark.asyncio
+async def test_121_integration_update_extracts_partially(
+    auxdata_tmpdir, locations_tmpdir, website, provide_tempdir
+):
+    ''' Update retains segments of untouched versions, then extracts them. '''
+    archives = cache_import_module( f"{ PACKAGE_NAME }.archives" )
+    test_files = {
+        'project/.auxiliary/artifacts/sphinx-html/index.html': 'docs',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    with create_test_files( provide_tempdir, test_files ):
+        for version in ( '1.0', '1.1', '1.2' ):
+            await website.update(
+                auxdata_tmpdir, version,
+                project_anchor = locations_tmpdir.project )
+        index0 = archives.read_archive_index( locations_tmpdir.archive )
+        content0 = locations_tmpdir.archive.read_bytes( )
+        # Cold runner has no website directory from previous runs.
+        rmtree( locations_tmpdir.website )
+        await website.update(
+            auxdata_tmpdir, '1.3', project_anchor = locations_tmpdir.project )
+        index1 = archives.read_archive_index( locations_tmpdir.archive )
+        content1 = locations_tmpdir.archive.read_bytes( )
+    site = locations_tmpdir.website
+    # Retained version is extracted, once tarball is saved.
+    assert ( site / '1.1/sphinx-html/index.html' ).read_text( ) == 'docs'
+    assert ( site / '1.0/sphinx-html/index.html' ).is_file( )
+    assert ( site / '1.2/sphinx-html/index.html' ).is_file( )
+    assert ( site / 'stable/sphinx-html/index.html' ).read_text( ) == 'docs'
+    assert index0 is not None and index1 is not None
+    segment0 = index0.access_segment( '1.1' )
+    segment1 = index1.access_segment( '1.1' )
+    assert segment0 is not None and segment1 is not None
+    assert (
+        content0[ segment0.offset : segment0.offset + segment0.size ]
+        == content1[ segment1.offset : segment1.offset + segment1.size ] )
+    assert tuple( s.name for s in index1.segments ) == (
+        '1.0', '1.1', '1.2', '1.3', 'stable' )
+    extraction = provide_tempdir / 'extraction'
+    archives.extract_archive( locations_tmpdir.archive, extraction )
+    assert ( extraction / '1.1/sphinx-html/index.html' ).read_text( ) == (
+        'docs' )
+
+
+@pytest.mark.asyncio
+async def test_122_integration_update_reuses_warm_website(
+    auxdata_tmpdir, locations_tmpdir, website, provide_tempdir
+):
+    ''' Warm website is kept and reconciled with changed tarball. '''
+    archives = cache_import_module( f"{ PACKAGE_NAME }.archives" )
+    test_files = {
+        'project/.auxiliary/artifacts/sphinx-html/index.html': 'docs',
+        'backfill/1.0/sphinx-html/index.html': 'old docs',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    site = locations_tmpdir.website
+    record = locations_tmpdir.caches / 'extraction.json'
+    with create_test_files( provide_tempdir, test_files ):
+        for version in ( '1.0', '1.1' ):
+            await website.update(
+                auxdata_tmpdir, version,
+                project_anchor = locations_tmpdir.project )
+        inode = ( site / '1.1/sphinx-html/index.html' ).stat( ).st_ino
+        await website.update(
+            auxdata_tmpdir, '1.2', project_anchor = locations_tmpdir.project )
+        assert ( site / '1.1/sphinx-html/index.html' ).stat( ).st_ino == inode
+        # Another run changes tarball, while warm website is set aside.
+        warm = provide_tempdir / 'warm'
+        site.rename( warm )
+        content = record.read_bytes( )
+        await website.update(
+            auxdata_tmpdir, { '1.0': provide_tempdir / 'backfill/1.0' },
+            project_anchor = locations_tmpdir.project )
+        rmtree( site )
+        warm.rename( site )
+        record.write_bytes( content )
+        await website.update(
+            auxdata_tmpdir, '1.3', project_anchor = locations_tmpdir.project )
+    # Stale version is replaced rather than published again.
+    assert archives.read_archive_member(
+        locations_tmpdir.archive, '1.0/sphinx-html/index.html' ) == (
+            b'old docs' )
+    assert ( site / '1.0/sphinx-html/index.html' ).read_text( ) == (
+        'old docs' )
+    assert ( site / '1.1/sphinx-html/index.html' ).read_text( ) == 'docs'
+    assert ( site / '1.3/sphinx-html/index.html' ).read_text( ) == 'docs'
+    assert locations_tmpdir.index.read_text( ) == '1.3'
+
+
+@pytest.mark.asyncio
+async def test_123_cold_update_reuses_archived_fingerprints(
+    auxdata_tmpdir, locations_tmpdir, website, provide_tempdir, monkeypatch
+):
+    ''' Cold run compares artifacts with archived digests, not copies. '''
+    archives = cache_import_module( f"{ PACKAGE_NAME }.archives" )
+    filesystem = cache_import_module( f"{ PACKAGE_NAME }.filesystem" )
+    artifact = 'project/.auxiliary/artifacts/sphinx-html/index.html'
+    test_files = {
+        artifact: 'docs',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    replacements = [ ]
+    replace_file = filesystem._replace_file
+
+    def replace( source, target ):
+        replacements.append( target )
+        replace_file( source, target )
+
+    with create_test_files( provide_tempdir, test_files ):
+        await website.update(
+            auxdata_tmpdir, '1.0', project_anchor = locations_tmpdir.project )
+        content = locations_tmpdir.archive.read_bytes( )
+        assert archives.read_archive_member(
+            locations_tmpdir.archive, '1.0/.fingerprints.json' ) is not None
+        assert archives.read_archive_member(
+            locations_tmpdir.archive, '1.0/.fingerprints.local.json' ) is None
+        # Cold runner rebuilds same artifacts with new modification times.
+        rmtree( locations_tmpdir.website )
+        ( provide_tempdir / artifact ).write_text( 'docs' )
+        monkeypatch.setattr( filesystem, '_replace_file', replace )
+        await website.update(
+            auxdata_tmpdir, '1.0', project_anchor = locations_tmpdir.project )
+    assert replacements == [ ]
+    assert locations_tmpdir.archive.read_bytes( ) == content
+
+
+@pytest.fixture
+def publication_origin( locations_tmpdir, provide_tempdir, monkeypatch ):
+    ''' Provides bare repository as origin of project repository. '''
+    for variable in ( 'AUTHOR', 'COMMITTER' ):
+        monkeypatch.setenv( f"GIT_{variable}_NAME", 'Tester' )
+        monkeypatch.setenv( f"GIT_{variable}_EMAIL", 'tester@example.com' )
+    origin = provide_tempdir / 'origin.git'
+    project = locations_tmpdir.project
+    _git( provide_tempdir, 'init', '--quiet', '--bare', str( origin ) )
+    _git( project, 'init', '--quiet' )
+    _git( project, 'remote', 'add', 'origin', str( origin ) )
+    return origin
+
+
+@pytest.mark.asyncio
+async def test_124_production_signs_website_once(
+    auxdata_tmpdir, locations_tmpdir, website, publication_origin, monkeypatch
+):
+    ''' Warm website is signed once before and once after update. '''
+    filesystem = cache_import_module( f"{ PACKAGE_NAME }.filesystem" )
+    project = locations_tmpdir.project
+    test_files = {
+        'project/.auxiliary/artifacts/sphinx-html/index.html': 'docs',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    signatures = [ ]
+    calculate_tree_signature = filesystem.calculate_tree_signature
+
+    def sign( location ):
+        signatures.append( location )
+        return calculate_tree_signature( location )
+
+    with create_test_files( publication_origin.parent, test_files ):
+        await website.update(
+            auxdata_tmpdir, '1.0',
+            project_anchor = project, production = True )
+        monkeypatch.setattr( filesystem, 'calculate_tree_signature', sign )
+        await website.update(
+            auxdata_tmpdir, '1.1',
+            project_anchor = project, production = True )
+    assert signatures == [ locations_tmpdir.website ] * 2
+    log = _git( publication_origin, 'log', '--format=%s', 'publication' )
+    assert log.splitlines( )[ 0 ] == 'Update documents for publication. (1.1)'
+
+
+@pytest.mark.asyncio
+async def test_125_production_reuses_publication_cache(
+    auxdata_tmpdir, locations_tmpdir, website, publication_origin, capsys
+):
+    ''' Unmoved publication commit is neither restored nor extracted again.
+
+        Git bundle stands in for remote without network access.
+    '''
+    publications = cache_import_module( f"{ PACKAGE_NAME }.publications" )
+    origin = publication_origin
+    project = locations_tmpdir.project
+    test_files = {
+        'project/.auxiliary/artifacts/sphinx-html/index.html': 'docs',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    page = locations_tmpdir.website / '1.0/sphinx-html/index.html'
+    with create_test_files( origin.parent, test_files ):
+        await website.update(
+            auxdata_tmpdir, '1.0',
+            project_anchor = project, production = True )
+        page0 = page.stat( ).st_ino
+        await website.update(
+            auxdata_tmpdir, '1.1',
+            project_anchor = project, production = True )
+        # Website directory was not extracted again.
+        assert page.stat( ).st_ino == page0
+    log = _git( origin, 'log', '--format=%s', 'publication' )
+    assert log.splitlines( ) == [
+        'Update documents for publication. (1.1)',
+        'Update documents for publication. (1.0)' ]
+    bundle = origin.parent / 'publication.bundle'
+    _git( origin, 'bundle', 'create', str( bundle ), 'publication' )
+    rmtree( project / '.git' )
+    rmtree( locations_tmpdir.publications )
+    _git( project, 'init', '--quiet' )
+    capsys.readouterr( )
+    await website.survey(
+        auxdata_tmpdir,
+        project_anchor = project,
+        use_extant = True,
+        publication = publications.Publication( source = str( bundle ) ) )
+    assert '1.1 (latest): sphinx-html' in capsys.readouterr( ).out
+
+
+@pytest.mark.asyncio
+async def test_126_production_skips_unchanged_website(
+    auxdata_tmpdir, locations_tmpdir, website, publication_origin, capsys
+):
+    ''' Rebuilt identical website is neither rewritten nor published. '''
+    origin = publication_origin
+    project = locations_tmpdir.project
+    artifact = 'project/.auxiliary/artifacts/sphinx-html/index.html'
+    test_files = {
+        artifact: 'docs',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    with create_test_files( origin.parent, test_files ):
+        await website.update(
+            auxdata_tmpdir, '1.0',
+            project_anchor = project, production = True )
+        content = locations_tmpdir.archive.read_bytes( )
+        # Rebuilt artifacts have new modification times, but same content.
+        ( origin.parent / artifact ).write_text( 'docs' )
+        capsys.readouterr( )
+        await website.update(
+            auxdata_tmpdir, '1.0',
+            project_anchor = project, production = True )
+    assert 'unchanged' in capsys.readouterr( ).out
+    assert locations_tmpdir.archive.read_bytes( ) == content
+    log = _git( origin, 'log', '--format=%s', 'publication' )
+    assert log.splitlines( ) == [ 'Update documents for publication. (1.0)' ]
+
+
+@pytest.mark.asyncio
+async def test_127_production_prune_shards(
+    auxdata_tmpdir, locations_tmpdir, website, publication_origin, capsys
+):
+    ''' Shards of pruned versions are deleted from publication branch. '''
+    archives = cache_import_module( f"{ PACKAGE_NAME }.archives" )
+    manifests = cache_import_module( f"{ PACKAGE_NAME }.manifests" )
+    publications = cache_import_module( f"{ PACKAGE_NAME }.publications" )
+    publication = publications.Publication(
+        layout = publications.Layouts.Shards )
+    retention = manifests.Retention( patches = 1 )
+    origin = publication_origin
+    project = locations_tmpdir.project
+    test_files = {
+        'project/.auxiliary/artifacts/sphinx-html/index.html': 'docs',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    with create_test_files( origin.parent, test_files ):
+        for version in ( '1.0.0', '1.0.1' ):
+            await website.update(
+                auxdata_tmpdir, version,
+                project_anchor = project,
+                production = True,
+                publication = publication )
+        capsys.readouterr( )
+        await website.prune(
+            auxdata_tmpdir,
+            project_anchor = project,
+            production = True,
+            publication = publication,
+            retention = retention )
+        assert 'Pruned versions: 1.0.0' in capsys.readouterr( ).out
+        await website.prune(
+            auxdata_tmpdir,
+            project_anchor = project,
+            production = True,
+            publication = publication,
+            retention = retention )
+        assert 'No versions to prune.' in capsys.readouterr( ).out
+    prefix = '.auxiliary/publications/website'
+    assert _git(
+        origin, 'ls-tree', '-r', '--name-only', 'publication', prefix
+    ).splitlines( ) == [
+        f"{prefix}/root.tar.xz",
+        f"{prefix}/versions/1.0.1.tar.xz",
+        f"{prefix}/versions/stable.tar.xz" ]
+    assert _git( origin, 'log', '-1', '--format=%s', 'publication' ) == (
+        'Prune documents from publication. (1.0.0)' )
+    assert not ( locations_tmpdir.shards / 'versions/1.0.0.tar.xz' ).exists( )
+    manifest = json.loads( archives.read_archive_member(
+        locations_tmpdir.shards / 'root.tar.xz', 'versions.json' ) )
+    assert tuple( manifest[ 'versions' ] ) == ( '1.0.1', )
+    assert locations_tmpdir.index.read_text( ) == '1.0.1'
+
+
+@pytest.mark.asyncio
+async def test_128_stats_of_archive(
+    auxdata_tmpdir, locations_tmpdir, website, provide_tempdir, capsys
+):
+    ''' Statistics break down archive by version and species. '''
+    test_files = {
+        'project/.auxiliary/artifacts/sphinx-html/index.html': 'docs',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    await website.stats(
+        auxdata_tmpdir, project_anchor = locations_tmpdir.project )
+    assert 'No archives found for local' in capsys.readouterr( ).out
+    with create_test_files( provide_tempdir, test_files ):
+        await website.update(
+            auxdata_tmpdir, { '1.0': website.__.absent, '1.1': (
+                website.__.absent ) },
+            project_anchor = locations_tmpdir.project )
+    capsys.readouterr( )
+    await website.stats(
+        auxdata_tmpdir, project_anchor = locations_tmpdir.project,
+        json = True )
+    statistics = json.loads( capsys.readouterr( ).out )
+    assert statistics[ 'layout' ] == 'tarball'
+    assert set( statistics[ 'versions' ] ) == { '1.0', '1.1', 'stable' }
+    assert set( statistics[ 'species' ] ) == { 'sphinx-html' }
+    docs = statistics[ 'species' ][ 'sphinx-html' ]
+    # Pages of second version and of stable alias duplicate first version.
+    assert ( docs[ 'files' ], docs[ 'size' ] ) == ( 3, 12 )
+    assert docs[ 'duplicates' ] == 8
+    assert 'compressed' not in docs
+    stable = statistics[ 'versions' ][ 'stable' ]
+    assert stable[ 'duplicate_ratio' ] == 1.0
+    total = statistics[ 'total' ]
+    assert total[ 'compressed' ] == locations_tmpdir.archive.stat( ).st_size
+    assert total[ 'compressed' ] == statistics[ 'root' ][ 'compressed' ] + sum(
+        entry[ 'compressed' ] for entry in statistics[ 'versions' ].values( ) )
+    assert total[ 'files' ] == statistics[ 'root' ][ 'files' ] + sum(
+        entry[ 'files' ] for entry in statistics[ 'versions' ].values( ) )
+    await website.stats(
+        auxdata_tmpdir, project_anchor = locations_tmpdir.project )
+    output = capsys.readouterr( ).out
+    assert 'Local website (tarball):' in output
+    assert '  sphinx-html: 3 files, 12 bytes, 66.7% duplicate' in output
+
+
+@pytest.mark.asyncio
+async def test_129_update_trace(
+    auxdata_tmpdir, locations_tmpdir, website, provide_tempdir
+):
+    ''' Stages of update are traced with bytes and files. '''
+    tracing = cache_import_module( f"{ PACKAGE_NAME }.tracing" )
+    test_files = {
+        'project/.auxiliary/artifacts/sphinx-html/index.html': 'docs',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    location = provide_tempdir / 'trace.json'
+    with (
+        create_test_files( provide_tempdir, test_files ),
+        tracing.activate_tracer( location ),
+    ):
+        await website.update(
+            auxdata_tmpdir, '1.0',
+            project_anchor = locations_tmpdir.project, use_extant = True )
+    events = {
+        event[ 'name' ]: event
+        for event in json.loads( location.read_text( ) )[ 'traceEvents' ] }
+    assert {
+        'fetch', 'extract', 'synchronize', 'update-manifest',
+        'render-index', 'compress', 'git fetch',
+    } <= set( events )
+    assert events[ 'synchronize' ][ 'args' ][ 'files' ] == 1
+    assert events[ 'render-index' ][ 'args' ][ 'bytes' ] == len( '1.0' )
+    assert events[ 'compress' ][ 'args' ][ 'bytes' ] == (
+        locations_tmpdir.archive.stat( ).st_size )
+
+
+@pytest.mark.asyncio
+async def test_130_survey_without_manifest(
+    auxdata_tmpdir, locations_tmpdir, website, capsys
+):
+    ''' Survey reports absent manifests. '''
+    await website.survey(
+        auxdata_tmpdir, project_anchor = locations_tmpdir.project )
+    assert 'No versions manifest found for local' in capsys.readouterr( ).out
+    await website.survey(
+        auxdata_tmpdir,
+        project_anchor = locations_tmpdir.project, use_extant = True )
+    assert 'No versions manifest found for published' in (
+        capsys.readouterr( ).out )
+
+
+@pytest.mark.asyncio
+async def test_131_production_supersedes_other_codec(
+    auxdata_tmpdir, locations_tmpdir, website, publication_origin
+):
+    ''' Archive, named for other codec, is replaced on publication branch.
+
+        Suffix of archive follows codec, so that tools can choose
+        decompressors by file name.
+    '''
+    archives = cache_import_module( f"{ PACKAGE_NAME }.archives" )
+    publications = cache_import_module( f"{ PACKAGE_NAME }.publications" )
+    origin = publication_origin
+    project = locations_tmpdir.project
+    stale = locations_tmpdir.publications / 'website.tar.zst'
+    test_files = {
+        'project/.auxiliary/artifacts/sphinx-html/index.html': 'docs',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    with create_test_files( origin.parent, test_files ):
+        await website.update(
+            auxdata_tmpdir, '1.0', project_anchor = project )
+        # Publication branch only holds archive under name of other codec.
+        locations_tmpdir.archive.rename( stale )
+        session = publications.GitSession( project = project )
+        await session.publish_archive( stale, 'Publish.' )
+        rmtree( locations_tmpdir.website )
+        stale.unlink( )
+        await website.update(
+            auxdata_tmpdir, '1.1',
+            project_anchor = project, production = True )
+    assert _git(
+        origin, 'ls-tree', '-r', '--name-only', 'publication'
+    ).splitlines( ) == [ '.auxiliary/publications/website.tar.xz' ]
+    assert not stale.exists( )
+    index = archives.read_archive_index( locations_tmpdir.archive )
+    assert index is not None
+    assert { '1.0', '1.1' } <= { s.name for s in index.segments }
+    assert website._locate_archive(
+        locations_tmpdir.archive, website._compressors.Codecs.Zstd
+    ) == stale
+
+
+@pytest.mark.asyncio
+async def test_132_update_names_archive_for_codec(
+    auxdata_tmpdir, locations_tmpdir, website, exceptions, capsys
+):
+    ''' Archive, compressed with Zstandard, is named for its codec. '''
+    compressors = cache_import_module( f"{ PACKAGE_NAME }.compressors" )
+    try: compressors.provide_codec( compressors.Codecs.Zstd )
+    except exceptions.CodecAwol: pytest.skip( 'Zstandard is unavailable.' )
+    project = locations_tmpdir.project
+    test_files = {
+        'project/.auxiliary/artifacts/sphinx-html/index.html': 'docs',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    with create_test_files( project.parent, test_files ):
+        await website.update( auxdata_tmpdir, '1.0', project_anchor = project )
+        await website.update(
+            auxdata_tmpdir, '1.1',
+            project_anchor = project,
+            compression = compressors.Compression(
+                codec = compressors.Codecs.Zstd ) )
+    assert not locations_tmpdir.archive.exists( )
+    assert ( locations_tmpdir.publications / 'website.tar.zst' ).is_file( )
+    capsys.readouterr( )
+    await website.stats( auxdata_tmpdir, project_anchor = project )
+    assert '1.0:' in capsys.readouterr( ).out
+
+
+@pytest.mark.asyncio
+async def test_135_restore_complete_shards(
+    auxdata_tmpdir, locations_tmpdir, website, publication_origin, capsys
+):
+    ''' Restoration completes website from all published shards. '''
+    publications = cache_import_module( f"{ PACKAGE_NAME }.publications" )
+    publication = publications.Publication(
+        layout = publications.Layouts.Shards )
+    project = locations_tmpdir.project
+    test_files = {
+        'project/.auxiliary/artifacts/sphinx-html/index.html': 'docs',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    site = locations_tmpdir.website
+    with create_test_files( publication_origin.parent, test_files ):
+        await website.restore(
+            auxdata_tmpdir, project_anchor = project,
+            publication = publication )
+        assert 'No archives found for local' in capsys.readouterr( ).out
+        for version in ( '1.0', '1.1', '1.2' ):
+            # Cold runner has neither website nor archives.
+            rmtree( locations_tmpdir.publications, ignore_errors = True )
+            rmtree( site, ignore_errors = True )
+            await website.update(
+                auxdata_tmpdir, version,
+                project_anchor = project, production = True,
+                publication = publication )
+        assert not ( site / '1.0' ).exists( )
+        await website.restore(
+            auxdata_tmpdir, project_anchor = project, use_extant = True,
+            publication = publication )
+    for version in ( '1.0', '1.1', '1.2', 'stable' ):
+        assert ( site / version / 'sphinx-html/index.html' ).read_text( ) == (
+            'docs' )
+    assert locations_tmpdir.index.read_text( ) == '1.2'
+
+
+@pytest.mark.asyncio
+async def test_140_update_projects_concurrently(
+    auxdata_tmpdir, locations_tmpdir, website, exceptions, provide_tempdir
+):
+    ''' Websites of several projects are updated concurrently.
+
+        Working directory is left alone, so failure of one project does
+        not disturb the others.
+    '''
+    archives = cache_import_module( f"{ PACKAGE_NAME }.archives" )
+    test_files = {
+        'alpha/.auxiliary/artifacts/sphinx-html/index.html': 'alpha',
+        'beta/.auxiliary/artifacts/sphinx-html/index.html': 'beta',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    directory = Path.cwd( )
+    with create_test_files( provide_tempdir, test_files ):
+        await website.update_projects(
+            auxdata_tmpdir, {
+                provide_tempdir / 'alpha': '1.0',
+                provide_tempdir / 'beta': { '2.0': website.__.absent },
+            },
+            file_workers = 2 )
+        with pytest.raises( exceptions.DirectoryAwol ):
+            await website.update_projects(
+                auxdata_tmpdir, {
+                    provide_tempdir / 'alpha':
+                        { '1.1': provide_tempdir / 'absent' },
+                    provide_tempdir / 'beta': '2.1',
+                },
+                concurrency = 1 )
+    assert Path.cwd( ) == directory
+    for name, version in ( ( 'alpha', '1.0' ), ( 'beta', '2.1' ) ):
+        locations = website.Locations.from_project_anchor(
+            auxdata_tmpdir, provide_tempdir / name )
+        assert locations.index.read_text( ) == version
+        assert ( locations.website / version / 'sphinx-html/index.html'
+        ).read_text( ) == name
+        index = archives.read_archive_index( locations.archive )
+        assert index is not None
+        assert version in { segment.name for segment in index.segments }
+
+
+@pytest.mark.asyncio
+async def test_145_update_cancels_fetch_on_failure(
+    auxdata_tmpdir, locations_tmpdir, website, monkeypatch
+):
+    ''' Fetch of publication branch is cancelled, if preparation fails. '''
+    cancellations = [ ]
+
+    async def fetch( *posargs, **nomargs ):
+        try: await asyncio.Event( ).wait( )
+        except asyncio.CancelledError:
+            cancellations.append( True )
+            raise
+
+    def extract_coverages( *posargs, **nomargs ):
+        raise RuntimeError
+
+    monkeypatch.setattr(
+        website, '_fetch_publication_branch_and_tarball', fetch )
+    monkeypatch.setattr( website, '_extract_coverages', extract_coverages )
+    with pytest.raises( RuntimeError ):
+        await website.update(
+            auxdata_tmpdir, '1.0',
+            project_anchor = locations_tmpdir.project, use_extant = True )
+    assert cancellations == [ True ]
+
+
+@pytest.mark.asyncio
+async def test_150_updates_of_workspace_are_serialized(
+    auxdata_tmpdir, locations_tmpdir, website, provide_tempdir
+):
+    ''' Concurrent updates of one workspace take turns. '''
+    archives = cache_import_module( f"{ PACKAGE_NAME }.archives" )
+    test_files = {
+        'project/.auxiliary/artifacts/sphinx-html/index.html': 'docs',
+        'package/data/templates/website.html.jinja': '{{ latest_version }}',
+    }
+    with create_test_files( provide_tempdir, test_files ):
+        await asyncio.gather( *(
+            website.update(
+                auxdata_tmpdir, version,
+                project_anchor = locations_tmpdir.project )
+            for version in ( '1.0', '1.1', '1.2' ) ) )
+    manifest = json.loads( locations_tmpdir.versions.read_text( ) )
+    assert set( manifest[ 'versions' ] ) == { '1.0', '1.1', '1.2' }
+    index = archives.read_archive_index( locations_tmpdir.archive )
+    assert index is not None
+    assert { '1.0', '1.1', '1.2' } <= {
+        segment.name for segment in index.segments }
+    assert ( locations_tmpdir.caches / 'website.lock' ).is_file( )
+
+
+def _git( location, *arguments ):
+    return subprocess.run( # noqa: S603
+        [ 'git', *arguments ], # noqa: S607
+        cwd = location, check = True, capture_output = True, text = True,
+    ).stdout.strip( )
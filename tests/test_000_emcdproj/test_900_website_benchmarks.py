@@ -0,0 +1,158 @@
+# vim: set filetype=python fileencoding=utf-8:
+# -*- coding: utf-8 -*-
+
+#============================================================================#
+#                                                                            #
+#  Licensed under the Apache License, Version 2.0 (the "License");           #
+#  you may not use this file except in compliance with the License.          #
+#  You may obtain a copy of the License at                                   #
+#                                                                            #
+#      http://www.apache.org/licenses/LICENSE-2.0                            #
+#                                                                            #
+#  Unless required by applicable law or agreed to in writing, software       #
+#  distributed under the License is distributed on an "AS IS" BASIS,         #
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.  #
+#  See the License for the specific language governing permissions and       #
+#  limitations under the License.                                            #
+#                                                                            #
+#============================================================================#
+
+
+
+''' Benchmarks of website maintenance at realistic scale.
+
+    Synthetic websites of several versions of several files each are
+    updated and surveyed across a sweep of sizes. Results are appended to
+    the benchmark history, rather than asserted, since timings vary between
+    machines.
+'''
+
+
+import itertools
+import os
+
+from contextlib import AsyncExitStack
+from pathlib import Path
+
+import pytest
+
+from platformdirs import PlatformDirs
+
+from .__ import (
+    PACKAGE_NAME,
+    cache_import_module,
+    measure_performance,
+    produce_synthetic_artifacts,
+    record_benchmark,
+)
+
+
+_SWEEP = tuple( itertools.product( ( 2, 8, 32 ), ( 25, 100 ) ) )
+
+
+@pytest.fixture
+def website( ):
+    ''' Provides website module. '''
+    return cache_import_module( f"{ PACKAGE_NAME }.website" )
+
+
+@pytest.fixture
+def auxdata( ):
+    ''' Provides globals with data, such as templates, of distribution. '''
+    application = cache_import_module( 'appcore.application' )
+    distribution = cache_import_module( 'appcore.distribution' )
+    state = cache_import_module( 'appcore.state' )
+    return state.Globals(
+        application = application.Information( name = PACKAGE_NAME ),
+        configuration = { },
+        directories = PlatformDirs(
+            appname = PACKAGE_NAME, ensure_exists = False ),
+        distribution = distribution.Information(
+            name = PACKAGE_NAME,
+            location = Path( __file__ ).parents[ 2 ],
+            editable = True ),
+        exits = AsyncExitStack( ) )
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'scale', _SWEEP, ids = lambda s: 'x'.join( map( str, s ) ) )
+async def test_100_website_scaling(
+    auxdata, website, provide_tempdir, capsys, scale
+):
+    ''' Update, survey, and archive size scale with versions and files. '''
+    versions_count, files_count = scale
+    project = provide_tempdir / 'project'
+    ( project / '.auxiliary/artifacts' ).mkdir( parents = True )
+    artifacts = {
+        f"1.{minor}": produce_synthetic_artifacts(
+            provide_tempdir / f"artifacts/1.{minor}",
+            f"1.{minor}", files_count )
+        for minor in range( versions_count + 1 ) }
+    *batch, increment = artifacts
+    with measure_performance( ) as building:
+        await website.update(
+            auxdata, { version: artifacts[ version ] for version in batch },
+            project_anchor = project )
+    with measure_performance( ) as updating:
+        await website.update(
+            auxdata, { increment: artifacts[ increment ] },
+            project_anchor = project )
+    with measure_performance( ) as surveying:
+        await website.survey(
+            auxdata, project_anchor = project, use_extant = True )
+    assert f"{increment} (latest)" in capsys.readouterr( ).out
+    locations = website.Locations.from_project_anchor( auxdata, project )
+    record_benchmark( 'website', {
+        'versions': versions_count,
+        'files': files_count,
+        'archive_size': locations.archive.stat( ).st_size,
+        'build_seconds': building.seconds,
+        'build_peak_memory': building.peak_memory,
+        'update_seconds': updating.seconds,
+        'update_peak_memory': updating.peak_memory,
+        'survey_seconds': surveying.seconds,
+        'survey_peak_memory': surveying.peak_memory,
+    } )
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+async def test_200_archive_ordering( auxdata, website, provide_tempdir ):
+    ''' Clustered ordering of members shrinks archive of website.
+
+        A real website, such as one extracted from a publication branch,
+        may be given by the ``EMCDPROJ_BENCHMARK_WEBSITE`` environment
+        variable. Otherwise, a synthetic website of several versions, with
+        pages, stylesheets, and scripts, is built.
+    '''
+    archives = cache_import_module( f"{ PACKAGE_NAME }.archives" )
+    compressors = cache_import_module( f"{ PACKAGE_NAME }.compressors" )
+    source_ = os.environ.get( 'EMCDPROJ_BENCHMARK_WEBSITE' )
+    if source_: source = Path( source_ )
+    else:
+        project = provide_tempdir / 'project'
+        ( project / '.auxiliary/artifacts' ).mkdir( parents = True )
+        await website.update(
+            auxdata, {
+                f"1.{minor}": produce_synthetic_artifacts(
+                    provide_tempdir / f"artifacts/1.{minor}",
+                    f"1.{minor}", 60, suffixes = ( '.html', '.css', '.js' ) )
+                for minor in range( 8 ) },
+            project_anchor = project )
+        source = website.Locations.from_project_anchor(
+            auxdata, project ).website
+    sizes: dict[ str, int ] = { }
+    for ordering in compressors.Orderings:
+        location = provide_tempdir / f"website-{ordering.value}.tar.xz"
+        archives.write_archive(
+            location, source,
+            compression = compressors.Compression( ordering = ordering ),
+            leaders = ( 'versions.json', ) )
+        sizes[ ordering.value ] = location.stat( ).st_size
+    record_benchmark( 'archive-ordering', {
+        'website': 'real' if source_ else 'synthetic',
+        **{ f"{ordering}_size": size for ordering, size in sizes.items( ) },
+        'gain': 1 - sizes[ 'clustered' ] / sizes[ 'tree' ],
+    } )